@@ -0,0 +1,224 @@
+"""
+Benchmarks forecasting over synthetic scenarios, scaled along one axis at a time from a base scenario: customer types, lead stages per
+funnel, roles (sales roles ramp up), state dependent roles, and horizon. Times `forecast` with each engine and its component
+functions, records peak memory, and writes the results as json, which can be compared against a previous run:
+
+    python scripts/benchmark.py --output before.json
+    ...
+    python scripts/benchmark.py --output after.json --compare before.json
+"""
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, replace
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import typer
+
+from pycasting.calc.forecasting import forecast
+from pycasting.calc.headcount import HeadcountPlan
+from pycasting.calc.sales import LeadFunnel
+from pycasting.calc.session import ForecastSession
+from pycasting.calc.vectorized import forecast_counts, first_order_frame
+from pycasting.misc import MonthYear
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario
+
+ACTUALS = Actuals(accurate_as_of=date(2022, 8, 31), active_customers={"Customer 0": 1}, cash_on_hand=210_000)
+
+
+@dataclass(frozen=True)
+class Case:
+    customer_types: int = 2
+    stages: int = 3
+    roles: int = 5
+    # Of the roles, how many are sales roles, and how many scale with customers
+    sales_roles: int = 1
+    state_dependent: int = 0
+    months_ahead: int = 36
+
+    @property
+    def name(self) -> str:
+        return ",".join(f"{k}={v}" for k, v in asdict(self).items())
+
+
+def synthetic_scenario(case: Case, seed: int = 0) -> Scenario:
+    """A scenario shaped like the example scenario, with the given number of each thing."""
+    rng = random.Random(seed)
+
+    def uncertain(value: float, spread: float) -> str:
+        return f"{value:.4g}+/-{spread:.4g}"
+
+    customer_types = [
+        {
+            "name": f"Customer {i}",
+            "setup_fee": uncertain(rng.uniform(1000, 40000), rng.uniform(0, 10000)),
+            "monthly_fee": uncertain(rng.uniform(0, 4000), rng.uniform(0, 500)),
+            "usage_fee": rng.choice([0, 99]),
+            "usage_predictor": rng.choice(
+                [
+                    {"name": "linear", "increase_per_year": uncertain(0.5, 0.8), "initial_usage": uncertain(4, 3)},
+                    {"name": "constant", "increase_per_year": "0", "initial_usage": uncertain(2, 1)},
+                ]
+            ),
+            "fraction_of_leads": 1 / case.customer_types,
+            "cogs": {"monthly": uncertain(rng.uniform(100, 200), 50), "per_usage": "0.005"},
+            "lead_config": {
+                "stages": [
+                    {"name": f"stage {j}", "duration": rng.randint(5, 40), "conversion_rate": rng.uniform(0.1, 0.6)}
+                    for j in range(case.stages)
+                ],
+                "cost_per_ad_click": rng.uniform(0.05, 0.2),
+                "qualified_lead_to_click_ratio": rng.uniform(0.01, 0.05),
+            },
+            "churn": rng.uniform(0.01, 0.05),
+            "payment_months_behind": rng.randint(0, 2),
+        }
+        for i in range(case.customer_types)
+    ]
+
+    headcount = list()
+    for i in range(case.roles):
+        role = {"name": f"Role {i}", "salary": rng.randint(40, 150) * 1000, "customer_acquisition": rng.random() < 0.3}
+        if i < case.sales_roles:
+            role.update(commission_percent=0.05, ramp_up_months=rng.randint(1, 6), monthly_quota=rng.randint(100, 300))
+        if case.sales_roles <= i < case.sales_roles + case.state_dependent:
+            role["hire_predictor"] = {"name": "scale_with_customers", "customers_per_person": rng.randint(5, 50)}
+        else:
+            role["hire_predictor"] = {
+                "name": "linear_with_max",
+                "initial_count": 1,
+                "hires_per_year": rng.randint(1, 12),
+                "first_hire_date": date(2022, rng.randint(9, 12), 1).isoformat(),
+                "max_hires": rng.randint(2, 30),
+            }
+        headcount.append(role)
+
+    return Scenario(
+        customer_types=customer_types,
+        headcount=headcount,
+        misc_expenses=[{"name": "Rent", "monthly": 2700}, {"name": "Legal", "annual": 10000}],
+        misc_bizdev_expenses=[{"name": "Tools", "monthly": 400}],
+    )
+
+
+def cases(quick: bool = False) -> List[Case]:
+    """The base case, then each axis scaled up on its own."""
+    base = Case()
+    axes = {
+        "customer_types": (1, 4, 16),
+        "stages": (1, 8),
+        "roles": (2, 16, 64),
+        "sales_roles": (4,),
+        "state_dependent": (1, 4),
+        "months_ahead": (12, 120, 240),
+    }
+    if quick:
+        axes = {axis: values[:1] for axis, values in axes.items()}
+
+    all_cases = [base]
+    for axis, values in axes.items():
+        all_cases.extend(replace(base, **{axis: value}) for value in values if replace(base, **{axis: value}) not in all_cases)
+    return all_cases
+
+
+def components(scenario: Scenario, case: Case) -> Dict[str, Callable[[], object]]:
+    """What's timed for a case, by name. Each runs in a fresh `ForecastSession`, so nothing is cached between runs."""
+    origin = MonthYear.from_date(ACTUALS.accurate_as_of)
+    timed = {
+        f"forecast[{engine}]": (lambda engine=engine: forecast(scenario, ACTUALS, case.months_ahead, engine=engine))
+        for engine in ("scalar", "graph", "vectorized")
+    }
+    timed.update(
+        headcount_plan=lambda: HeadcountPlan(scenario.headcount, origin, case.months_ahead),
+        lead_funnel=lambda: [
+            LeadFunnel(scenario.customer_types, HeadcountPlan(scenario.headcount), origin, case.months_ahead).transitions_of(ct)
+            for ct in scenario.customer_types
+        ],
+        forecast_counts=lambda: forecast_counts(scenario, ACTUALS, case.months_ahead),
+        first_order_frame=lambda: first_order_frame(forecast_counts(scenario, ACTUALS, case.months_ahead), ACTUALS),
+    )
+    return timed
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    seconds = list()
+    for _ in range(repeat):
+        with ForecastSession():
+            start = time.perf_counter()
+            fn()
+            seconds.append(time.perf_counter() - start)
+
+    # Peak memory is measured on its own run, as tracing slows everything down
+    with ForecastSession():
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {"min_seconds": min(seconds), "median_seconds": statistics.median(seconds), "peak_bytes": peak}
+
+
+def run(repeat: int = 3, quick: bool = False, only: Optional[List[str]] = None) -> Dict:
+    results = list()
+    for case in cases(quick):
+        scenario = synthetic_scenario(case)
+        timings = {name: measure(fn, repeat) for name, fn in components(scenario, case).items() if not only or name in only}
+        results.append({"case": case.name, "params": asdict(case), "timings": timings})
+        typer.echo(f"{case.name}: " + ", ".join(f"{name} {t['median_seconds'] * 1000:.1f}ms" for name, t in timings.items()), err=True)
+
+    try:
+        git = subprocess.run(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, capture_output=True, text=True, check=True)
+        commit = git.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "machine": platform.machine(), "repeat": repeat, "results": results}
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Descriptions of the timings at least `threshold` times slower than in the baseline."""
+    baseline_timings = {result["case"]: result["timings"] for result in baseline["results"]}
+    regressions = list()
+    for result in results["results"]:
+        for name, timing in result["timings"].items():
+            before = baseline_timings.get(result["case"], {}).get(name)
+            if before is None:
+                continue
+            ratio = timing["min_seconds"] / before["min_seconds"]
+            typer.echo(f"{result['case']} {name}: {ratio:.2f}x", err=True)
+            # Ignoring sub-millisecond differences, which are mostly noise
+            if ratio >= threshold and timing["min_seconds"] - before["min_seconds"] > 0.001:
+                regressions.append(f"{result['case']} {name}: {before['min_seconds']:.4f}s -> {timing['min_seconds']:.4f}s")
+    return regressions
+
+
+def main(
+    output: Path = Path("benchmark.json"),
+    repeat: int = 3,
+    quick: bool = typer.Option(False, help="Only the smallest value of each axis."),
+    only: Optional[List[str]] = typer.Option(None, help="Only time these (e.g. `forecast[vectorized]`)."),
+    compare_to: Optional[Path] = typer.Option(None, "--compare", help="Results of a previous run, to check for regressions."),
+    threshold: float = typer.Option(1.25, help="How many times slower than the previous run counts as a regression."),
+):
+    results = run(repeat, quick, only)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if compare_to is not None:
+        with open(compare_to) as f:
+            regressions = compare(results, json.load(f), threshold)
+        if regressions:
+            typer.secho("Regressions:\n" + "\n".join(regressions), fg=typer.colors.RED, err=True)
+            raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
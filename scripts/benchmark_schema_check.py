@@ -0,0 +1,73 @@
+"""
+Benchmarks the schema check `pycasting validate` runs before validating scenarios in full (see `pycasting.validation`), against
+jsonschema's `Draft7Validator` made as lenient (built once, like `scenario_validator`), and against validating in full with pydantic:
+
+    python scripts/benchmark_schema_check.py "scenarios/**/*.json"
+
+jsonschema is installed with the dashboard (altair depends on it).
+"""
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import typer
+from jsonschema import Draft7Validator, validators
+from jsonschema.exceptions import ValidationError as SchemaError
+from pydantic import ValidationError
+
+from pycasting.pydanticmodels.predictions import Scenario
+from pycasting.validation import _accepted_types, scenario_paths, scenario_validator
+
+EXAMPLE_SCENARIO = Path(__file__).parents[1] / "examples" / "example_scenario.json"
+
+
+def _type(validator, types, instance, schema):
+    types = [types] if isinstance(types, str) else types
+    if instance is not None and not any(isinstance(instance, _accepted_types.get(t, object)) for t in types):
+        yield SchemaError(f"must be a {types[0]}")
+
+
+def _unless_none(keyword: str):
+    check = Draft7Validator.VALIDATORS[keyword]
+    return lambda validator, value, instance, schema: None if instance is None else check(validator, value, instance, schema)
+
+
+# Accepting what `SchemaValidator` does, so both reject the same files
+LenientValidator = validators.extend(
+    Draft7Validator, {"type": _type, "const": _unless_none("const"), "enum": _unless_none("enum"), "pattern": None}
+)
+
+
+def _is_valid(data: Any) -> bool:
+    try:
+        Scenario(**data)
+        return True
+    except ValidationError:
+        return False
+
+
+def main(paths: List[str] = typer.Argument(None), repeat: int = 3):
+    scenarios = [json.loads(path.read_bytes()) for path in scenario_paths(paths or [EXAMPLE_SCENARIO])]
+    custom, lenient = scenario_validator(), LenientValidator(Scenario.schema())
+    # Whether each rejects a scenario
+    checks: Dict[str, Callable[[Any], bool]] = {
+        "schema_check": lambda data: bool(custom.errors(data)),
+        "jsonschema": lambda data: not lenient.is_valid(data),
+        "pydantic": lambda data: not _is_valid(data),
+    }
+
+    results = dict()
+    for name, check in checks.items():
+        seconds = list()
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rejected = sum(map(check, scenarios))
+            seconds.append(time.perf_counter() - start)
+        results[name] = {"seconds_per_file": min(seconds) / len(scenarios), "rejected": rejected}
+
+    typer.echo(json.dumps({"files": len(scenarios), "repeat": repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    typer.run(main)
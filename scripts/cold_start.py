@@ -0,0 +1,38 @@
+"""
+Measures cold-start time of the headless CLI: fresh interpreters importing `pycasting.main`, and running a forecast end to end. Also
+checks the dashboard stack isn't imported along the way.
+"""
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import typer
+
+EXAMPLE_SCENARIO = Path(__file__).parents[1] / "examples" / "example_scenario.json"
+DASHBOARD_MODULES = ("streamlit", "altair", "numerize")
+
+
+def _seconds(args) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *args], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(scenario: Path = EXAMPLE_SCENARIO, months_ahead: int = 18, repeat: int = 5):
+    check = f"import sys, pycasting.main; assert not {{m for m in sys.modules if m.split('.')[0] in {DASHBOARD_MODULES}}}"
+    subprocess.run([sys.executable, "-c", check], check=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run = ["-m", "pycasting.main", "run", str(scenario), "--months-ahead", str(months_ahead), "-o", str(Path(tmp) / "forecast.csv")]
+        imports = [_seconds(["-c", "import pycasting.main"]) for _ in range(repeat)]
+        runs = [_seconds(run) for _ in range(repeat)]
+
+    typer.echo(json.dumps({"import_seconds": statistics.median(imports), "run_seconds": statistics.median(runs), "repeat": repeat}))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -1,4 +1,7 @@
-"""Generates the json schema for top-level pydantic objects"""
+"""
+Generates the json schema for top-level pydantic objects. `pycasting validate` checks scenario files against the same schema (before
+validating them in full).
+"""
 import os
 from pathlib import Path
 
@@ -8,7 +11,7 @@ from slugify import slugify
 from pycasting.pydanticmodels.predictions import Scenario
 
 
-def main(output_dir: Path = "generated/schema"):
+def main(output_dir: Path = Path("generated/schema")):
     classes = [
         Scenario,
     ]
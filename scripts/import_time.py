@@ -0,0 +1,52 @@
+"""
+Reports the import time of a module (`python -X importtime`, in a fresh interpreter), and checks it against a budget. Exits non-zero
+when over budget, so it can gate CI.
+"""
+import json
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+import typer
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module: str) -> List[Tuple[str, float, float]]:
+    """(module, self seconds, cumulative seconds) of everything importing `module` imports, in a fresh interpreter."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], check=True, capture_output=True, text=True).stderr
+
+    times = list()
+    for line in stderr.splitlines():
+        if match := _IMPORT_TIME_LINE.match(line):
+            self_us, cumulative_us, _, name = match.groups()
+            times.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return times
+
+
+def report(module: str, top: int = 10) -> Dict:
+    times = import_times(module)
+    total = sum(self_seconds for _, self_seconds, _ in times)
+    own = sum(self_seconds for name, self_seconds, _ in times if name.split(".")[0] == "pycasting")
+    slowest = sorted(times, key=lambda t: t[2], reverse=True)[:top]
+    return {
+        "module": module,
+        "total_seconds": total,
+        "pycasting_seconds": own,
+        "slowest": [{"module": name, "self_seconds": s, "cumulative_seconds": c} for name, s, c in slowest],
+    }
+
+
+def main(module: str = "pycasting.pydanticmodels.predictions", budget: float = 1.0, pycasting_budget: float = 0.1, top: int = 10):
+    """Budgets are in seconds: `budget` for the whole import, `pycasting_budget` for pycasting's own modules."""
+    result = report(module, top)
+    typer.echo(json.dumps(result, indent=2))
+
+    if result["total_seconds"] > budget or result["pycasting_seconds"] > pycasting_budget:
+        typer.secho(f"Importing {module} is over budget", fg=typer.colors.RED, err=True)
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
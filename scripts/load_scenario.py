@@ -1,11 +1,16 @@
-import json
+"""Loads a scenario, and prints it. To validate scenarios, see `pycasting validate`."""
+from pathlib import Path
 
-from pycasting.pydanticmodels.predictions import Scenario
+import typer
+
+from pycasting.loading import load_scenario
+
+EXAMPLE_SCENARIO = Path(__file__).parents[1] / "examples" / "example_scenario.json"
 
-if __name__ == "__main__":
-    with open("../examples/example_scenario.json") as f:
-        data = json.load(f)
 
-    sample = Scenario(**data)
+def main(path: Path = typer.Argument(EXAMPLE_SCENARIO)):
+    typer.echo(load_scenario(path))
 
-    print(sample)
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,2 @@
+# Kept in sync with pyproject.toml. Part of persistent cache keys, so results of other versions aren't reused.
+__version__ = "0.0.1a1"
@@ -1,23 +1,23 @@
 """
 Cashflow calculations. Incoming, outgoing, reserves.
 """
-from functools import lru_cache
 from typing import Optional, Tuple
 
 from pycasting.calc.customers import new_customers, total_customers, customer_ages
-from pycasting.calc.headcount import hires_through_effective_date
+from pycasting.calc.headcount import headcount_plan
 from pycasting.calc.predictors import PredictedCompanyState
 from pycasting.calc.sales import new_transitions
+from pycasting.calc.session import memoize, instrument
 from pycasting.calc.usage import estimate_usage, estimate_total_usage
 from pycasting.pydanticmodels.actuals import Actuals
 from pycasting.pydanticmodels.predictions import CustomerType, Scenario
-from pycasting.misc import MonthYear, UFloat
+from pycasting.misc import MonthYear, UFloat, exact
 
 
-@lru_cache
+@memoize
 def monthly_revenue(scenario: Scenario, actuals: Actuals, effective_month_year: MonthYear, customer_type: Optional[CustomerType]) -> UFloat:
     """Calculate income from given customer type (or all customers)"""
-    income = UFloat(0, 0)
+    income = exact(0)
     if customer_type is None:
         return sum(monthly_revenue(scenario, actuals, effective_month_year, ct) for ct in scenario.customer_types)
     else:
@@ -43,10 +43,11 @@ def monthly_revenue(scenario: Scenario, actuals: Actuals, effective_month_year:
         return income
 
 
+@instrument
 def monthly_expenses(scenario: Scenario, actuals: Actuals, effective_month_year: MonthYear) -> Tuple[UFloat, UFloat]:
     """Calculate expenses for a month. Returns tuple of (total expenses, CAC expenses)"""
-    expenses = UFloat(0, 0)
-    cac_expenses = UFloat(0, 0)
+    expenses = exact(0)
+    cac_expenses = exact(0)
 
     state: PredictedCompanyState = PredictedCompanyState(
         number_of_customers=total_customers(scenario, actuals, effective_month_year, None), actuals=actuals
@@ -64,11 +65,12 @@ def monthly_expenses(scenario: Scenario, actuals: Actuals, effective_month_year:
         cac_expenses += marketing_expenses
 
     # Salaries etc.
+    hires = headcount_plan(scenario)
     for role in scenario.headcount:
         role_cost = (
             role.monthly_salary + (role.monthly_salary * scenario.employee_costs.annual_percent + scenario.employee_costs.annual_fixed) / 12
         )
-        total_role_cost = role_cost * hires_through_effective_date(effective_month_year.end_of_month, role, state)
+        total_role_cost = role_cost * hires.hires_through(role, effective_month_year, state)
         expenses += total_role_cost
 
         if role.customer_acquisition:
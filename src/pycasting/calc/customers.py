@@ -2,16 +2,18 @@
 Calculation of customers...totals etc.
 """
 from collections import Counter
-from functools import lru_cache
-from typing import Dict, Optional
+from typing import Callable, Optional
+
+import numpy as np
 
 from pycasting.calc.sales import new_transitions
+from pycasting.calc.session import memoize
 from pycasting.misc import MonthYear
 from pycasting.pydanticmodels.actuals import Actuals
 from pycasting.pydanticmodels.predictions import Scenario, CustomerType
 
 
-@lru_cache
+@memoize
 def new_customers(scenario: Scenario, month_year: MonthYear, customer_type: Optional[CustomerType]) -> int:
     """New customers of a given type in a given month"""
     if customer_type is None:
@@ -19,13 +21,13 @@ def new_customers(scenario: Scenario, month_year: MonthYear, customer_type: Opti
     return new_transitions(scenario, month_year, None, customer_type)
 
 
-@lru_cache
+@memoize
 def churned_customers(scenario: Scenario, actuals: Actuals, month_year: MonthYear, customer_type: CustomerType) -> int:
     """Customers of a given type who leave in a given month."""
     return round(customer_type.churn * total_customers(scenario, actuals, month_year.shift_month(-1), customer_type))
 
 
-@lru_cache
+@memoize
 def total_customers(scenario: Scenario, actuals: Actuals, month_year: MonthYear, customer_type: Optional[CustomerType]) -> int:
     """Total customers at end of the given month."""
     if customer_type is None:
@@ -34,32 +36,86 @@ def total_customers(scenario: Scenario, actuals: Actuals, month_year: MonthYear,
     if month_year < actuals.first_unknown_month_year:
         return actuals.active_customers.get(customer_type.name, 0)
     else:
-        return customer_ages(scenario, actuals, month_year, customer_type).total()
+        return int(cohort_simulator(scenario, actuals, customer_type).snapshot(month_year).sum())
+
+
+class CohortSimulator:
+    """
+    Simulates customers of one type joining and churning, advancing one month at a time from `first_month_year`. The cohort state
+    (customers by start month) of every simulated month is kept, so any month can be read back without re-simulating.
+    """
+
+    def __init__(self, first_month_year: MonthYear, churn: float, new_customers: Callable[[int], int]):
+        """`new_customers` gives the number of customers joining `n` months after `first_month_year`."""
+        self.first_month_year = first_month_year
+        self.churn = churn
+        self._new_customers = new_customers
+        self._simulated = 0
+        # Row `n` is the cohort state at the end of month `n`. Only the first `n + 1` columns of it can be populated.
+        self._snapshots = np.zeros((0, 0), dtype=np.int64)
+
+    def advance(self, months: int):
+        """Simulate the first `months` months, if not done already."""
+        if months > len(self._snapshots):
+            capacity = max(months, 2 * len(self._snapshots))
+            snapshots = np.zeros((capacity, capacity), dtype=np.int64)
+            snapshots[: self._simulated, : self._simulated] = self._snapshots[: self._simulated, : self._simulated]
+            self._snapshots = snapshots
+
+        for month in range(self._simulated, months):
+            cohort = self._snapshots[month, : month + 1]
+            if month > 0:
+                cohort[:month] = self._snapshots[month - 1, :month]
+
+            # Customers join, this month
+            cohort[month] = self._new_customers(month)
+
+            # ...and they churn, since the beginning.
+            # TODO split out to churn predictor
+            # For now, we assume a simple churning formula. All customers have an equal chance of churning.
+            # So, for each month, the churned count is
+            # (% of customers in that month bucket) * (total expected churn this month)
+            # == customers in month * churn %
+            cohort -= np.rint(cohort * self.churn).astype(np.int64)
+
+        self._simulated = max(self._simulated, months)
 
+    def snapshot(self, month_year: MonthYear) -> np.ndarray:
+        """Customers at the end of `month_year`, by start month (index 0 is `first_month_year`)."""
+        months = month_year.months_since(self.first_month_year) + 1
+        if months <= 0:
+            return np.zeros(0, dtype=np.int64)
 
-@lru_cache
+        self.advance(months)
+        return self._snapshots[months - 1, :months]
+
+    def snapshots(self, months: int) -> np.ndarray:
+        """Cohort states at the end of each of the first `months` months, as rows."""
+        self.advance(months)
+        return self._snapshots[:months, :months]
+
+
+@memoize(grows=True)
+def cohort_simulator(scenario: Scenario, actuals: Actuals, customer_type: CustomerType) -> CohortSimulator:
+    """Shared simulator of customers of the given type, starting from the first month not covered by actuals."""
+    first_month_year = actuals.first_unknown_month_year
+    return CohortSimulator(
+        first_month_year,
+        customer_type.churn,
+        lambda month: new_customers(scenario, first_month_year.shift_month(month), customer_type),
+    )
+
+
+@memoize
 def customer_ages(scenario: Scenario, actuals: Actuals, month_year: MonthYear, customer_type: CustomerType) -> Counter[MonthYear]:
     """Returns the distribution of customer ages...a mapping of customer start to # of customers who started in that month."""
     # This is a similar problem to apportionment, interestingly.
     if month_year < actuals.first_unknown_month_year:
         return Counter()
 
-    # Starting with the actual # of customers and actuals accurate_as_of date, simulate starting and churning customers
-    # each month.
-    customers: Counter[MonthYear] = Counter()
-
-    for my in MonthYear.between(actuals.first_unknown_month_year, month_year):
-        # Customers join, this month
-        customers.update({my: new_customers(scenario, my, customer_type)})
-
-        # ...and they churn, since the beginning.
-        # TODO split out to churn predictor
-        # For now, we assume a simple churning formula. All customers have an equal chance of churning.
-        # So, for each month, the churned count is
-        # (% of customers in that month bucket) * (total expected churn this month)
-        # == customers in month * churn %
-
-        churn_counts: Dict[MonthYear, int] = {k: round(v * customer_type.churn) for k, v in customers.items()}
-        customers.subtract(churn_counts)
+    # Starting with the actual # of customers and actuals accurate_as_of date, customers start and churn each month. That's simulated
+    # once per customer type, and we just read off this month.
+    simulator = cohort_simulator(scenario, actuals, customer_type)
+    snapshot = simulator.snapshot(month_year)
 
-    return customers
+    return Counter({simulator.first_month_year.shift_month(i): int(count) for i, count in enumerate(snapshot)})
@@ -1,57 +1,191 @@
 """
 Top-level forecasting and collection logic. Outputs data etc. to be dashboarded
 """
-import math
-from typing import Dict
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
 from pycasting.calc.cashflow import monthly_revenue, monthly_expenses
-from pycasting.misc import MonthYear, UFloat
+from pycasting.calc.customers import new_customers
+from pycasting.calc.graph import graph_months
+from pycasting.calc.montecarlo import montecarlo_forecast
+from pycasting.calc.persistent import ResultCache, fingerprint
+from pycasting.calc.session import memoize
+from pycasting.calc.vectorized import vectorized_forecast, forecast_frame
+from pycasting.misc import MonthYear, UFloat, exact
 from pycasting.pydanticmodels.actuals import Actuals
 from pycasting.pydanticmodels.predictions import Scenario
+from pycasting.uncertainty import UncertaintyBackend, get_uncertainty_backend, nominal_value, std_dev
 
 
-def forecast(scenario: Scenario, actuals: Actuals, months_ahead: int):
+class ForecastEngine(Enum):
+    scalar = "scalar"
+    vectorized = "vectorized"
+    montecarlo = "montecarlo"
+    graph = "graph"
+
+
+def forecast(
+    scenario: Scenario,
+    actuals: Actuals,
+    months_ahead: int,
+    engine: Union[ForecastEngine, str] = ForecastEngine.scalar,
+    samples: int = 10_000,
+    seed: Optional[int] = None,
+    uncertainty: Union[UncertaintyBackend, str] = "linear",
+    cache: Optional[ResultCache] = None,
+):
     """
     Generate forecast in dataframe format.
+
+    `engine` selects how it's calculated: `scalar` walks the horizon month by month through the cached calc functions, `vectorized`
+    computes every series for the whole horizon at once as arrays, and `graph` evaluates every quantity of the horizon as one dependency
+    graph (see `pycasting.calc.graph`). All produce the same columns. `montecarlo` adds p5/p50/p95 columns from evaluating the model over
+    `samples` samples of the uncertain inputs, drawn with the given `seed`.
+
+    `uncertainty` selects the backend used to propagate uncertainty in the `scalar` and `graph` engines (see `pycasting.uncertainty`).
+    For those, see `iter_forecast` to generate the forecast month by month instead.
+
+    With a `cache`, the forecast is looked up in (and stored to) it, by a fingerprint of the inputs it depends on.
+    """
+    engine = ForecastEngine(engine)
+    if cache is not None:
+        if engine is ForecastEngine.montecarlo:
+            options = (samples, seed)
+        elif engine is ForecastEngine.vectorized:
+            options = ()
+        else:
+            options = (get_uncertainty_backend(uncertainty).__class__.__name__,)
+        key = fingerprint("forecast", scenario, actuals, months_ahead, engine, *options)
+        return cache.get_or_compute(
+            key, lambda: forecast(scenario, actuals, months_ahead, engine=engine, samples=samples, seed=seed, uncertainty=uncertainty)
+        )
+
+    if engine is ForecastEngine.vectorized:
+        return vectorized_forecast(scenario, actuals, months_ahead)
+    elif engine is ForecastEngine.montecarlo:
+        return montecarlo_forecast(scenario, actuals, months_ahead, samples=samples, seed=seed)
+
+    builder = ForecastFrameBuilder([ct.name for ct in scenario.customer_types], months_ahead)
+    for month in iter_forecast(scenario, actuals, months_ahead, engine, uncertainty):
+        builder.append(month)
+    return builder.frame()
+
+
+@dataclass(frozen=True)
+class ForecastMonth:
+    """A month of a forecast. Values are in the representation of the uncertainty backend used."""
+
+    month_year: MonthYear
+    revenue: UFloat
+    expenses: UFloat
+    cac_expenses: UFloat
+    cashflow: UFloat
+    cash_on_hand: UFloat
+    new_customers: int
+    revenue_per_customer: Dict[str, UFloat]
+
+
+def iter_forecast(
+    scenario: Scenario,
+    actuals: Actuals,
+    months_ahead: int,
+    engine: Union[ForecastEngine, str] = ForecastEngine.scalar,
+    uncertainty: Union[UncertaintyBackend, str] = "linear",
+) -> Iterator[ForecastMonth]:
+    """
+    Generate a forecast month by month, with the `scalar` or `graph` engine (see `forecast`). With the `scalar` engine, each month is
+    only calculated when asked for, so stopping early (e.g. once cash on hand goes negative) skips the rest of the horizon.
+    """
+    engine = ForecastEngine(engine)
+    scenario = prepared_scenario(scenario, get_uncertainty_backend(uncertainty))
+    if engine is ForecastEngine.graph:
+        months = graph_months(scenario, actuals, months_ahead)
+    elif engine is ForecastEngine.scalar:
+        months = scalar_months(scenario, actuals, months_ahead)
+    else:
+        raise ValueError(f"Can't forecast month by month with the {engine.value} engine")
+
+    cash_on_hand: UFloat = exact(actuals.cash_on_hand)
+
+    for month_year, rev_per_customer, exp, cac_exp, new in months:
+        rev: UFloat = sum(rev_per_customer.values())
+        cashflow = rev - exp
+        cash_on_hand = cash_on_hand + cashflow
+
+        yield ForecastMonth(
+            month_year=month_year,
+            revenue=rev,
+            expenses=exp,
+            cac_expenses=cac_exp,
+            cashflow=cashflow,
+            cash_on_hand=cash_on_hand,
+            new_customers=new,
+            revenue_per_customer=rev_per_customer,
+        )
+
+
+class ForecastFrameBuilder:
     """
+    Collects `ForecastMonth`s into columns of (nominal, std dev) arrays, preallocated for the expected number of months, and lays them
+    out as the dataframe of `forecast` once done.
+    """
+
+    _columns = ("revenue", "expenses", "cac_expenses", "cashflow", "cash_on_hand")
 
-    data = list()
+    def __init__(self, customer_types: Sequence[str], months: int = 12):
+        self.month_years: List[MonthYear] = list()
+        self._values = {name: np.empty((2, max(months, 1))) for name in self._columns}
+        self._new_customers = np.empty(max(months, 1), dtype=np.int64)
+        self._revenue_per_customer = {name: np.empty((2, max(months, 1))) for name in customer_types}
 
-    cash_on_hand: UFloat = UFloat(actuals.cash_on_hand, 0)
+    def __len__(self):
+        return len(self.month_years)
 
+    def append(self, month: ForecastMonth):
+        row = len(self)
+        if row == self._values["revenue"].shape[1]:
+            # Double, like a list
+            for arrays in (self._values, self._revenue_per_customer):
+                for name, values in arrays.items():
+                    arrays[name] = np.concatenate([values, np.empty_like(values)], axis=1)
+            self._new_customers = np.concatenate([self._new_customers, np.empty_like(self._new_customers)])
+
+        for name in self._columns:
+            value = getattr(month, name)
+            self._values[name][:, row] = nominal_value(value), std_dev(value)
+        self._new_customers[row] = month.new_customers
+        for name, value in month.revenue_per_customer.items():
+            self._revenue_per_customer[name][:, row] = nominal_value(value), std_dev(value)
+        self.month_years.append(month.month_year)
+
+    def frame(self) -> pd.DataFrame:
+        rows = len(self)
+        return forecast_frame(
+            self.month_years,
+            **{name: (values[0, :rows], values[1, :rows]) for name, values in self._values.items()},
+            new_customers=self._new_customers[:rows],
+            revenue_per_customer={name: (values[0, :rows], values[1, :rows]) for name, values in self._revenue_per_customer.items()},
+        )
+
+
+def scalar_months(
+    scenario: Scenario, actuals: Actuals, months_ahead: int
+) -> Iterator[Tuple[MonthYear, Dict[str, UFloat], UFloat, UFloat, int]]:
+    """(month, revenue per customer type, expenses, CAC expenses, new customers) of each forecast month, from the calc functions."""
     for shift in range(0, months_ahead):
         month_year = MonthYear.from_date(actuals.accurate_as_of).shift_month(shift)
 
         rev_per_customer: Dict[str, UFloat] = {
             ct.name: monthly_revenue(scenario, actuals, month_year, ct) for ct in scenario.customer_types
         }
-        rev: UFloat = sum(rev_per_customer.values())
-        exp, cac_exp = monthly_expenses(scenario, actuals, month_year)
-
-        cash_on_hand = cash_on_hand + rev - exp
-
-        row = {
-            "month": month_year.month,
-            "year": month_year.year,
-            "month_year": repr(month_year),
-            "eom_date": month_year.end_of_month,
-            "revenue": rev.nominal_value,
-            "revenue_stddev": rev.std_dev,
-            "expenses": exp.nominal_value,
-            "expenses_stddev": exp.std_dev,
-            "cac_expenses": cac_exp.nominal_value,
-            "cac_expenses_stddev": cac_exp.std_dev,
-            "cashflow": (rev - exp).nominal_value,
-            "cashflow_stddev": (rev - exp).std_dev,
-            "cash_on_hand": cash_on_hand.nominal_value,
-            "cash_on_hand_stddev": cash_on_hand.std_dev,
-        }
-
-        row.update({f"revenue__{k}": v.n for k, v in rev_per_customer.items()})
-        row.update({f"revenue_stddev__{k}": v.s for k, v in rev_per_customer.items()})
+        yield (month_year, rev_per_customer, *monthly_expenses(scenario, actuals, month_year), new_customers(scenario, month_year, None))
 
-        data.append(row)
 
-    return pd.DataFrame(data)
+@memoize
+def prepared_scenario(scenario: Scenario, backend: UncertaintyBackend) -> Scenario:
+    """The scenario with its uncertain inputs in the representation of the given backend. Kept so repeated forecasts share caches."""
+    return backend.prepare(scenario)
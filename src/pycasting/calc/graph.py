@@ -0,0 +1,370 @@
+"""
+Dependency graph evaluation. Rather than calc functions calling (and caching) each other, every quantity of a forecast is a `Node` of
+a graph: a quantity, a month, and the customer type/role/etc. it's for. Each quantity declares the nodes it depends on, and nodes are
+evaluated iteratively in topological order, so evaluation order is explicit and there's no recursion.
+
+    graph = ForecastGraph(scenario, actuals)
+    graph.add(Node("revenue", month_year, customer_type))
+    for level in graph.levels():
+        ...  # nodes of a level only depend on earlier levels, so can be evaluated in any order, or in parallel
+    revenue, = graph.evaluate(Node("revenue", month_year, customer_type))
+
+Results match the scalar calc functions, which each quantity mirrors.
+"""
+import contextvars
+from collections import Counter
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from pycasting.calc.predictors import PredictedCompanyState, PredictorCategory, predictor_plan
+from pycasting.calc.sales import funnel_kernel
+from pycasting.calc.session import instrument
+from pycasting.calc.usage import estimate_usage
+from pycasting.misc import MonthYear, UFloat, exact
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario, SalesRole, CustomerType
+
+
+class Node(NamedTuple):
+    quantity: str
+    month_year: MonthYear
+    # Customer type, role, etc. (or a tuple of them) the quantity is for. `None` for company-wide quantities.
+    key: Any = None
+
+
+# Per quantity: (dependencies, compute). Both are called with the graph and the node.
+_quantities: Dict[str, Tuple[Callable[["ForecastGraph", Node], Iterable[Node]], Callable[["ForecastGraph", Node], Any]]] = dict()
+
+
+def quantity(name: str, depends_on: Callable[["ForecastGraph", Node], Iterable[Node]] = lambda graph, node: ()):
+    """
+    Decorate the function computing a quantity, given its graph and node. `depends_on` gives the nodes it reads (with `graph[node]`),
+    which are evaluated before it.
+    """
+
+    def with_register(fn):
+        _quantities[name] = depends_on, instrument(fn, f"graph:{name}")
+
+        return fn
+
+    return with_register
+
+
+class ForecastGraph:
+    """The graph of nodes needed for the quantities asked for, with the values of those evaluated so far."""
+
+    def __init__(self, scenario: Scenario, actuals: Actuals):
+        self.scenario = scenario
+        self.actuals = actuals
+        self.dependencies: Dict[Node, Tuple[Node, ...]] = dict()
+        self.values: Dict[Node, Any] = dict()
+
+    def __len__(self):
+        return len(self.dependencies)
+
+    def __getitem__(self, node: Node) -> Any:
+        return self.values[node]
+
+    def add(self, *nodes: Node):
+        """Add nodes, and everything they depend on, to the graph."""
+        pending = [node for node in nodes if node not in self.dependencies]
+        while pending:
+            node = pending.pop()
+            if node in self.dependencies:
+                continue
+            depends_on, _ = _quantities[node.quantity]
+            self.dependencies[node] = tuple(depends_on(self, node))
+            pending.extend(dependency for dependency in self.dependencies[node] if dependency not in self.dependencies)
+
+    def levels(self) -> List[List[Node]]:
+        """Nodes of the graph in topological order, grouped so nodes of a level only depend on nodes of earlier levels."""
+        remaining = {node: len(dependencies) for node, dependencies in self.dependencies.items()}
+        dependents: Dict[Node, List[Node]] = {node: list() for node in self.dependencies}
+        for node, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                dependents[dependency].append(node)
+
+        levels = list()
+        level = [node for node, count in remaining.items() if count == 0]
+        while level:
+            levels.append(level)
+            next_level = list()
+            for node in level:
+                for dependent in dependents[node]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        next_level.append(dependent)
+            level = next_level
+
+        return levels
+
+    def evaluate(self, *nodes: Node, executor: Optional[Executor] = None) -> List[Any]:
+        """
+        Values of the given nodes, evaluating them (and their dependencies) if not done already. Nodes of each level are evaluated in
+        order, or with `executor` if given.
+        """
+        self.add(*nodes)
+        for level in self.levels():
+            pending = [node for node in level if node not in self.values]
+            if executor is None or len(pending) < 2:
+                results: Iterator = map(self._compute, pending)
+            else:
+                # In the same context (and so memoized in the same session)
+                context = contextvars.copy_context()
+                results = executor.map(lambda node: context.copy().run(self._compute, node), pending)
+            for node, value in zip(pending, results):
+                self.values[node] = value
+
+        return [self.values[node] for node in nodes]
+
+    def _compute(self, node: Node) -> Any:
+        _, compute = _quantities[node.quantity]
+        return compute(self, node)
+
+
+"""
+Headcount. Mirrors `HeadcountPlan`.
+"""
+
+
+def _hires_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    if predictor_plan(PredictorCategory.headcount, node.key.hire_predictor).state_dependent:
+        yield Node("total_customers", node.month_year)
+
+
+@quantity("hires", _hires_dependencies)
+def hires(graph: ForecastGraph, node: Node) -> int:
+    """Hires of a role through the end of the month."""
+    plan = predictor_plan(PredictorCategory.headcount, node.key.hire_predictor)
+    state = None
+    if plan.state_dependent:
+        state = PredictedCompanyState(number_of_customers=graph[Node("total_customers", node.month_year)], actuals=graph.actuals)
+    return round(plan(node.month_year.end_of_month, state=state))
+
+
+@quantity(
+    "hires_in_month",
+    lambda graph, node: (Node("hires", node.month_year, node.key), Node("hires", node.month_year.shift_month(-1), node.key)),
+)
+def hires_in_month(graph: ForecastGraph, node: Node) -> int:
+    return graph[Node("hires", node.month_year, node.key)] - graph[Node("hires", node.month_year.shift_month(-1), node.key)]
+
+
+def _effective_reps_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    yield Node("hires", node.month_year.shift_month(-node.key.ramp_up_months), node.key)
+    for months_ago in range(0, node.key.ramp_up_months):
+        yield Node("hires_in_month", node.month_year.shift_month(-months_ago), node.key)
+
+
+@quantity("effective_reps", _effective_reps_dependencies)
+def effective_reps(graph: ForecastGraph, node: Node) -> float:
+    """Effective sales reps of a sales role, with those hired in the last `ramp_up_months` prorated."""
+    ramp_up_months = node.key.ramp_up_months
+    effectiveness_increase_per_month = 1 / ramp_up_months
+
+    reps = graph[Node("hires", node.month_year.shift_month(-ramp_up_months), node.key)]
+    for months_ago in range(0, ramp_up_months):
+        effectiveness = effectiveness_increase_per_month * (1 + months_ago)
+        reps = reps + graph[Node("hires_in_month", node.month_year.shift_month(-months_ago), node.key)] * effectiveness
+    return reps
+
+
+def _sales_roles(scenario: Scenario) -> List[SalesRole]:
+    return [role for role in scenario.headcount if isinstance(role, SalesRole)]
+
+
+@quantity(
+    "sales_quota",
+    lambda graph, node: [Node("effective_reps", node.month_year, role) for role in _sales_roles(graph.scenario)],
+)
+def sales_quota(graph: ForecastGraph, node: Node) -> float:
+    quota = 0.0
+    for role in _sales_roles(graph.scenario):
+        quota = quota + role.monthly_quota * graph[Node("effective_reps", node.month_year, role)]
+    return quota
+
+
+"""
+Leads and customers. Mirrors `LeadFunnel` and `CohortSimulator`.
+"""
+
+
+def _transitions_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    customer_type, stage = node.key
+    if stage == 0:
+        yield Node("sales_quota", node.month_year)
+    else:
+        kernel = funnel_kernel(customer_type.lead_config.stages[:stage])
+        for i in range(len(kernel.weights)):
+            yield Node("transitions", node.month_year.shift_month(-kernel.lag - i), (customer_type, 0))
+
+
+@quantity("transitions", _transitions_dependencies)
+def transitions(graph: ForecastGraph, node: Node) -> int:
+    """Transitions into stage number `stage` of a customer type (or new customers, past the last stage), keyed `(customer type, stage)`."""
+    customer_type, stage = node.key
+    if stage == 0:
+        return round(graph[Node("sales_quota", node.month_year)])
+
+    # Summed directly, from the furthest back. (Long kernels are convolved with FFTs in `FunnelKernel`, which can round differently.)
+    kernel = funnel_kernel(customer_type.lead_config.stages[:stage])
+    proportional_transitions = sum(
+        weight * (graph[Node("transitions", node.month_year.shift_month(-kernel.lag - i), (customer_type, 0))] / 30)
+        for i, weight in reversed(list(enumerate(kernel.weights)))
+    )
+    return round(kernel.conversion_rate * proportional_transitions)
+
+
+def _new_customers(customer_type: CustomerType, month_year: MonthYear) -> Node:
+    return Node("transitions", month_year, (customer_type, len(customer_type.lead_config.stages)))
+
+
+def _cohort_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    first_month_year = graph.actuals.first_unknown_month_year
+    if node.month_year >= first_month_year:
+        yield _new_customers(node.key, node.month_year)
+        if node.month_year > first_month_year:
+            yield Node("cohort", node.month_year.shift_month(-1), node.key)
+
+
+@quantity("cohort", _cohort_dependencies)
+def cohort(graph: ForecastGraph, node: Node) -> np.ndarray:
+    """Customers of a type at the end of the month, by start month from the first unknown month."""
+    month = node.month_year.months_since(graph.actuals.first_unknown_month_year)
+    customers = np.zeros(max(month + 1, 0), dtype=np.int64)
+    if month < 0:
+        return customers
+
+    if month > 0:
+        customers[:month] = graph[Node("cohort", node.month_year.shift_month(-1), node.key)]
+    customers[month] = graph[_new_customers(node.key, node.month_year)]
+    customers -= np.rint(customers * node.key.churn).astype(np.int64)
+    return customers
+
+
+def _customer_ages(graph: ForecastGraph, customer_type: CustomerType, month_year: MonthYear) -> Counter:
+    first_month_year = graph.actuals.first_unknown_month_year
+    if month_year < first_month_year:
+        return Counter()
+    customers = graph[Node("cohort", month_year, customer_type)]
+    return Counter({first_month_year.shift_month(i): int(count) for i, count in enumerate(customers)})
+
+
+def _total_customers_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    if node.key is None:
+        return [Node("total_customers", node.month_year, ct) for ct in graph.scenario.customer_types]
+    return [Node("cohort", node.month_year, node.key)]
+
+
+@quantity("total_customers", _total_customers_dependencies)
+def total_customers(graph: ForecastGraph, node: Node) -> int:
+    """Total customers of a type (or of every type) at the end of the month."""
+    if node.key is None:
+        return sum(graph[Node("total_customers", node.month_year, ct)] for ct in graph.scenario.customer_types)
+    if node.month_year < graph.actuals.first_unknown_month_year:
+        return graph.actuals.active_customers.get(node.key.name, 0)
+    return int(graph[Node("cohort", node.month_year, node.key)].sum())
+
+
+"""
+Cashflow. Mirrors `monthly_revenue` and `monthly_expenses`.
+"""
+
+
+def _revenue_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    customer_type = node.key
+    month_year = node.month_year.shift_month(-customer_type.payment_months_behind)
+    return [
+        _new_customers(customer_type, month_year),
+        Node("total_customers", month_year, customer_type),
+        Node("cohort", month_year, customer_type),
+    ]
+
+
+@quantity("revenue", _revenue_dependencies)
+def revenue(graph: ForecastGraph, node: Node) -> UFloat:
+    """Income from a customer type, collected in the month."""
+    customer_type = node.key
+    month_year = node.month_year.shift_month(-customer_type.payment_months_behind)
+
+    income = exact(0)
+    income += graph[_new_customers(customer_type, month_year)] * customer_type.setup_fee
+    income += graph[Node("total_customers", month_year, customer_type)] * customer_type.monthly_fee
+    for customer_start, count in _customer_ages(graph, customer_type, month_year).items():
+        income += estimate_usage(customer_type, customer_start, month_year) * customer_type.usage_fee * count
+    return income
+
+
+@quantity("total_usage", lambda graph, node: [Node("cohort", node.month_year, node.key)])
+def total_usage(graph: ForecastGraph, node: Node) -> UFloat:
+    """Mirrors `estimate_total_usage`."""
+    customer_ages = _customer_ages(graph, node.key, node.month_year)
+    return sum(estimate_usage(node.key, customer_start, node.month_year) for customer_start in customer_ages)
+
+
+def _expenses_dependencies(graph: ForecastGraph, node: Node) -> Iterable[Node]:
+    month_year, scenario = node.month_year, graph.scenario
+    yield Node("total_customers", month_year)
+    for customer_type in scenario.customer_types:
+        yield Node("transitions", month_year, (customer_type, 0))
+        yield Node("total_usage", month_year, customer_type)
+    for role in scenario.headcount:
+        yield Node("hires", month_year, role)
+
+
+@quantity("expenses", _expenses_dependencies)
+def expenses(graph: ForecastGraph, node: Node) -> Tuple[UFloat, UFloat]:
+    """(total expenses, CAC expenses) of the month."""
+    month_year, scenario = node.month_year, graph.scenario
+    total = exact(0)
+    cac = exact(0)
+
+    for customer_type in scenario.customer_types:
+        lead_config = customer_type.lead_config
+        new_qualified_leads = graph[Node("transitions", month_year, (customer_type, 0))]
+        marketing_expenses = lead_config.cost_per_ad_click * new_qualified_leads / lead_config.qualified_lead_to_click_ratio
+        total += marketing_expenses
+        cac += marketing_expenses
+
+    for role in scenario.headcount:
+        role_cost = (
+            role.monthly_salary + (role.monthly_salary * scenario.employee_costs.annual_percent + scenario.employee_costs.annual_fixed) / 12
+        )
+        total_role_cost = role_cost * graph[Node("hires", month_year, role)]
+        total += total_role_cost
+        if role.customer_acquisition:
+            cac += total_role_cost
+
+    for customer_type in scenario.customer_types:
+        monthly_usage = graph[Node("total_usage", month_year, customer_type)]
+        total += customer_type.cogs.monthly + customer_type.cogs.per_usage * monthly_usage
+
+    for exp in scenario.misc_expenses:
+        total += exp.monthly
+
+    for exp in scenario.misc_bizdev_expenses:
+        total += exp.monthly
+        cac += exp.monthly
+
+    return total, cac
+
+
+def graph_months(
+    scenario: Scenario, actuals: Actuals, months_ahead: int, executor: Optional[Executor] = None
+) -> Iterator[Tuple[MonthYear, Dict[str, UFloat], UFloat, UFloat, int]]:
+    """(month, revenue per customer type, expenses, CAC expenses, new customers) of each forecast month, evaluated as one graph."""
+    graph = ForecastGraph(scenario, actuals)
+    month_years = [MonthYear.from_date(actuals.accurate_as_of).shift_month(shift) for shift in range(months_ahead)]
+    graph.evaluate(
+        *(Node("revenue", month_year, ct) for month_year in month_years for ct in scenario.customer_types),
+        *(Node("expenses", month_year) for month_year in month_years),
+        *(_new_customers(ct, month_year) for month_year in month_years for ct in scenario.customer_types),
+        executor=executor,
+    )
+
+    for month_year in month_years:
+        rev_per_customer = {ct.name: graph[Node("revenue", month_year, ct)] for ct in scenario.customer_types}
+        new_customers = sum(graph[_new_customers(ct, month_year)] for ct in scenario.customer_types)
+        yield (month_year, rev_per_customer, *graph[Node("expenses", month_year)], new_customers)
@@ -2,31 +2,30 @@
 Hire calculations
 """
 from datetime import date
-from functools import lru_cache
-from typing import Optional
+from typing import Optional, Sequence
 
+import numpy as np
 from clearcut import get_logger
 
-from pycasting.calc.predictors import PredictedCompanyState, predict, PredictorCategory
-from pycasting.pydanticmodels.predictions import Role
+from pycasting.calc.plans import MonthlyPlan
+from pycasting.calc.predictors import PredictedCompanyState, PredictorCategory, predictor_plan, as_datetime64
+from pycasting.calc.session import memoize
+from pycasting.pydanticmodels.predictions import Role, SalesRole, Scenario
 from pycasting.misc import MonthYear
 
 logger = get_logger(__name__)
 
 
-@lru_cache
+@memoize
 def hires_through_effective_date(effective_date: date, role: Role, state: Optional[PredictedCompanyState] = None) -> int:
     """Calculate how many people would have been hired through the effective date."""
     # hire_predictor is a model that has a "name" and other params. The name matches to a registered predictor function
     # in the `predictors.py` file, and the params should get passed into that function (along with the state).
     # It will return an amount which is the (float) value we're looking for.
-    dataclass = role.hire_predictor
-    params = dataclass.dict(exclude={"name"})
+    return round(predictor_plan(PredictorCategory.headcount, role.hire_predictor)(effective_date, state=state))
 
-    return round(predict(PredictorCategory.headcount, dataclass.name, effective_date, params, state=state))
 
-
-@lru_cache
+@memoize
 def hires_in_month(month_year: MonthYear, role: Role, state: Optional[PredictedCompanyState] = None) -> int:
     """Calculate how many people would have been hired in this month."""
     end_hires = hires_through_effective_date(month_year.end_of_month, role, state)
@@ -35,3 +34,99 @@ def hires_in_month(month_year: MonthYear, role: Role, state: Optional[PredictedC
     logger.debug(f"start: {start_hires}")
     logger.debug(f"end: {end_hires}")
     return end_hires - start_hires
+
+
+class HeadcountPlan(MonthlyPlan):
+    """
+    Hires of every role, precomputed for a range of months: cumulative hires through the end of each month, hires in each month, and
+    for sales roles, "effective sales reps" (see `_effective_reps`). Arrays have a row per role (in the order given) and a column per
+    month from `origin`.
+
+    State dependent roles depend on the forecast itself, so can't be planned. Their hires are predicted when asked for, with a state.
+    """
+
+    def __init__(self, roles: Sequence[Role], first_month_year: Optional[MonthYear] = None, months: int = 12):
+        self.roles = tuple(roles)
+        self._rows = {role: i for i, role in enumerate(self.roles)}
+        self._plans = [predictor_plan(PredictorCategory.headcount, role.hire_predictor) for role in self.roles]
+        self._sales_rows = [i for i, role in enumerate(self.roles) if isinstance(role, SalesRole)]
+        # Effective reps need hires from up to this many months before (plus one, for hires in the month)
+        self.history = max((self.roles[i].ramp_up_months for i in self._sales_rows), default=0) + 1
+        super().__init__(first_month_year, months)
+
+    def _build(self):
+        end_of_months = as_datetime64([self.origin.shift_month(offset).end_of_month for offset in range(self.months)])
+
+        self.cumulative_hires = np.zeros((len(self.roles), self.months), dtype=np.int64)
+        for i, plan in enumerate(self._plans):
+            if not plan.state_dependent:
+                self.cumulative_hires[i] = np.rint(plan.predict_array(end_of_months))
+        # The first column has no month before it, so is left at 0
+        self.monthly_hires = np.diff(self.cumulative_hires, axis=1, prepend=self.cumulative_hires[:, :1])
+
+        self.effective_reps = np.zeros((len(self.roles), self.months))
+        self.sales_quota = np.zeros(self.months)
+        for i in self._sales_rows:
+            if not self._plans[i].state_dependent:
+                self.effective_reps[i] = self._effective_reps(i)
+                self.sales_quota = self.sales_quota + self.roles[i].monthly_quota * self.effective_reps[i]
+
+    def _effective_reps(self, row: int) -> np.ndarray:
+        """
+        The number of "effective sales reps" at the end of each month, which is based on number hired, incorporating the fact that new
+        sales reps take some time to "ramp up" to max effectiveness. Only valid from `first_month_year`.
+        """
+        # role defines a ramp up time. Go back that many months and everyone hired up to then is fully effective. (Because they would be
+        # considered fully ramped up by this month.)
+        ramp_up_months = self.roles[row].ramp_up_months
+        effectiveness_increase_per_month = 1 / ramp_up_months
+        effective_reps = np.roll(self.cumulative_hires[row], ramp_up_months)
+
+        # Then get anyone hired after that and "prorate" their effectiveness accordingly. We care about this month (0) up to ramp_up - 1.
+        for months_ago in range(0, ramp_up_months):
+            # Those hired within the month `months_ago` are partially effective. They increase at a rate per month, including the month
+            # in question.
+            effectiveness = effectiveness_increase_per_month * (1 + months_ago)
+            effective_reps = effective_reps + np.roll(self.monthly_hires[row], months_ago) * effectiveness
+
+        return effective_reps
+
+    def _check(self, role: Role) -> int:
+        row = self._rows[role]
+        if self._plans[row].state_dependent:
+            raise RuntimeError("State not passed for state dependent prediction")
+        return row
+
+    def is_state_dependent(self, role: Role) -> bool:
+        return self._plans[self._rows[role]].state_dependent
+
+    def hires_through(self, role: Role, month_year: MonthYear, state: Optional[PredictedCompanyState] = None) -> int:
+        """How many people would have been hired through the end of this month. `state` is only used by state dependent roles."""
+        if self.is_state_dependent(role):
+            return hires_through_effective_date(month_year.end_of_month, role, state)
+        return int(self.hires_through_months(role, month_year, 1)[0])
+
+    def hires_through_months(self, role: Role, first_month_year: MonthYear, months: int) -> np.ndarray:
+        """Hires through the end of each of `months` months from `first_month_year`, for a role which isn't state dependent."""
+        row, columns = self._check(role), self.columns(first_month_year, months)
+        return self.cumulative_hires[row, columns]
+
+    def hires_in_month(self, role: Role, month_year: MonthYear) -> int:
+        row, column = self._check(role), self.columns(month_year).start
+        return int(self.monthly_hires[row, column])
+
+    def total_sales_quota(self, month_year: MonthYear) -> float:
+        return float(self.sales_quotas(month_year, 1)[0])
+
+    def sales_quotas(self, first_month_year: MonthYear, months: int) -> np.ndarray:
+        """Total sales quota (of every sales role) of each of `months` months from `first_month_year`."""
+        for i in self._sales_rows:
+            self._check(self.roles[i])
+        columns = self.columns(first_month_year, months)
+        return self.sales_quota[columns]
+
+
+@memoize(grows=True)
+def headcount_plan(scenario: Scenario) -> HeadcountPlan:
+    """The `HeadcountPlan` of a scenario's roles. It grows as needed, so is kept for the scenario rather than per month range."""
+    return HeadcountPlan(scenario.headcount, months=36)
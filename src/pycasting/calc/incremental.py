@@ -0,0 +1,134 @@
+"""
+Incremental forecasting, for re-running a forecast after small edits to its scenario (e.g. a dashboard slider). Calc caches are keyed by
+the whole `Scenario`, so any edit misses every one of them. Here, the series of each customer type and each role are kept, keyed by just
+the sub-models (and inputs) they depend on, and only those affected by an edit are recomputed:
+
+    forecaster = IncrementalForecaster(actuals, months_ahead=36)
+    df = forecaster.forecast(scenario)
+    df = forecaster.forecast(scenario.copy(update={"misc_expenses": ...}))  # only re-sums expenses
+    forecaster.recomputed  # what the last forecast had to recompute
+
+Results match the `vectorized` engine exactly. With a persistent `ResultCache`, customer type counts (the costly part) are also kept
+across processes.
+"""
+import dataclasses
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pycasting.calc.headcount import HeadcountPlan
+from pycasting.calc.persistent import ResultCache, fingerprint
+from pycasting.calc.predictors import PredictorCategory, predictor_plan
+from pycasting.calc.sales import LeadFunnel
+from pycasting.calc.vectorized import (
+    CustomerTypeCounts,
+    combine_counts,
+    company_states,
+    customer_type_counts,
+    customer_type_values,
+    empty_forecast_frame,
+    months_behind,
+    role_cost_series,
+    value_frame,
+)
+from pycasting.misc import MonthYear
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import CustomerType, Scenario, SalesRole
+
+
+class IncrementalForecaster:
+    """
+    Forecasts scenarios for fixed actuals and horizon, reusing the series of the previous forecast which the edits since don't affect:
+
+    - A customer type's counts and values depend on it, the sales roles (through leads) and how far behind payments go.
+    - A role's costs depend on it and employee costs. State dependent roles also depend on total customers.
+    - Misc expenses are just summed.
+
+    Only the series of the latest forecast are kept.
+    """
+
+    def __init__(self, actuals: Actuals, months_ahead: int, cache: Optional[ResultCache] = None):
+        self.actuals = actuals
+        self.months_ahead = months_ahead
+        self.cache = cache
+        self.origin = MonthYear.from_date(actuals.accurate_as_of)
+        # Descriptions of the series the last forecast recomputed, e.g. "customer type Small"
+        self.recomputed: List[str] = list()
+        self._customer_types: Dict[Hashable, Any] = dict()
+        self._roles: Dict[Hashable, np.ndarray] = dict()
+        self._sales_hires: Dict[Hashable, HeadcountPlan] = dict()
+
+    def forecast(self, scenario: Scenario) -> pd.DataFrame:
+        """Generate the same dataframe as `forecasting.forecast`."""
+        if self.months_ahead <= 0:
+            return empty_forecast_frame(scenario)
+
+        self.recomputed = list()
+        behind = months_behind(scenario)
+        sales_roles = tuple(role for role in scenario.headcount if isinstance(role, SalesRole))
+
+        # Customer types
+        customer_types = list()
+        kept = dict()
+        for customer_type in scenario.customer_types:
+            key = (customer_type, sales_roles, behind)
+            if key not in self._customer_types:
+                self.recomputed.append(f"customer type {customer_type.name}")
+                counts = self._customer_type_counts(customer_type, sales_roles, behind)
+                self._customer_types[key] = counts, customer_type_values(counts[0], self.origin, self.months_ahead, behind)
+            customer_types.append(kept.setdefault(key, self._customer_types[key]))
+        self._customer_types = kept
+        counts = [counts for counts, _ in customer_types]
+
+        # Roles
+        states = None
+        role_costs = list()
+        kept = dict()
+        for role in scenario.headcount:
+            key = (role, scenario.employee_costs)
+            if predictor_plan(PredictorCategory.headcount, role.hire_predictor).state_dependent:
+                if states is None:
+                    states = company_states(counts, self.actuals, behind, self.months_ahead)
+                key += (tuple(state.number_of_customers for state in states),)
+            if key not in self._roles:
+                self.recomputed.append(f"role {role.name}")
+                self._roles[key] = role_cost_series(
+                    role, scenario.employee_costs, HeadcountPlan((role,)), self.origin, self.months_ahead, states
+                )
+            role_costs.append(kept.setdefault(key, self._roles[key]))
+        self._roles = kept
+
+        forecast_counts = combine_counts(scenario, self.origin, self.months_ahead, behind, counts, role_costs)
+        return value_frame(forecast_counts, self.actuals, [values for _, values in customer_types])
+
+    def _customer_type_counts(
+        self, customer_type: CustomerType, sales_roles: Tuple[SalesRole, ...], behind: int
+    ) -> Tuple[CustomerTypeCounts, np.ndarray]:
+        def compute():
+            funnel = LeadFunnel(
+                (customer_type,), self._sales_hires_of(sales_roles), self.origin.shift_month(-behind), behind + self.months_ahead
+            )
+            return customer_type_counts(customer_type, funnel, self.actuals, behind, self.months_ahead)
+
+        if self.cache is None:
+            return compute()
+
+        # Stored without the customer type, which is part of the key
+        key = fingerprint("customer type counts", customer_type, sales_roles, behind, self.actuals, self.months_ahead)
+        counts, marketing = self.cache.get_or_compute(key, lambda: _without_customer_type(compute()))
+        return dataclasses.replace(counts, customer_type=customer_type), marketing
+
+    def _sales_hires_of(self, sales_roles: Tuple[SalesRole, ...]) -> HeadcountPlan:
+        """Hires of the sales roles, which are all leads (so customers) depend on."""
+        hires = self._sales_hires.get(sales_roles)
+        if hires is None:
+            self.recomputed.append("sales roles")
+            hires = self._sales_hires[sales_roles] = HeadcountPlan(sales_roles)
+        self._sales_hires = {sales_roles: hires}
+        return hires
+
+
+def _without_customer_type(counts: Tuple[CustomerTypeCounts, np.ndarray]) -> Tuple[CustomerTypeCounts, np.ndarray]:
+    ct_counts, marketing = counts
+    return dataclasses.replace(ct_counts, customer_type=None), marketing
@@ -0,0 +1,123 @@
+"""
+Memory accounting. Estimates the bytes retained by objects (following references, and counting each object once), and how much of that
+is uncertainty bookkeeping: `uncertainties` values and their derivatives, and `AffineArray`s.
+
+See `ForecastSession.memory_report` for what each memo table retains, and `ForecastSession(max_bytes=...)` to cap it.
+"""
+import gc
+import sys
+import types
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+import numpy as np
+from uncertainties.core import AffineScalarFunc, LinearCombination
+
+from pycasting.misc import MonthYear
+from pycasting.uncertainty import AffineArray
+
+_uncertainty_types = (AffineScalarFunc, LinearCombination, AffineArray)
+# Shared code and types, rather than data
+_skipped_types = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.CodeType)
+
+
+def _shared(obj: Any) -> bool:
+    """Whether an object is shared by everything, rather than retained by anything in particular: interned months, and small ints."""
+    cls = obj.__class__
+    return cls is MonthYear or obj is None or cls is bool or (cls is int and -5 <= obj <= 256)
+
+
+@dataclass(frozen=True)
+class Retained:
+    """Bytes retained by some objects, and how many of them are uncertainty bookkeeping."""
+
+    bytes: int = 0
+    uncertainty_bytes: int = 0
+
+    def __add__(self, other: "Retained") -> "Retained":
+        return Retained(self.bytes + other.bytes, self.uncertainty_bytes + other.uncertainty_bytes)
+
+
+@dataclass(frozen=True)
+class TableMemory:
+    """Bytes retained by a memo table's values, and (separately, as they are mostly shared inputs like scenarios) its keys."""
+
+    entries: int
+    values: Retained
+    keys: Retained
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    tables: Dict[str, TableMemory]
+
+    @property
+    def total(self) -> Retained:
+        return sum((table.values + table.keys for table in self.tables.values()), Retained())
+
+    def format(self) -> str:
+        """The report, as a table, largest first."""
+        rows = [("cache", "entries", "value bytes", "uncertainty bytes", "key bytes")]
+        for name, table in sorted(self.tables.items(), key=lambda item: item[1].values.bytes, reverse=True):
+            values, keys = table.values, table.keys
+            rows.append((name, str(table.entries), f"{values.bytes:,}", f"{values.uncertainty_bytes:,}", f"{keys.bytes:,}"))
+        total = self.total
+        rows.append(("total", "", f"{total.bytes:,}", f"{total.uncertainty_bytes:,}", ""))
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        # First column left aligned, the numbers right aligned
+        lines = ["  ".join(cell.ljust(w) if i == 0 else cell.rjust(w) for i, (cell, w) in enumerate(zip(row, widths))) for row in rows]
+        return "\n".join(lines)
+
+
+def _references(obj: Any) -> Iterable[Any]:
+    if isinstance(obj, (str, bytes, int, float, complex, bool)) or obj is None:
+        return ()
+    if isinstance(obj, np.ndarray):
+        return () if obj.base is None else (obj.base,)
+    if isinstance(obj, Mapping):
+        return [x for item in obj.items() for x in item]
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return obj
+
+    references = list()
+    if hasattr(obj, "__dict__"):
+        references.append(obj.__dict__)
+    for cls in type(obj).__mro__:
+        for slot in cls.__dict__.get("__slots__", ()):
+            if slot not in ("__dict__", "__weakref__") and hasattr(obj, slot):
+                references.append(getattr(obj, slot))
+    return references
+
+
+def retained(obj: Any, seen: Optional[Set[int]] = None) -> Retained:
+    """
+    Bytes retained by an object and everything it references, other than objects in `seen` (by id), which it's updated with. Sharing
+    `seen` between calls attributes shared objects to the first caller.
+    """
+    seen = set() if seen is None else seen
+    total = uncertainty = 0
+    # (object, whether it's referenced from uncertainty bookkeeping)
+    pending = [(obj, False)]
+    while pending:
+        obj, in_uncertainty = pending.pop()
+        if id(obj) in seen or isinstance(obj, _skipped_types) or _shared(obj):
+            continue
+        seen.add(id(obj))
+
+        in_uncertainty = in_uncertainty or isinstance(obj, _uncertainty_types)
+        size = sys.getsizeof(obj)
+        total += size
+        if in_uncertainty:
+            uncertainty += size
+        pending.extend((reference, in_uncertainty) for reference in _references(obj))
+
+    return Retained(total, uncertainty)
+
+
+def live_uncertainty() -> Tuple[int, Retained]:
+    """How many uncertainty objects are alive (anywhere, not just in caches), and the bytes they retain."""
+    objects = [obj for obj in gc.get_objects() if isinstance(obj, _uncertainty_types)]
+    seen: Set[int] = set()
+    return len(objects), sum((retained(obj, seen) for obj in objects), Retained())
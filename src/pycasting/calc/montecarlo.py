@@ -0,0 +1,135 @@
+"""
+Monte Carlo forecasting. Every uncertain (`UFloat`) input of the scenario is sampled, and the model is evaluated on arrays of shape
+(months, samples). Unlike first order propagation, the spread of the results reflects the nonlinear parts of the model, and is summarized
+as percentiles.
+"""
+from collections import defaultdict
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from uncertainties.core import AffineScalarFunc, Variable
+
+from pycasting.calc.predictors import PredictorCategory, predictor_plan
+from pycasting.calc.vectorized import forecast_counts, first_order_frame, usage_dates, ForecastCounts, delayed, empty_forecast_frame
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario
+
+PERCENTILES = (5, 50, 95)
+
+
+class VariableSampler:
+    """
+    Draws samples of independent variables (normally distributed, per their nominal value and std dev). Each variable is drawn once, so
+    every quantity depending on it sees the same samples and correlations are kept.
+    """
+
+    def __init__(self, samples: int, rng: np.random.Generator):
+        self.samples = samples
+        self.rng = rng
+        self._draws: Dict[Variable, np.ndarray] = dict()
+
+    def draw(self, variable: Variable) -> np.ndarray:
+        draws = self._draws.get(variable)
+        if draws is None:
+            draws = self._draws[variable] = self.rng.normal(variable.nominal_value, variable.std_dev, self.samples)
+        return draws
+
+    def __call__(self, value: Any) -> Any:
+        """Samples of a `UFloat` (linear in its variables), as an array. Anything else is passed through."""
+        if not isinstance(value, AffineScalarFunc):
+            return value
+
+        sampled = value.nominal_value
+        for variable, derivative in value.derivatives.items():
+            if variable.std_dev:
+                sampled = sampled + derivative * (self.draw(variable) - variable.nominal_value)
+        return np.broadcast_to(sampled, (self.samples,))
+
+
+def sampled_series(counts: ForecastCounts, actuals: Actuals, sampler: VariableSampler) -> Dict[str, np.ndarray]:
+    """Samples of each forecast series, as (months, samples) arrays. Per customer type revenue is keyed `revenue__<name>`."""
+    months_ahead, samples = counts.months_ahead, sampler.samples
+
+    series: Dict[str, np.ndarray] = dict()
+    revenue = np.zeros((months_ahead, samples))
+    cogs = np.zeros((months_ahead, samples))
+
+    for ct_counts in counts.customer_types:
+        customer_type = ct_counts.customer_type
+
+        # Usage per customer is predicted for every start month, one effective month at a time to keep memory to (months, samples)
+        plan = predictor_plan(PredictorCategory.usage, customer_type.usage_predictor)
+        plan = plan.bind(**{k: sampler(v) for k, v in plan.params.items()})
+        end_of_months = usage_dates(counts.origin, months_ahead)
+        usage_income = np.zeros((months_ahead, samples))
+        monthly_usage = np.zeros((months_ahead, samples))
+        for effective in range(1, months_ahead):
+            if plan.vectorized:
+                started = plan.predict_array(end_of_months[effective], end_of_months[1 : effective + 1, np.newaxis])
+            else:
+                dates = end_of_months.astype(object)
+                started = np.stack(
+                    [np.broadcast_to(sampler(plan(dates[effective], start)), (samples,)) for start in dates[1 : effective + 1]]
+                )
+            started = np.broadcast_to(started, (effective, samples))
+            usage_income[effective] = customer_type.usage_fee * (ct_counts.cohorts[effective, 1 : effective + 1] @ started)
+            monthly_usage[effective] = started.sum(axis=0)
+
+        # Collected `payment_months_behind` late
+        ct_revenue = np.outer(ct_counts.collected(ct_counts.new, counts.behind), sampler(customer_type.setup_fee))
+        ct_revenue += np.outer(ct_counts.collected(ct_counts.total, counts.behind), sampler(customer_type.monthly_fee))
+        ct_revenue += delayed(usage_income, customer_type.payment_months_behind)
+        series[f"revenue__{customer_type.name}"] = ct_revenue
+        revenue += ct_revenue
+
+        cogs += sampler(customer_type.cogs.monthly) + sampler(customer_type.cogs.per_usage) * monthly_usage
+
+    expenses = cogs + (counts.marketing + counts.salaries + counts.misc + counts.bizdev)[:, np.newaxis]
+    cashflow = revenue - expenses
+
+    series["revenue"] = revenue
+    series["expenses"] = expenses
+    series["cac_expenses"] = np.broadcast_to((counts.marketing + counts.cac_salaries + counts.bizdev)[:, np.newaxis], cashflow.shape)
+    series["cashflow"] = cashflow
+    series["cash_on_hand"] = actuals.cash_on_hand + cashflow.cumsum(axis=0)
+
+    return series
+
+
+def montecarlo_forecast(
+    scenario: Scenario,
+    actuals: Actuals,
+    months_ahead: int,
+    samples: int = 10_000,
+    seed: Optional[int] = None,
+    percentiles: Sequence[int] = PERCENTILES,
+) -> pd.DataFrame:
+    """
+    Generate the `forecasting.forecast` dataframe, adding percentiles of each series over `samples` Monte Carlo samples. For each
+    `<name>_stddev` column there's a `<name>_p<percentile>` column (`revenue_p<percentile>__<customer type>` for per customer type
+    revenue). Samples are drawn from an RNG seeded with `seed`, so results are reproducible.
+    """
+    if months_ahead <= 0:
+        # Percentiles of no months, for the same columns
+        df, series = empty_forecast_frame(scenario), defaultdict(lambda: np.empty((0, samples)))
+    else:
+        counts = forecast_counts(scenario, actuals, months_ahead)
+        df = first_order_frame(counts, actuals)
+        series = sampled_series(counts, actuals, VariableSampler(samples, np.random.default_rng(seed)))
+
+    data = dict()
+    for column in df.columns:
+        data[column] = df[column]
+        if column.endswith("_stddev"):
+            name = column[: -len("_stddev")]
+            for percentile, values in zip(percentiles, np.percentile(series[name], percentiles, axis=1)):
+                data[f"{name}_p{percentile}"] = values
+
+    # Per customer type std devs are the last columns
+    for percentile in percentiles:
+        for customer_type in scenario.customer_types:
+            name = customer_type.name
+            data[f"revenue_p{percentile}__{name}"] = np.percentile(series[f"revenue__{name}"], percentile, axis=1)
+
+    return pd.DataFrame(data)
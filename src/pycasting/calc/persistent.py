@@ -0,0 +1,223 @@
+"""
+Persistent caching of forecast results, in a SQLite database in a local directory, so restarted workers, CLI reruns and CI jobs over the
+same scenarios start warm:
+
+    cache = ResultCache(".pycasting-cache", max_bytes=500_000_000)
+    df = forecast(scenario, actuals, 36, cache=cache)
+
+Entries are keyed by a `fingerprint` of everything they depend on, including the pycasting source (see `code_version`), and least
+recently used entries are evicted once the cache is over `max_bytes`. Values are pickled, so only use a cache directory you trust.
+"""
+import dataclasses
+import functools
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from datetime import date, timedelta
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Set, Tuple, TypeVar, Union
+
+import numpy as np
+from pydantic import BaseModel
+from uncertainties.core import AffineScalarFunc, Variable
+
+import pycasting
+from pycasting.misc import MonthYear
+
+T = TypeVar("T")
+
+_missing = object()
+
+
+def _canonical(value: Any, variables: Dict[int, Tuple[int, Variable]]) -> Any:
+    """
+    A json-able form of a value, distinguishing everything which could change a forecast. Uncertain values are given by their
+    derivatives against independent variables, numbered by first appearance (in `variables`), so correlations between them count.
+    """
+    if isinstance(value, BaseModel):
+        fields = {name: _canonical(field, variables) for name, field in value.__dict__.items()}
+        return {"__model__": value.__class__.__name__, **fields}
+    if isinstance(value, AffineScalarFunc):
+        # Not `str`, which rounds to the uncertainty
+        derivatives = [(variables.setdefault(id(v), (len(variables), v))[0], d) for v, d in value.derivatives.items()]
+        return {"nominal": value.nominal_value, "derivatives": sorted(derivatives)}
+    if isinstance(value, Mapping):
+        return {str(k): _canonical(v, variables) for k, v in sorted(value.items())}
+    if isinstance(value, (tuple, list)):
+        return [_canonical(v, variables) for v in value]
+    if isinstance(value, (set, frozenset)):
+        return sorted(_canonical(v, variables) for v in value)
+    if isinstance(value, Enum):
+        return _canonical(value.value, variables)
+    if isinstance(value, MonthYear):
+        return value.ordinal
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, np.generic):
+        return value.item()
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Can't fingerprint a {value.__class__.__name__}")
+
+
+def source_hash(directory: Path) -> str:
+    """Hash of the source of every module under a directory."""
+    digest = hashlib.sha256()
+    for path in sorted(directory.rglob("*.py")):
+        digest.update(path.relative_to(directory).as_posix().encode() + b"\0" + path.read_bytes() + b"\0")
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_version() -> str:
+    """
+    The pycasting version and a hash of its source, so cached results don't outlive changes to the code computing them (which the
+    version, only bumped on release, doesn't track).
+    """
+    return f"{pycasting.__version__}+{source_hash(Path(pycasting.__file__).parent)}"
+
+
+def fingerprint(*parts: Any) -> str:
+    """Stable hash of models (e.g. a `Scenario` and `Actuals`) and plain values, and the pycasting code (see `code_version`)."""
+    variables: Dict[int, Tuple[int, Variable]] = dict()
+    canonical = _canonical((code_version(),) + parts, variables)
+    # Independent variables, by number
+    canonical.append([(v.nominal_value, v.std_dev) for _, v in sorted(variables.values(), key=lambda item: item[0])])
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+@dataclasses.dataclass(frozen=True)
+class PersistentCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    nbytes: int
+    max_bytes: int
+
+
+class ResultCache:
+    """
+    Pickled values in a SQLite database (`results.sqlite` in `directory`), keyed by `fingerprint`s. Safe to share between threads and
+    processes. Once the stored values are over `max_bytes`, least recently used ones are evicted.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 1_000_000_000):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.path = self.directory / "results.sqlite"
+        self._local = threading.local()
+        db = self._connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB, size INTEGER, accessed REAL)")
+        db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection. Connections aren't shared between threads, nor with forked processes."""
+        local = self._local
+        if getattr(local, "pid", None) != os.getpid():
+            # Autocommit, with explicit transactions where needed
+            local.db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            local.db.execute("PRAGMA synchronous=NORMAL")
+            local.pid = os.getpid()
+        return local.db
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.get_many([key]).get(key, default)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """The values stored under any of `keys`, by key. Cheaper than getting each, as it's a single transaction."""
+        return {key: pickle.loads(blob) for key, blob in self._select(keys, "value").items()}
+
+    def present(self, keys: Iterable[str]) -> Set[str]:
+        """Which of `keys` have values stored, without loading them. Counts as using them, for eviction."""
+        return set(self._select(keys, "NULL"))
+
+    def _select(self, keys: Iterable[str], column: str) -> Dict[str, Any]:
+        keys = list(dict.fromkeys(keys))
+        db = self._connection()
+        found = dict()
+        db.execute("BEGIN")
+        try:
+            # In chunks, as sqlite limits the number of parameters of a statement
+            for start in range(0, len(keys), 500):
+                chunk = keys[start : start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(db.execute(f"SELECT key, {column} FROM results WHERE key IN ({placeholders})", chunk).fetchall())
+                db.execute(f"UPDATE results SET accessed = ? WHERE key IN ({placeholders})", [time.time(), *chunk])
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, value: Any):
+        self.put_many([(key, value)])
+
+    def put_many(self, items: Iterable[Tuple[str, Any]]):
+        """Store values by key, evicting least recently used ones (other than these) once over `max_bytes`, in a single transaction."""
+        rows = list()
+        for key, value in items:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(blob) <= self.max_bytes:
+                rows.append((key, blob, len(blob), time.time()))
+        if not rows:
+            return
+
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows)
+            over = db.execute("SELECT SUM(size) FROM results").fetchone()[0] - self.max_bytes
+            if over > 0:
+                kept = {key for key, *_ in rows}
+                for old_key, size in db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+                    if over <= 0:
+                        break
+                    if old_key in kept:
+                        continue
+                    db.execute("DELETE FROM results WHERE key = ?", (old_key,))
+                    over -= size
+                    self.evictions += 1
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def get_or_compute(self, key: str, compute: Callable[[], T]) -> T:
+        """The value stored under `key`, computing (and storing) it if there isn't one."""
+        value = self.get(key, _missing)
+        if value is _missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self._connection().execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def stats(self) -> PersistentCacheStats:
+        """Hits/misses/evictions of this instance, and the size of the (shared) database."""
+        return PersistentCacheStats(self.hits, self.misses, self.evictions, len(self), self.nbytes, self.max_bytes)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM results")
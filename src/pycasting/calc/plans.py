@@ -0,0 +1,59 @@
+"""
+Series precomputed as arrays over a range of months, which grows as months outside it are asked for.
+"""
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from pycasting.misc import MonthYear
+
+
+class MonthlyPlan(ABC):
+    """
+    Base for series precomputed over a range of months. Arrays have a column per month from `origin`. The first `history` columns are
+    only there for the following months to be calculated from, so planned months start at `first_month_year`.
+
+    Subclasses set `history` and implement `_build`, which (re)computes every array for `months` columns from `origin`.
+    """
+
+    history: int = 0
+
+    def __init__(self, first_month_year: Optional[MonthYear] = None, months: int = 12):
+        self._initial_months = max(months, 1)
+        self.months = 0
+
+        # Without a first month, the range is planned from the first month asked for
+        self.origin: Optional[MonthYear] = None
+        if first_month_year is not None:
+            self._plan(first_month_year, self._initial_months)
+
+    @property
+    def first_month_year(self) -> MonthYear:
+        return self.origin.shift_month(self.history)
+
+    def _plan(self, first_month_year: MonthYear, months: int):
+        self.origin = first_month_year.shift_month(-self.history)
+        self.months = months + self.history
+        self._build()
+
+    @abstractmethod
+    def _build(self):
+        """(Re)compute every array, for `months` columns from `origin`."""
+
+    def columns(self, first_month_year: MonthYear, months: int = 1) -> slice:
+        """The columns of `months` months from `first_month_year`, growing the planned range to cover them if needed."""
+        if self.origin is None:
+            self._plan(first_month_year, max(months, self._initial_months))
+
+        start = first_month_year.months_since(self.origin)
+        if start < self.history or start + months > self.months:
+            # Grow to at least double, so asking month by month only rebuilds a few times
+            planned = self.months - self.history
+            first = min(first_month_year, self.first_month_year)
+            last = max(first_month_year.shift_month(months - 1), self.first_month_year.shift_month(planned - 1))
+            span = max(last.months_since(first) + 1, 2 * planned)
+            if first_month_year < self.first_month_year:
+                first = last.shift_month(1 - span)
+            self._plan(first, span)
+            start = first_month_year.months_since(self.origin)
+
+        return slice(start, start + months)
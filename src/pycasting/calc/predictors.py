@@ -1,15 +1,18 @@
 """Functions which are used to define expected changes over time."""
 import math
 from collections import defaultdict
+from dataclasses import dataclass, replace
 from datetime import timedelta, date
 from enum import Enum
-from typing import Dict, Callable, Optional, List, Tuple, Any, Union
+from typing import Dict, Callable, Optional, List, Tuple, Any, Union, Sequence
 
+import numpy as np
 from clearcut import get_logger
-from pydantic import Field, validator
+from pydantic import Field, validator, BaseModel as PydanticBaseModel
 
+from pycasting.calc.session import memoize
 from pycasting.pydanticmodels.actuals import Actuals
-from pycasting.misc import UFloat, BaseModel, is_end_of_month, end_of_month
+from pycasting.misc import UFloat, BaseModel, is_end_of_month, end_of_month, exact
 
 logger = get_logger(__name__)
 
@@ -30,6 +33,7 @@ class PredictorCategory(Enum):
 
 
 _predictor_registry: Dict[PredictorCategory, Dict[str, Tuple[Callable, bool]]] = defaultdict(defaultdict)
+_array_predictor_registry: Dict[PredictorCategory, Dict[str, Callable]] = defaultdict(dict)
 
 
 def register_predictor(category: PredictorCategory, name: Optional[str] = None, state_dependent: bool = False):
@@ -48,6 +52,20 @@ def register_predictor(category: PredictorCategory, name: Optional[str] = None,
     return with_register
 
 
+def register_array_predictor(category: PredictorCategory, name: str):
+    """
+    Decorate the array form of a registered predictor. It takes the same params, but `effective_date` (and `start`) are `datetime64[D]`
+    arrays, and it returns an array of predictions, broadcast over them (and over any array params).
+    """
+
+    def with_register(fn):
+        _array_predictor_registry[category][name] = fn
+
+        return fn
+
+    return with_register
+
+
 def get_predictor(category: PredictorCategory, name: str):
     predictor_fn = _predictor_registry.get(category, {}).get(name, None)
     if predictor_fn is None:
@@ -87,6 +105,109 @@ def get_predictor_names(category: PredictorCategory) -> List[str]:
     return list(_predictor_registry.get(category, {}).keys())
 
 
+def as_datetime64(dates: Union[date, Sequence[date]]) -> np.ndarray:
+    return np.array(dates, dtype="datetime64[D]")
+
+
+def _elementwise(fn: Callable) -> Callable:
+    """Array form of a scalar predictor, calling it for each date. Any array returned per date becomes trailing axes."""
+
+    def array_fn(*, effective_date: np.ndarray, start: Optional[np.ndarray] = None, state: Optional[Sequence] = None, **params):
+        if start is None:
+            effective_date = np.asarray(effective_date)
+            dates = zip(effective_date.astype(object).ravel(), [None] * effective_date.size)
+        else:
+            effective_date, start = np.broadcast_arrays(effective_date, start)
+            dates = zip(effective_date.astype(object).ravel(), start.astype(object).ravel())
+
+        predictions = list()
+        for i, (effective, start_) in enumerate(dates):
+            kwargs = dict(params, effective_date=effective)
+            if start_ is not None:
+                kwargs["start"] = start_
+            if state is not None:
+                kwargs["state"] = state[i]
+            predictions.append(fn(**kwargs))
+
+        predictions = np.array(predictions)
+        return predictions.reshape(effective_date.shape + predictions.shape[1:])
+
+    return array_fn
+
+
+@dataclass(frozen=True, eq=False)
+class PredictorPlan:
+    """
+    A predictor resolved for one predictor model (e.g. a `Role.hire_predictor`): its function, array form, and params are looked up
+    once, rather than on every prediction.
+    """
+
+    category: PredictorCategory
+    name: str
+    fn: Callable
+    array_fn: Callable
+    # Whether `array_fn` is a registered array form, rather than the scalar function called per date
+    vectorized: bool
+    state_dependent: bool
+    params: Dict[str, Any]
+
+    def _check(self, start, state):
+        if self.state_dependent and state is None:
+            raise RuntimeError("State not passed for state dependent prediction")
+        if self.category is PredictorCategory.usage and start is None:
+            raise RuntimeError("start not passed for usage predictor")
+
+    def __call__(self, effective_date: date, start: Optional[date] = None, state: Optional[PredictedCompanyState] = None):
+        """Predict for a single date, like `predict`."""
+        self._check(start, state)
+
+        kwargs = dict(self.params, effective_date=effective_date)
+        if self.state_dependent:
+            kwargs["state"] = state
+        if start is not None:
+            kwargs["start"] = start
+
+        return self.fn(**kwargs)
+
+    def predict_array(
+        self, effective_dates: np.ndarray, starts: Optional[np.ndarray] = None, states: Optional[Sequence[PredictedCompanyState]] = None
+    ) -> np.ndarray:
+        """Predict for arrays of dates (see `as_datetime64`). `states` are per effective date, for state dependent predictors."""
+        self._check(starts, states)
+
+        kwargs = dict(self.params, effective_date=effective_dates)
+        if self.state_dependent:
+            kwargs["state"] = states
+        if starts is not None:
+            kwargs["start"] = starts
+
+        return self.array_fn(**kwargs)
+
+    def bind(self, **params) -> "PredictorPlan":
+        """The same predictor, with some params replaced (e.g. by samples of them)."""
+        return replace(self, params={**self.params, **params})
+
+
+@memoize
+def predictor_plan(category: PredictorCategory, predictor: PydanticBaseModel) -> PredictorPlan:
+    """The plan for a predictor model, which has the `name` of a registered predictor and its params."""
+    found = _predictor_registry.get(category, {}).get(predictor.name)
+    if found is None:
+        raise ValueError(f"No matching predictor: {category} | {predictor.name}")
+    fn, state_dependent = found
+    array_fn = _array_predictor_registry.get(category, {}).get(predictor.name)
+
+    return PredictorPlan(
+        category=category,
+        name=predictor.name,
+        fn=fn,
+        array_fn=array_fn or _elementwise(fn),
+        vectorized=array_fn is not None,
+        state_dependent=state_dependent,
+        params=predictor.dict(exclude={"name"}),
+    )
+
+
 """
 Headcount-over-time predictors.
 """
@@ -111,6 +232,16 @@ def linear_with_max(*, effective_date: date, initial_count: int, hires_per_year:
     return min(current_hires, max_hires)
 
 
+@register_array_predictor(PredictorCategory.headcount, "linear_with_max")
+def linear_with_max_array(
+    *, effective_date: np.ndarray, initial_count: int, hires_per_year: int, first_hire_date: date, max_hires: int
+) -> np.ndarray:
+    days_since_first_hire = (effective_date - np.datetime64(first_hire_date, "D")).astype(np.int64)
+    current_hires = np.floor(initial_count + initial_count * hires_per_year * (days_since_first_hire / 360)).astype(np.int64)
+
+    return np.minimum(current_hires, max_hires) * (days_since_first_hire >= 0)
+
+
 @register_predictor(PredictorCategory.headcount, state_dependent=True)
 def scale_with_customers(*, effective_date: date, state: PredictedCompanyState, customers_per_person: int) -> int:
     """Scales with number of customers onboarded."""
@@ -125,16 +256,27 @@ Usage-over-time predictor predictors. These are provided an additional argument
 @register_predictor(PredictorCategory.usage, "linear")
 def linear_usage(*, effective_date: date, start: date, initial_usage: UFloat, increase_per_year: UFloat) -> UFloat:
     if effective_date < start:
-        return UFloat(0, 0)
+        return exact(0)
 
     offset: timedelta = effective_date - start
     # Expecting linear growth since "turned on" `offset` ago.
     return initial_usage + initial_usage * increase_per_year * (offset / timedelta(days=360))
 
 
+@register_array_predictor(PredictorCategory.usage, "linear")
+def linear_usage_array(*, effective_date: np.ndarray, start: np.ndarray, initial_usage, increase_per_year) -> np.ndarray:
+    offset_days = (effective_date - start).astype(np.int64)
+    return (initial_usage + initial_usage * increase_per_year * (offset_days / 360)) * (offset_days >= 0)
+
+
 @register_predictor(PredictorCategory.usage, "constant")
 def constant_usage(*, effective_date: date, start: date, initial_usage: UFloat) -> UFloat:
     if effective_date < start:
-        return UFloat(0, 0)
+        return exact(0)
     else:
         return initial_usage
+
+
+@register_array_predictor(PredictorCategory.usage, "constant")
+def constant_usage_array(*, effective_date: np.ndarray, start: np.ndarray, initial_usage) -> np.ndarray:
+    return initial_usage * (effective_date >= start)
@@ -0,0 +1,137 @@
+"""
+Opt-in profiling of calc functions. While a `Profiler` is attached to a `ForecastSession`, memoized and instrumented functions record
+their calls, cache hits/misses, time (cumulative, and excluding other recorded calls), time spent hashing cache keys, and fan-out:
+
+    with profile() as profiler:
+        df = forecast(scenario, actuals, 24)
+    print(profiler.format_report())
+
+Without a profiler, recording costs a single check per call.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from pycasting.calc.session import ForecastSession, MemoTable, current_session, _missing
+
+
+@dataclass
+class FunctionProfile:
+    name: str
+    calls: int = 0
+    # Only for memoized functions
+    hits: int = 0
+    misses: int = 0
+    hash_seconds: float = 0.0
+    # Recursive calls are only counted once
+    cumulative_seconds: float = 0.0
+    # Excluding time in other recorded calls
+    self_seconds: float = 0.0
+    # The most recorded calls made by a single call
+    max_fan_out: int = 0
+
+
+class _Frame:
+    __slots__ = ("child_seconds", "child_calls")
+
+    def __init__(self):
+        self.child_seconds = 0.0
+        self.child_calls = 0
+
+
+class Profiler:
+    """Records calls of memoized and instrumented functions. See `profile`."""
+
+    def __init__(self):
+        self.profiles: Dict[str, FunctionProfile] = dict()
+        self._local = threading.local()
+
+    def _state(self):
+        local = self._local
+        if not hasattr(local, "stack"):
+            local.stack = list()
+            local.depths = defaultdict(int)
+        return local.stack, local.depths
+
+    def call(
+        self, name: str, fn: Callable, args: tuple, kwargs: Dict[str, Any], table: Optional[MemoTable] = None, key: Hashable = None
+    ) -> Any:
+        """Call `fn`, recording it under `name`. With a memo table, the value is looked up in (and stored to) it by `key`."""
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles.setdefault(name, FunctionProfile(name))
+        stack, depths = self._state()
+        if stack:
+            stack[-1].child_calls += 1
+
+        frame = _Frame()
+        stack.append(frame)
+        depths[name] += 1
+        start = time.perf_counter()
+        try:
+            if table is None:
+                return fn(*args, **kwargs)
+
+            hash(key)
+            profile.hash_seconds += time.perf_counter() - start
+            value = table.get(key)
+            if value is _missing:
+                profile.misses += 1
+                value = fn(*args, **kwargs)
+                table.put(key, value)
+            else:
+                profile.hits += 1
+            return value
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            depths[name] -= 1
+
+            profile.calls += 1
+            profile.self_seconds += elapsed - frame.child_seconds
+            if depths[name] == 0:
+                profile.cumulative_seconds += elapsed
+            profile.max_fan_out = max(profile.max_fan_out, frame.child_calls)
+            if stack:
+                stack[-1].child_seconds += elapsed
+
+    def report(self, sort_by: str = "self_seconds") -> List[FunctionProfile]:
+        """Profiles of every recorded function, most expensive first."""
+        return sorted(self.profiles.values(), key=lambda p: getattr(p, sort_by), reverse=True)
+
+    def format_report(self, sort_by: str = "self_seconds", top: Optional[int] = None) -> str:
+        """The report, as a table."""
+        rows = [("function", "calls", "hits", "misses", "cumulative ms", "self ms", "hash ms", "max fan-out")]
+        for p in self.report(sort_by)[:top]:
+            memoized = p.hits + p.misses > 0
+            rows.append(
+                (
+                    p.name,
+                    str(p.calls),
+                    str(p.hits) if memoized else "-",
+                    str(p.misses) if memoized else "-",
+                    f"{p.cumulative_seconds * 1000:.1f}",
+                    f"{p.self_seconds * 1000:.1f}",
+                    f"{p.hash_seconds * 1000:.1f}",
+                    str(p.max_fan_out),
+                )
+            )
+
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        # First column left aligned, the numbers right aligned
+        lines = ["  ".join(cell.ljust(w) if i == 0 else cell.rjust(w) for i, (cell, w) in enumerate(zip(row, widths))) for row in rows]
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile(session: Optional[ForecastSession] = None) -> Iterator[Profiler]:
+    """Profile calc functions called in the block, in the given (by default, current) session."""
+    session = session if session is not None else current_session()
+    previous, session.profiler = session.profiler, Profiler()
+    try:
+        yield session.profiler
+    finally:
+        session.profiler = previous
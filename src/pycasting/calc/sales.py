@@ -2,100 +2,209 @@
 Sales forecasting logic. Predicting the future...ooooaaaaa
 """
 import math
-from functools import lru_cache
-from typing import Optional
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
 
-from pycasting.calc.headcount import hires_through_effective_date, hires_in_month
-from pycasting.pydanticmodels.predictions import Scenario, LeadStage, SalesRole, CustomerType
+import numpy as np
+
+from pycasting.calc.headcount import HeadcountPlan, headcount_plan
+from pycasting.calc.plans import MonthlyPlan
+from pycasting.calc.session import memoize
+from pycasting.pydanticmodels.predictions import Scenario, LeadStage, CustomerType
 from pycasting.misc import MonthYear
 
 
-@lru_cache
+@memoize
 def total_sales_quota(scenario: Scenario, month_year: MonthYear) -> float:
     """
     Calculate the total sales quota for this MonthYear. Uses the number of "effective sales reps" at the end of this MonthYear,
     which is based on number hired, incorporating the fact that new sales reps take some time to "ramp up" to max effectiveness.
     """
+    # This effective number of sales reps should handle a quota of work
+    # In the Senovo spreadsheet, they have a monthly quota for all sales roles.
+    return headcount_plan(scenario).total_sales_quota(month_year)
 
-    quota = 0
-
-    for sales_role in scenario.headcount:
-        if not isinstance(sales_role, SalesRole):
-            continue
-
-        effective_sales_reps = 0
 
-        # role defines a ramp up time. Go back that many months and everyone hired up to then is fully effective
-        # Then get anyone hired after that and "prorate" their effectiveness accordingly
-        ramp_up_months = sales_role.ramp_up_months
-        effectiveness_increase_per_month = 1 / ramp_up_months
+# Kernels (and distributions) longer than this are convolved with FFTs rather than directly
+_DIRECT_CONVOLUTION_LENGTH = 32
 
-        # Fully effective reps...who was hired by the end of the month ramp_up ago? (Because they would be considered fully ramped
-        # up by this month_year.
-        effective_sales_reps += hires_through_effective_date(month_year.shift_month(-sales_role.ramp_up_months).end_of_month, sales_role)
 
-        # Less effective reps we need to add in one month at a time. We care about this month (0) up to ramp_up - 1.
-        for months_ago in range(0, ramp_up_months):
-            # who was hired within the month `months_ago`?
-            num_hires = hires_in_month(month_year.shift_month(-months_ago), sales_role)
-            # Those folks are partially effective. They increase at a rate per month, including the month in question.
-            effectiveness = effectiveness_increase_per_month * (1 + months_ago)
-            # Add this cohort in
-            effective_sales_reps += num_hires * effectiveness
+def convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Full discrete convolution of two series, with FFTs when both are long."""
+    length = len(a) + len(b) - 1
+    if min(len(a), len(b)) <= _DIRECT_CONVOLUTION_LENGTH:
+        return np.convolve(a, b)
 
-        # This effective number of sales reps should handle a quota of work
-        # In the Senovo spreadsheet, they have a monthly quota for all sales roles.
-        quota += sales_role.monthly_quota * effective_sales_reps
+    size = 1 << (length - 1).bit_length()
+    return np.fft.irfft(np.fft.rfft(a, size) * np.fft.rfft(b, size), size)[:length]
 
-    return quota
 
-
-@lru_cache
-def new_transitions(scenario: Scenario, month_year: MonthYear, stage: Optional[LeadStage], customer_type: CustomerType) -> int:
+@dataclass(frozen=True)
+class FunnelKernel:
     """
-    Predict the number of transitions into a given stage + customer type in a given month/year.
+    Transitions through some stages of a lead funnel, as a linear filter over transitions into stage 0: transitions per day into stage 0
+    `lag + i` months before, weighted by `weights[i]` (days), times the net conversion rate of the stages, rounded.
     """
 
-    # This modelling is roughly based on the Senovo B2B SaaS Excel. I'm not confident that only including sales "effectiveness" on the
-    # initial transition is a good idea, but that's how they do it so I'm going to replicate for the like-for-like transition.
-
-    if stage is not None and customer_type.lead_config.stages[0] == stage:
-        # If we're at the first stage, the transitions into it are the lead quota per rep * number of "effective reps" for each sales role
-        # type. An "effective rep" is based on how many reps are available, given that they ramp up over some period of time.
-        return round(total_sales_quota(scenario, month_year))
-    else:
-        # See https://tangibleintelligence.slab.com/posts/sales-progression-logic-o1rjhcag for this logic. It's based on the Senovo
-        # spreadsheet, but is a little more accurate.
-        if stage is None:
-            previous_stages = customer_type.lead_config.stages
+    lag: int
+    weights: Tuple[float, ...]
+    conversion_rate: float
+
+    @property
+    def history(self) -> int:
+        """How many months before a month its transitions depend on."""
+        return self.lag + len(self.weights) - 1
+
+    def apply(self, stage_0: np.ndarray) -> np.ndarray:
+        """Transitions in each month of a series of stage 0 transitions. The first `history` months are left at 0."""
+        transitions = np.zeros(len(stage_0), dtype=np.int64)
+        months = len(stage_0) - self.history
+        if months <= 0:
+            return transitions
+
+        transitions_per_day = stage_0 / 30
+        if len(self.weights) > _DIRECT_CONVOLUTION_LENGTH:
+            convolved = convolve(transitions_per_day, np.array(self.weights))
+            proportional_transitions = convolved[len(self.weights) - 1 : len(stage_0) - self.lag]
         else:
-            current_stage_index = customer_type.lead_config.stages.index(stage)
-            previous_stages = customer_type.lead_config.stages[0:current_stage_index]
+            # Summed from the furthest back
+            proportional_transitions = sum(
+                weight * transitions_per_day[self.history - self.lag - i : self.history - self.lag - i + months]
+                for i, weight in reversed(list(enumerate(self.weights)))
+            )
+        transitions[self.history :] = np.rint(self.conversion_rate * proportional_transitions)
+        return transitions
+
+
+def duration_distribution(stage: LeadStage) -> np.ndarray:
+    """Probability of a stage taking each number of days (by index), for a stage with an uncertain duration."""
+    if stage.duration_histogram is not None:
+        distribution = np.zeros(max(stage.duration_histogram) + 1)
+        for days, weight in stage.duration_histogram.items():
+            distribution[days] = weight
+    else:
+        # Normal, in whole days, cut off at 0 and 4 std devs
+        mean, spread = stage.duration.total_seconds() / 24 / 60 / 60, stage.duration_spread.total_seconds() / 24 / 60 / 60
+        edges = np.arange(max(0, math.floor(mean - 4 * spread)), math.ceil(mean + 4 * spread) + 1) - 0.5
+        cdf = np.array([0.5 * (1 + math.erf((edge - mean) / (spread * math.sqrt(2)))) for edge in edges])
+        distribution = np.zeros(math.ceil(mean + 4 * spread))
+        distribution[math.ceil(edges[0]) :] = np.diff(cdf)
+
+    return distribution / distribution.sum()
+
 
+@memoize
+def funnel_kernel(stages: Tuple[LeadStage, ...]) -> FunnelKernel:
+    """The kernel of transitions through the given stages, from stage 0."""
+    # See https://tangibleintelligence.slab.com/posts/sales-progression-logic-o1rjhcag for this logic. It's based on the Senovo
+    # spreadsheet, but is a little more accurate.
+    conversion_rate = math.prod(s.conversion_rate for s in stages)
+
+    if not any(s.is_distributed for s in stages):
         # How long has it been since stage 0? (Called Delta in the Slab page.)
-        duration_since_stage_0 = math.floor(sum(s.duration.total_seconds() / 24 / 60 / 60 for s in previous_stages))
+        duration_since_stage_0 = math.floor(sum(s.duration.total_seconds() / 24 / 60 / 60 for s in stages))
         # Break into months and days (`mu` and `delta` on Slab)
         months: int
         days: int
         months, days = divmod(duration_since_stage_0, 30)
 
-        # And what's the net conversion rate since stage 0? (Called capital Chi in slab page.)
-        net_conversion_rate_since_stage_0 = math.prod(s.conversion_rate for s in previous_stages)
+        # Transitions in a month come in two parts. Some from `months` ago, and some from `months + 1` ago (sigma_`tau` in slab). Ratio
+        # of those two sources is based on `days`. And they're multiplied by the net conversion rate since stage 0 (capital Chi in slab).
+        return FunnelKernel(lag=months, weights=(30 - days, days), conversion_rate=conversion_rate)
+
+    # With uncertain durations, the time since stage 0 is a distribution: that of the sum of the stage durations. Each possible duration
+    # splits its share of transitions across two months, as above.
+    fixed_days = sum(s.duration.total_seconds() / 24 / 60 / 60 for s in stages if not s.is_distributed)
+    distribution = np.ones(1)
+    for stage in stages:
+        if stage.is_distributed:
+            distribution = convolve(distribution, duration_distribution(stage))
+
+    months, days = np.divmod(np.floor(fixed_days + np.arange(len(distribution))).astype(np.int64), 30)
+    weights = np.zeros(months[-1] + 2)
+    np.add.at(weights, months, distribution * (30 - days))
+    np.add.at(weights, months + 1, distribution * days)
 
-        # Transitions in this month is going to come in two parts. Some from `months` ago, and some from `months + 1` ago (sigma_`tau`
-        # in slab). Ratio of those two sources is based on `days`. See slab page for full equation.
+    nonzero = np.flatnonzero(weights > 1e-12)
+    lag = int(nonzero[0])
+    return FunnelKernel(lag=lag, weights=tuple(weights[lag : nonzero[-1] + 1]), conversion_rate=conversion_rate)
 
-        # First get the number of transitions into stage 0 `months` ago and `months + 1` ago. Recursive!
-        transitions_per_day_months_ago = (
-            new_transitions(scenario, month_year.shift_month(-months), customer_type.lead_config.stages[0], customer_type) / 30
-        )
-        transitions_per_day_months_plus_one_ago = (
-            new_transitions(scenario, month_year.shift_month(-(months + 1)), customer_type.lead_config.stages[0], customer_type) / 30
-        )
 
-        # Add in proportion
-        proportional_transitions = days * transitions_per_day_months_plus_one_ago + (30 - days) * transitions_per_day_months_ago
+class LeadFunnel(MonthlyPlan):
+    """
+    Transitions into each stage of each customer type's lead funnel, precomputed for a range of months. Transitions into stage 0 come
+    from the sales quota (see `HeadcountPlan`), and every later stage is a `FunnelKernel` applied to them. History is kept for the
+    given customer types; others can be asked for too, but may replan.
+    """
 
-        # And multiply by net conversion rate
+    def __init__(
+        self, customer_types: Sequence[CustomerType], hires: HeadcountPlan, first_month_year: Optional[MonthYear] = None, months: int = 12
+    ):
+        self.customer_types = tuple(customer_types)
+        self.hires = hires
+        self._kernels: Dict[CustomerType, Tuple[FunnelKernel, ...]] = dict()
+        self.history = max((kernel.history for ct in self.customer_types for kernel in self._kernels_of(ct)), default=0)
+        super().__init__(first_month_year, months)
+
+    def _kernels_of(self, customer_type: CustomerType) -> Tuple[FunnelKernel, ...]:
+        """Kernels of transitions into each stage after the first, and out of the last (into being a customer)."""
+        kernels = self._kernels.get(customer_type)
+        if kernels is None:
+            stages = customer_type.lead_config.stages
+            kernels = self._kernels[customer_type] = tuple(funnel_kernel(stages[:i]) for i in range(1, len(stages) + 1))
+        return kernels
+
+    def _build(self):
+        self.stage_0 = np.rint(self.hires.sales_quotas(self.origin, self.months)).astype(np.int64)
+        self._transitions: Dict[CustomerType, np.ndarray] = dict()
+
+    def _extend_history(self, customer_type: CustomerType):
+        """Keep enough history for a customer type, which may not be one of those given, replanning if needed."""
+        history = max((kernel.history for kernel in self._kernels_of(customer_type)), default=0)
+        if history > self.history:
+            if self.origin is None:
+                self.history = history
+            else:
+                first_month_year, months = self.first_month_year, self.months - self.history
+                self.history = history
+                self._plan(first_month_year, months)
+
+    def transitions_of(self, customer_type: CustomerType) -> np.ndarray:
+        """Transitions of a customer type, with a row per stage, and a last row of new customers."""
+        self._extend_history(customer_type)
+        transitions = self._transitions.get(customer_type)
+        if transitions is None:
+            kernels = self._kernels_of(customer_type)
+            transitions = self._transitions[customer_type] = np.stack([self.stage_0] + [kernel.apply(self.stage_0) for kernel in kernels])
+        return transitions
+
+    def new_transitions(self, customer_type: CustomerType, stage: int, first_month_year: MonthYear, months: int = 1) -> np.ndarray:
+        """Transitions into stage number `stage` (or new customers, past the last stage) in each of `months` months."""
+        # Before finding the columns, as more history moves them
+        self._extend_history(customer_type)
+        columns = self.columns(first_month_year, months)
+        return self.transitions_of(customer_type)[stage, columns]
+
+
+@memoize(grows=True)
+def lead_funnel(scenario: Scenario) -> LeadFunnel:
+    """The `LeadFunnel` of a scenario. It grows as needed, so is kept for the scenario rather than per month range."""
+    return LeadFunnel(scenario.customer_types, headcount_plan(scenario), months=36)
+
+
+@memoize
+def new_transitions(scenario: Scenario, month_year: MonthYear, stage: Optional[LeadStage], customer_type: CustomerType) -> int:
+    """
+    Predict the number of transitions into a given stage + customer type in a given month/year. With no stage, this is transitions
+    out of the last stage: new customers.
+    """
+
+    # This modelling is roughly based on the Senovo B2B SaaS Excel. I'm not confident that only including sales "effectiveness" on the
+    # initial transition is a good idea, but that's how they do it so I'm going to replicate for the like-for-like transition.
 
-        return round(net_conversion_rate_since_stage_0 * proportional_transitions)
+    # Transitions into the first stage are the lead quota per rep * number of "effective reps" for each sales role type. An
+    # "effective rep" is based on how many reps are available, given that they ramp up over some period of time. Later stages follow
+    # from the first (see `funnel_kernel`).
+    stages = customer_type.lead_config.stages
+    stage_number = len(stages) if stage is None else stages.index(stage)
+    return int(lead_funnel(scenario).new_transitions(customer_type, stage_number, month_year)[0])
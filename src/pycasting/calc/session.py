@@ -0,0 +1,260 @@
+"""
+Memoization of calc functions. Rather than each function holding a global `lru_cache`, memo tables are owned by a `ForecastSession`,
+which can bound them, report on them, and be dropped as a unit.
+
+    with ForecastSession(maxsize=10_000, max_bytes=500_000_000) as session:
+        df = forecast(scenario, actuals, 24)
+        print(session.stats())
+        print(session.memory_report().format())
+
+Outside of any `with` block, calls are memoized in a default (unbounded) session, which behaves like the old `lru_cache`s.
+"""
+import functools
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Optional, Set, Tuple, TypeVar
+
+from pycasting.calc.memory import MemoryReport, Retained, TableMemory, retained
+
+if TYPE_CHECKING:
+    from pycasting.calc.profiling import Profiler
+
+F = TypeVar("F", bound=Callable)
+
+_missing = object()
+_kwargs_mark = (object(),)
+# Names of memoized functions whose values keep growing (see `memoize`)
+_growing: Set[str] = set()
+# Entries kept of each of those, with `max_bytes` but no `maxsize`. They're few (e.g. one per scenario), but large.
+GROWING_MAXSIZE = 16
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    currsize: int
+    maxsize: Optional[int]
+
+
+class MemoTable:
+    """
+    Least-recently-used memo table for a single function. With a `sizer`, the bytes retained by each value (given its key) are estimated
+    as it's put,
+    and `on_put` is called after each put (e.g. to evict entries when over a memory budget).
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        sizer: Optional[Callable[[Hashable, Any], int]] = None,
+        on_put: Optional[Callable[["MemoTable", Hashable], None]] = None,
+    ):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = dict()
+        self._sizer = sizer
+        self._on_put = on_put
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._entries.get(key, _missing)
+            if value is _missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        size = self._sizer(key, value) if self._sizer is not None else 0
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._pop_oldest()
+        if self._on_put is not None:
+            self._on_put(self, key)
+
+    def _pop_oldest(self):
+        key, _ = self._entries.popitem(last=False)
+        self.nbytes -= self._sizes.pop(key, 0)
+        self.evictions += 1
+
+    def evict_oldest(self, keep: Optional[Hashable] = None) -> bool:
+        """Evict the least recently used entry, unless it's `keep`. Returns whether one was evicted."""
+        with self._lock:
+            if not self._entries or next(iter(self._entries)) == keep:
+                return False
+            self._pop_oldest()
+            return True
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+
+    def stats(self) -> CacheStats:
+        return CacheStats(hits=self.hits, misses=self.misses, evictions=self.evictions, currsize=len(self), maxsize=self.maxsize)
+
+
+class ForecastSession:
+    """
+    Owns the memo tables of the calc functions. `maxsize` bounds the number of entries kept per function (`None` for unbounded), and
+    `maxsizes` overrides it for individual functions, by name (e.g. `"customer_ages"`).
+
+    `max_bytes` bounds the (estimated) bytes retained by memoized values, across every function. When over, least recently used entries
+    are evicted from the largest tables first. Estimating sizes costs a little on every new entry, so it's only done with `max_bytes`.
+    Values which keep growing once memoized (see `memoize(grows=True)`) can't be sized when put, so are bounded by `maxsize` instead (or,
+    without one, `GROWING_MAXSIZE`).
+    """
+
+    def __init__(
+        self, maxsize: Optional[int] = None, maxsizes: Optional[Dict[str, Optional[int]]] = None, max_bytes: Optional[int] = None
+    ):
+        self.maxsize = maxsize
+        self.maxsizes = dict(maxsizes or {})
+        self.max_bytes = max_bytes
+        self._tables: Dict[str, MemoTable] = dict()
+        self._lock = threading.Lock()
+        self._tokens: List[Token] = list()
+        # Records calls while profiling (see `profiling.profile`)
+        self.profiler: Optional["Profiler"] = None
+
+    def table(self, name: str) -> MemoTable:
+        table = self._tables.get(name)
+        if table is None:
+            with self._lock:
+                if name not in self._tables:
+                    maxsize = self.maxsizes.get(name, self.maxsize)
+                    if self.max_bytes is not None and name in _growing:
+                        self._tables[name] = MemoTable(maxsize if maxsize is not None else GROWING_MAXSIZE)
+                    elif self.max_bytes is None:
+                        self._tables[name] = MemoTable(maxsize)
+                    else:
+                        self._tables[name] = MemoTable(maxsize, sizer=_value_bytes, on_put=self._shrink)
+                table = self._tables[name]
+        return table
+
+    @property
+    def nbytes(self) -> int:
+        """Estimated bytes retained by memoized values. Only tracked with `max_bytes`."""
+        return sum(table.nbytes for table in list(self._tables.values()))
+
+    def _shrink(self, table: MemoTable, key: Hashable):
+        """Evict entries until within `max_bytes`, other than the one just put."""
+        while self.nbytes > self.max_bytes:
+            largest = sorted(self._tables.values(), key=lambda t: t.nbytes, reverse=True)
+            if not any(t.evict_oldest(keep=key if t is table else None) for t in largest):
+                break
+
+    def memory_report(self) -> MemoryReport:
+        """
+        Bytes retained by each memo table's values (and how much of that is uncertainty bookkeeping), and by its keys. Objects shared
+        between entries are only counted once: for keys retaining them, or else the first table (by name) retaining them.
+        """
+        items = {name: table.items() for name, table in sorted(self._tables.items())}
+        seen = set()
+        # Keys first, so inputs (like scenarios) kept by values are counted as keys, as when sizing values for `max_bytes`
+        keys = {name: sum((retained(key, seen) for key, _ in entries), Retained()) for name, entries in items.items()}
+        values = {name: sum((retained(value, seen) for _, value in entries), Retained()) for name, entries in items.items()}
+        return MemoryReport({name: TableMemory(len(entries), values[name], keys[name]) for name, entries in items.items()})
+
+    def stats(self) -> Dict[str, CacheStats]:
+        """Hit/miss counts and sizes, per memoized function."""
+        return {name: table.stats() for name, table in self._tables.items()}
+
+    def clear(self):
+        """Drop every memoized value. Stats are kept."""
+        for table in self._tables.values():
+            table.clear()
+
+    def __enter__(self) -> "ForecastSession":
+        self._tokens.append(_active_session.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _active_session.reset(self._tokens.pop())
+
+
+_default_session = ForecastSession()
+_active_session: ContextVar[ForecastSession] = ContextVar("pycasting_forecast_session", default=_default_session)
+
+
+def current_session() -> ForecastSession:
+    """The session calc functions are currently memoized in."""
+    return _active_session.get()
+
+
+def _make_key(args: Tuple, kwargs: Dict[str, Any]) -> Hashable:
+    if not kwargs:
+        return args
+    return args + _kwargs_mark + tuple(kwargs.items())
+
+
+def _value_bytes(key: Hashable, value: Any) -> int:
+    """Bytes retained by a memoized value, other than its arguments (e.g. a scenario it keeps), which are shared inputs."""
+    return retained(value, {id(part) for part in key} if isinstance(key, tuple) else {id(key)}).bytes
+
+
+def memoize(fn: Optional[F] = None, *, grows: bool = False) -> F:
+    """
+    Memoize a function (with hashable arguments) in the current `ForecastSession`. With `grows`, its values keep growing after being
+    memoized (e.g. plans extended as later months are asked for), so their bytes aren't tracked against the session's `max_bytes`.
+    """
+    if fn is None:
+        return functools.partial(memoize, grows=grows)
+    name = fn.__name__
+    if grows:
+        _growing.add(name)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        session = _active_session.get()
+        table = session.table(name)
+        key = _make_key(args, kwargs)
+        if session.profiler is not None:
+            return session.profiler.call(name, fn, args, kwargs, table, key)
+
+        value = table.get(key)
+        if value is _missing:
+            value = fn(*args, **kwargs)
+            table.put(key, value)
+        return value
+
+    wrapper.cache_clear = lambda: _active_session.get().table(name).clear()
+    wrapper.cache_info = lambda: _active_session.get().table(name).stats()
+
+    return wrapper
+
+
+def instrument(fn: F, name: Optional[str] = None) -> F:
+    """Record calls of a function (which isn't memoized) while profiling, as `name` (by default, the function's name)."""
+    name = name or fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        profiler = _active_session.get().profiler
+        if profiler is None:
+            return fn(*args, **kwargs)
+        return profiler.call(name, fn, args, kwargs)
+
+    return wrapper
@@ -0,0 +1,191 @@
+"""
+Parameter sweeps. A grid of overrides is applied to a base `Scenario`, and each variant is forecast in a pool of worker processes. Workers
+receive the base scenario once, when they start, and only overrides are sent per variant. Each variant comes back as a small
+`SweepSummary` rather than a dataframe, and only a bounded number of variants are in flight at a time, so sweeps of any size run in
+bounded memory.
+
+    grid = {
+        "customer_types.Small - Seat Based.churn": [0.02, 0.05, 0.1],
+        "headcount.Sales Rep.hire_predictor.hires_per_year": [2, 4, 8],
+    }
+    for summary in sweep(scenario, actuals, grid, months_ahead=36, at_months=(12, 24)):
+        print(summary.overrides, summary.runway_months, summary.cash_on_hand[12])
+"""
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel as PydanticBaseModel
+
+from pycasting.calc.vectorized import forecast_counts, first_order_frame
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario
+
+# A field of a (nested) model: either dotted ("customer_types.Small - Seat Based.churn") or as a tuple of segments. Items of tuple fields
+# are addressed by their `name` or by index.
+OverridePath = Union[str, Tuple[Union[str, int], ...]]
+Overrides = Mapping[OverridePath, Any]
+
+
+@dataclass(frozen=True)
+class SweepSummary:
+    """The headline numbers of one variant of a sweep. Months are offsets from the first forecast month (the `accurate_as_of` month)."""
+
+    index: int
+    overrides: Dict[OverridePath, Any]
+    # First month cash on hand is negative, or `None` if it stays positive over the horizon
+    runway_months: Optional[int]
+    min_cash_on_hand: float
+    cash_on_hand: Dict[int, float]
+    # Monthly recurring revenue (monthly and usage fees) collected in the month
+    mrr: Dict[int, float]
+
+
+def _segments(path: OverridePath) -> Tuple[Union[str, int], ...]:
+    return tuple(path.split(".")) if isinstance(path, str) else tuple(path)
+
+
+def _item_position(items: Tuple, segment: Union[str, int]) -> int:
+    if isinstance(segment, int) or segment.isdigit():
+        return int(segment)
+    for i, item in enumerate(items):
+        if getattr(item, "name", None) == segment:
+            return i
+    raise KeyError(f"No item named {segment!r}")
+
+
+def _override(value: Any, segments: Tuple[Union[str, int], ...], new: Any) -> Any:
+    if not segments:
+        return new
+
+    segment, rest = segments[0], segments[1:]
+    if isinstance(value, tuple):
+        i = _item_position(value, segment)
+        return value[:i] + (_override(value[i], rest, new),) + value[i + 1 :]
+    # Predictor models are plain pydantic models
+    if isinstance(value, PydanticBaseModel):
+        if segment not in value.__fields__:
+            raise KeyError(f"{value.__class__.__name__} has no field {segment!r}")
+        # Re-validated, as overrides may be given in input form (e.g. "10+/-2" for a `UFloat`)
+        return value.__class__(**{**value.__dict__, segment: _override(getattr(value, segment), rest, new)})
+    raise KeyError(f"Can't override {segment!r} of a {value.__class__.__name__}")
+
+
+def apply_overrides(scenario: Scenario, overrides: Overrides) -> Scenario:
+    """
+    A copy of `scenario` with the given fields replaced. The models along each path are rebuilt, and validated, so values can be given
+    as they would be in a scenario file.
+    """
+    for path, value in overrides.items():
+        scenario = _override(scenario, _segments(path), value)
+    return scenario
+
+
+def summarize(scenario: Scenario, actuals: Actuals, months_ahead: int, at_months: Sequence[int]) -> Tuple:
+    """(runway months, min cash on hand, cash on hand, mrr) of a forecast, with the last two at `at_months`."""
+    counts = forecast_counts(scenario, actuals, months_ahead)
+    df = first_order_frame(counts, actuals)
+
+    cash_on_hand = df["cash_on_hand"].to_numpy()
+    setup_fees = sum(
+        ct_counts.customer_type.setup_fee.nominal_value * ct_counts.collected(ct_counts.new, counts.behind)
+        for ct_counts in counts.customer_types
+    )
+    mrr = df["revenue"].to_numpy() - setup_fees
+
+    negative = np.flatnonzero(cash_on_hand < 0)
+    return (
+        int(negative[0]) if len(negative) else None,
+        float(cash_on_hand.min()),
+        {m: float(cash_on_hand[m]) for m in at_months},
+        {m: float(mrr[m]) for m in at_months},
+    )
+
+
+def _summaries(
+    scenario: Scenario, actuals: Actuals, months_ahead: int, at_months: Sequence[int], variants: List[Tuple[int, Dict]]
+) -> List[SweepSummary]:
+    return [
+        SweepSummary(index, overrides, *summarize(apply_overrides(scenario, overrides), actuals, months_ahead, at_months))
+        for index, overrides in variants
+    ]
+
+
+# Per worker process: (base scenario, actuals, months ahead, at months), set once by `_init_worker`
+_worker_args: Optional[Tuple[Scenario, Actuals, int, Tuple[int, ...]]] = None
+
+
+def _init_worker(scenario: Dict, actuals: Dict, months_ahead: int, at_months: Tuple[int, ...]):
+    global _worker_args
+    # Models are sent as dicts, since the (dynamically created) predictor models can't be pickled
+    _worker_args = Scenario(**scenario), Actuals(**actuals), months_ahead, at_months
+
+
+def _worker_summaries(variants: List[Tuple[int, Dict]]) -> List[SweepSummary]:
+    return _summaries(*_worker_args, variants)
+
+
+def variants_of(overrides_grid: Union[Mapping[OverridePath, Sequence[Any]], Iterable[Overrides]]) -> Iterator[Dict[OverridePath, Any]]:
+    """
+    The overrides of each variant of a grid. A mapping of path to values is expanded to every combination of values (lazily), anything
+    else is taken as an iterable of overrides.
+    """
+    if isinstance(overrides_grid, Mapping):
+        paths = list(overrides_grid.keys())
+        for values in itertools.product(*overrides_grid.values()):
+            yield dict(zip(paths, values))
+    else:
+        for overrides in overrides_grid:
+            yield dict(overrides)
+
+
+def sweep(
+    base_scenario: Scenario,
+    actuals: Actuals,
+    overrides_grid: Union[Mapping[OverridePath, Sequence[Any]], Iterable[Overrides]],
+    months_ahead: int,
+    workers: Optional[int] = None,
+    at_months: Sequence[int] = (12,),
+    chunksize: int = 16,
+) -> Iterator[SweepSummary]:
+    """
+    Forecast every variant of `overrides_grid` (see `variants_of` and `apply_overrides`) on top of `base_scenario`, yielding a
+    `SweepSummary` per variant, in grid order. Cash on hand and MRR are summarized at each of `at_months`.
+
+    Variants are forecast with the vectorized engine, in `workers` processes (all cores by default; 1 or less runs in this process), in
+    chunks of `chunksize` variants. At most a few chunks per worker are queued at a time.
+    """
+    at_months = tuple(at_months)
+    if any(not 0 <= m < months_ahead for m in at_months):
+        raise ValueError(f"at_months must be within the forecast horizon (0 to {months_ahead - 1})")
+
+    workers = os.cpu_count() if workers is None else workers
+    chunks = _chunked(enumerate(variants_of(overrides_grid)), chunksize)
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _summaries(base_scenario, actuals, months_ahead, at_months, chunk)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(base_scenario.dict(), actuals.dict(), months_ahead, at_months),
+    ) as executor:
+        in_flight: Deque[Future] = deque()
+        for chunk in chunks:
+            in_flight.append(executor.submit(_worker_summaries, chunk))
+            if len(in_flight) >= 4 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def _chunked(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
@@ -1,17 +1,18 @@
 from pycasting.calc.customers import customer_ages
-from pycasting.calc.predictors import predict, PredictorCategory
+from pycasting.calc.predictors import PredictorCategory, predictor_plan
+from pycasting.calc.session import instrument
 from pycasting.pydanticmodels.actuals import Actuals
 from pycasting.pydanticmodels.predictions import CustomerType, Scenario
 from pycasting.misc import MonthYear, UFloat
 
 
+@instrument
 def estimate_usage(customer_type: CustomerType, start: MonthYear, effective: MonthYear) -> UFloat:
     """Estimates usage for this customer type"""
-    usage_predictor = customer_type.usage_predictor
-    params = usage_predictor.dict(exclude={"name"})
-    return predict(PredictorCategory.usage, usage_predictor.name, effective.end_of_month, params, start.end_of_month)
+    return predictor_plan(PredictorCategory.usage, customer_type.usage_predictor)(effective.end_of_month, start.end_of_month)
 
 
+@instrument
 def estimate_total_usage(scenario: Scenario, actuals: Actuals, effective: MonthYear, customer_type: CustomerType):
     """Estimate total usage in given month for given customer type"""
     return sum(
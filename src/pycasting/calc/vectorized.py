@@ -0,0 +1,337 @@
+"""
+Array-based forecasting. Rather than walking the horizon one `MonthYear` at a time through the (cached) scalar calc functions, every
+series is computed for the whole horizon at once as month-indexed NumPy arrays.
+
+Results match the scalar calc functions: counts (hires, transitions, customers) are identical, and revenue/expenses are identical up to
+float summation order. Uncertainty is propagated to first order like `uncertainties` does, but densely: every uncertain series carries
+a jacobian against the independent variables it depends on.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from uncertainties.core import AffineScalarFunc
+
+from pycasting.calc.customers import CohortSimulator
+from pycasting.calc.headcount import HeadcountPlan
+from pycasting.calc.sales import LeadFunnel
+from pycasting.calc.predictors import PredictedCompanyState, PredictorCategory, predictor_plan, as_datetime64
+from pycasting.misc import MonthYear
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario, CustomerType, Role, EmployeeCosts
+from pycasting.uncertainty import AffineArray, VariableIndex
+
+
+def _cumulative_hires(
+    role: Role, origin: MonthYear, offsets: range, states: Optional[Sequence[PredictedCompanyState]] = None
+) -> np.ndarray:
+    """Hires through the end of each month offset. Mirrors `headcount.hires_through_effective_date`."""
+    plan = predictor_plan(PredictorCategory.headcount, role.hire_predictor)
+    end_of_months = as_datetime64([origin.shift_month(offset).end_of_month for offset in offsets])
+    return np.rint(plan.predict_array(end_of_months, states=states)).astype(np.int64)
+
+
+def usage_dates(origin: MonthYear, months: int) -> np.ndarray:
+    """End of month dates of each month offset, as `datetime64`s."""
+    return as_datetime64([origin.shift_month(offset).end_of_month for offset in range(months)])
+
+
+def usage_per_customer(customer_type: CustomerType, origin: MonthYear, months: int, index: VariableIndex) -> AffineArray:
+    """
+    Expected usage per customer at each month offset (rows) by start month offset (columns). Only customers who started from offset 1
+    (the first unknown month) through the effective month are predicted, the rest are 0. Mirrors `usage.estimate_usage`.
+    """
+    plan = predictor_plan(PredictorCategory.usage, customer_type.usage_predictor)
+    end_of_months = usage_dates(origin, months)
+    started = np.tri(months, dtype=bool)
+    started[:, 0] = False
+
+    if not plan.vectorized:
+        usage = plan.predict_array(end_of_months[:, np.newaxis], end_of_months[np.newaxis, :])
+        return index.lift(np.where(started, usage, 0.0))
+
+    # The array form is evaluated on `AffineArray` params, so uncertainty is propagated with array operations
+    plan = plan.bind(**{k: index.lift(v) for k, v in plan.params.items() if isinstance(v, AffineScalarFunc)})
+    usage = plan.predict_array(end_of_months[:, np.newaxis], end_of_months[np.newaxis, :])
+    if not isinstance(usage, AffineArray):
+        usage = index.lift(usage)
+    return usage * started
+
+
+@dataclass(frozen=True)
+class CustomerTypeCounts:
+    """Customer counts of a single type, for a forecast."""
+
+    customer_type: CustomerType
+    # New and total customers for month offsets `-behind` through `months_ahead - 1` (see `ForecastCounts`)
+    new: np.ndarray
+    total: np.ndarray
+    # Customers by start month offset (columns) at the end of each forecast month (rows)
+    cohorts: np.ndarray
+
+    def collected(self, values: np.ndarray, behind: int) -> np.ndarray:
+        """The forecast months of `values` (indexed like `new`), delayed by this customer type's `payment_months_behind`."""
+        start = behind - self.customer_type.payment_months_behind
+        return values[start : start + len(self.cohorts)]
+
+
+@dataclass(frozen=True)
+class ForecastCounts:
+    """
+    Everything in a forecast which doesn't depend on uncertain values: customers, leads and headcount, and the costs following from
+    them. Arrays are indexed by month offset from `origin`, starting at offset 0 unless noted otherwise.
+    """
+
+    origin: MonthYear
+    months_ahead: int
+    # How many months before offset 0 customer counts start at, to cover payments collected late
+    behind: int
+    customer_types: Tuple[CustomerTypeCounts, ...]
+    total_customers: np.ndarray
+    marketing: np.ndarray
+    salaries: np.ndarray
+    cac_salaries: np.ndarray
+    misc: float
+    bizdev: float
+
+    @property
+    def month_years(self) -> List[MonthYear]:
+        return [self.origin.shift_month(offset) for offset in range(self.months_ahead)]
+
+
+def forecast_counts(scenario: Scenario, actuals: Actuals, months_ahead: int) -> ForecastCounts:
+    """Count customers, leads and hires for the whole horizon."""
+    origin = MonthYear.from_date(actuals.accurate_as_of)
+
+    # Revenue is collected some months behind, so new/total customers are needed from before the first forecast month
+    behind = months_behind(scenario)
+    hires = HeadcountPlan(scenario.headcount)
+    funnel = LeadFunnel(scenario.customer_types, hires, origin.shift_month(-behind), behind + months_ahead)
+
+    customer_types = [customer_type_counts(ct, funnel, actuals, behind, months_ahead) for ct in scenario.customer_types]
+
+    states = company_states(customer_types, actuals, behind, months_ahead)
+    role_costs = [role_cost_series(role, scenario.employee_costs, hires, origin, months_ahead, states) for role in scenario.headcount]
+
+    return combine_counts(scenario, origin, months_ahead, behind, customer_types, role_costs)
+
+
+def months_behind(scenario: Scenario) -> int:
+    """How many months before the first forecast month customer counts are needed from, to cover payments collected late."""
+    return max((ct.payment_months_behind for ct in scenario.customer_types), default=0)
+
+
+def customer_type_counts(
+    customer_type: CustomerType, funnel: LeadFunnel, actuals: Actuals, behind: int, months_ahead: int
+) -> Tuple[CustomerTypeCounts, np.ndarray]:
+    """Customers of a type for the whole horizon, and its marketing spend in each forecast month."""
+    origin = MonthYear.from_date(actuals.accurate_as_of)
+
+    # New customers for offsets -behind..months_ahead - 1. Position `p` is offset `p - behind`.
+    stages = len(customer_type.lead_config.stages)
+    new = funnel.new_transitions(customer_type, stages, origin.shift_month(-behind), behind + months_ahead)
+
+    # Simulated from the first unknown month, offset 1
+    cohorts = np.zeros((months_ahead, months_ahead), dtype=np.int64)
+    simulator = CohortSimulator(origin.shift_month(1), customer_type.churn, lambda month: new[behind + 1 + month])
+    cohorts[1:, 1:] = simulator.snapshots(months_ahead - 1)
+    known = actuals.active_customers.get(customer_type.name, 0)
+    total = np.concatenate([np.full(behind + 1, known, dtype=np.int64), cohorts[1:].sum(axis=1)])
+
+    # Marketing spend = cpc * clicks = cpc * (new_leads / (qualified lead to click ratio))
+    new_qualified_leads = funnel.new_transitions(customer_type, 0, origin, months_ahead)
+    lead_config = customer_type.lead_config
+    marketing = lead_config.cost_per_ad_click * new_qualified_leads / lead_config.qualified_lead_to_click_ratio
+
+    return CustomerTypeCounts(customer_type=customer_type, new=new, total=total, cohorts=cohorts), marketing
+
+
+def total_customers_of(customer_types: Sequence[Tuple[CustomerTypeCounts, np.ndarray]], behind: int, months_ahead: int) -> np.ndarray:
+    """Customers of every type at the end of each forecast month."""
+    total_customers = np.zeros(months_ahead, dtype=np.int64)
+    for ct_counts, _ in customer_types:
+        total_customers += ct_counts.total[behind:]
+    return total_customers
+
+
+def company_states(
+    customer_types: Sequence[Tuple[CustomerTypeCounts, np.ndarray]], actuals: Actuals, behind: int, months_ahead: int
+) -> List[PredictedCompanyState]:
+    """State of the company in each forecast month, for state dependent predictors."""
+    return [
+        PredictedCompanyState(number_of_customers=int(n), actuals=actuals) for n in total_customers_of(customer_types, behind, months_ahead)
+    ]
+
+
+def role_cost_series(
+    role: Role,
+    employee_costs: EmployeeCosts,
+    hires: HeadcountPlan,
+    origin: MonthYear,
+    months_ahead: int,
+    states: Optional[Sequence[PredictedCompanyState]] = None,
+) -> np.ndarray:
+    """Cost of everyone hired into a role, in each forecast month. `states` are only used by state dependent roles."""
+    role_cost = role.monthly_salary + (role.monthly_salary * employee_costs.annual_percent + employee_costs.annual_fixed) / 12
+    if hires.is_state_dependent(role):
+        role_hires = _cumulative_hires(role, origin, range(0, months_ahead), states)
+    else:
+        role_hires = hires.hires_through_months(role, origin, months_ahead)
+    return role_cost * role_hires
+
+
+def combine_counts(
+    scenario: Scenario,
+    origin: MonthYear,
+    months_ahead: int,
+    behind: int,
+    customer_types: Sequence[Tuple[CustomerTypeCounts, np.ndarray]],
+    role_costs: Sequence[np.ndarray],
+) -> ForecastCounts:
+    """
+    Counts of a forecast from those of each customer type (with its marketing spend), and the costs of each role, in the order of the
+    scenario.
+    """
+    marketing = np.zeros(months_ahead)
+    for _, ct_marketing in customer_types:
+        marketing = marketing + ct_marketing
+
+    # Salaries etc.
+    salaries = np.zeros(months_ahead)
+    cac_salaries = np.zeros(months_ahead)
+    for role, total_role_cost in zip(scenario.headcount, role_costs):
+        salaries = salaries + total_role_cost
+        if role.customer_acquisition:
+            cac_salaries = cac_salaries + total_role_cost
+
+    return ForecastCounts(
+        origin=origin,
+        months_ahead=months_ahead,
+        behind=behind,
+        customer_types=tuple(ct_counts for ct_counts, _ in customer_types),
+        total_customers=total_customers_of(customer_types, behind, months_ahead),
+        marketing=marketing,
+        salaries=salaries,
+        cac_salaries=cac_salaries,
+        misc=sum(exp.monthly for exp in scenario.misc_expenses),
+        bizdev=sum(exp.monthly for exp in scenario.misc_bizdev_expenses),
+    )
+
+
+def forecast_frame(
+    month_years: Sequence[MonthYear],
+    revenue: Tuple[np.ndarray, np.ndarray],
+    expenses: Tuple[np.ndarray, np.ndarray],
+    cac_expenses: Tuple[np.ndarray, np.ndarray],
+    cashflow: Tuple[np.ndarray, np.ndarray],
+    cash_on_hand: Tuple[np.ndarray, np.ndarray],
+    new_customers: np.ndarray,
+    revenue_per_customer: Dict[str, Tuple[np.ndarray, np.ndarray]],
+) -> pd.DataFrame:
+    """Lay out (nominal, std dev) series and new customer counts of the given months in the columns of `forecasting.forecast`."""
+    # Typed up front, so a forecast of no months has the same dtypes
+    data = {
+        "month": np.array([my.month for my in month_years], dtype=np.int64),
+        "year": np.array([my.year for my in month_years], dtype=np.int64),
+        "month_year": pd.Series([repr(my) for my in month_years], dtype=str),
+        "eom_date": np.array([my.end_of_month for my in month_years], dtype=object),
+    }
+    for name, (nominal, std_dev) in (
+        ("revenue", revenue),
+        ("expenses", expenses),
+        ("cac_expenses", cac_expenses),
+        ("cashflow", cashflow),
+        ("cash_on_hand", cash_on_hand),
+    ):
+        data[name] = nominal
+        data[f"{name}_stddev"] = std_dev
+    data["new_customers"] = new_customers
+    data.update({f"revenue__{k}": nominal for k, (nominal, _) in revenue_per_customer.items()})
+    data.update({f"revenue_stddev__{k}": std_dev for k, (_, std_dev) in revenue_per_customer.items()})
+
+    return pd.DataFrame(data)
+
+
+def empty_forecast_frame(scenario: Scenario) -> pd.DataFrame:
+    """The dataframe of `forecasting.forecast` for a horizon of no months."""
+    empty = (np.empty(0), np.empty(0))
+    return forecast_frame(
+        [], empty, empty, empty, empty, empty, np.empty(0, dtype=np.int64), {ct.name: empty for ct in scenario.customer_types}
+    )
+
+
+def vectorized_forecast(scenario: Scenario, actuals: Actuals, months_ahead: int) -> pd.DataFrame:
+    """Generate the same dataframe as `forecasting.forecast`, computing whole-horizon arrays in one pass."""
+    if months_ahead <= 0:
+        return empty_forecast_frame(scenario)
+
+    return first_order_frame(forecast_counts(scenario, actuals, months_ahead), actuals)
+
+
+def first_order_frame(counts: ForecastCounts, actuals: Actuals) -> pd.DataFrame:
+    """Value the counts of a forecast, with first order uncertainty propagation."""
+    values = [customer_type_values(ct_counts, counts.origin, counts.months_ahead, counts.behind) for ct_counts in counts.customer_types]
+    return value_frame(counts, actuals, values)
+
+
+def customer_type_values(
+    ct_counts: CustomerTypeCounts, origin: MonthYear, months_ahead: int, behind: int
+) -> Tuple[AffineArray, AffineArray]:
+    """(revenue, COGS) of a customer type in each forecast month, against an index of its own variables."""
+    customer_type = ct_counts.customer_type
+    local = VariableIndex()
+
+    usage = usage_per_customer(customer_type, origin, months_ahead, local)
+    usage_income = (usage * customer_type.usage_fee * ct_counts.cohorts).sum(axis=1)
+
+    # Collected `payment_months_behind` late
+    revenue = local.lift(customer_type.setup_fee) * ct_counts.collected(ct_counts.new, behind)
+    revenue = revenue + local.lift(customer_type.monthly_fee) * ct_counts.collected(ct_counts.total, behind)
+    revenue = revenue + delayed(usage_income, customer_type.payment_months_behind)
+
+    # Usage is summed over every start month simulated so far
+    monthly_usage = usage.sum(axis=1)
+    cogs = local.lift(customer_type.cogs.monthly) + local.lift(customer_type.cogs.per_usage) * monthly_usage
+
+    return revenue, cogs
+
+
+def value_frame(counts: ForecastCounts, actuals: Actuals, values: Sequence[Tuple[AffineArray, AffineArray]]) -> pd.DataFrame:
+    """The forecast dataframe, from the counts of a forecast and the (revenue, COGS) of each of its customer types."""
+    months_ahead = counts.months_ahead
+    index = VariableIndex()
+
+    revenue_per_customer: Dict[str, AffineArray] = dict()
+    cogs: AffineArray = index.lift(np.zeros(months_ahead))
+
+    for ct_counts, (ct_revenue, ct_cogs) in zip(counts.customer_types, values):
+        revenue_per_customer[ct_counts.customer_type.name] = ct_revenue.reindexed(index)
+        cogs = cogs + ct_cogs.reindexed(index)
+
+    revenue: AffineArray = sum(revenue_per_customer.values(), index.lift(np.zeros(months_ahead)))
+    expenses = cogs + (counts.marketing + counts.salaries + counts.misc + counts.bizdev)
+    cac_expenses = index.lift(counts.marketing + counts.cac_salaries + counts.bizdev)
+    cashflow = revenue - expenses
+    cash_on_hand = cashflow.cumsum() + actuals.cash_on_hand
+    new_customers = sum((ct_counts.new[counts.behind :] for ct_counts in counts.customer_types), np.zeros(months_ahead, dtype=np.int64))
+
+    return forecast_frame(
+        counts.month_years,
+        revenue=(revenue.nominal, revenue.std_dev),
+        expenses=(expenses.nominal, expenses.std_dev),
+        cac_expenses=(cac_expenses.nominal, cac_expenses.std_dev),
+        cashflow=(cashflow.nominal, cashflow.std_dev),
+        cash_on_hand=(cash_on_hand.nominal, cash_on_hand.std_dev),
+        new_customers=new_customers,
+        revenue_per_customer={k: (v.nominal, v.std_dev) for k, v in revenue_per_customer.items()},
+    )
+
+
+def delayed(values, shift: int):
+    """Delay a series (by its first axis) by `shift` months, filling the start with zeros."""
+    if isinstance(values, AffineArray):
+        return AffineArray(delayed(values.nominal, shift), delayed(values.jacobian, shift), values.index)
+
+    shift = min(shift, len(values))
+    return np.concatenate([np.zeros((shift,) + values.shape[1:]), values[: len(values) - shift]])
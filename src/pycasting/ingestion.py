@@ -0,0 +1,214 @@
+"""
+Building `Actuals` from ledger exports and customer lists (see `pycasting actuals`), as csv files too large to load whole. Files are read
+in chunks, of only the columns needed, and each chunk is aggregated then dropped:
+
+- Ledger exports have a row per transaction, with a date and a signed amount. Cash on hand is the opening balance plus every amount.
+- Customer lists have a row per customer, with its type, start date, and end date (empty while active).
+
+Actuals are as of the end of a month, so later rows are left for the next update. Given the previous actuals, only what happened after
+them is added: transactions, customers starting and customers ending after their `accurate_as_of`.
+
+Ingested actuals keep a checkpoint per file: the end of its leading rows which are done with (transactions, and customers who've
+ended, by `accurate_as_of`). Updates resume reading from there, so exports which are appended to are only parsed from their new rows.
+Files which were rewritten instead (their bytes up to the checkpoint changed) are read again in full. Rows can't span lines.
+"""
+import hashlib
+import io
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from clearcut import get_logger
+
+from pycasting.misc import is_end_of_month
+from pycasting.pydanticmodels.actuals import Actuals, FileCheckpoint, IngestedActuals
+
+logger = get_logger(__name__)
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+@dataclass(frozen=True)
+class CsvColumns:
+    """Column names in ledger exports and customer lists."""
+
+    date: str = "date"
+    amount: str = "amount"
+    customer_type: str = "customer_type"
+    start_date: str = "start_date"
+    end_date: str = "end_date"
+    # e.g. "%d/%m/%Y". Inferred (per chunk) without one.
+    date_format: Optional[str] = None
+
+
+def last_month_end(today: Optional[date] = None) -> date:
+    """The end of the latest month that's over, which actuals are accurate as of by default."""
+    today = today or date.today()
+    return today if is_end_of_month(today) else today.replace(day=1) - timedelta(days=1)
+
+
+class _CsvReader:
+    """
+    Reads a csv file in chunks (indexed by line number), resuming from its checkpoint if it's only been appended to since. After each
+    chunk, `done` is given which of its rows are done with, and `checkpoint` is then the end of the leading rows which are.
+    """
+
+    def __init__(self, path: Path, dtypes: Dict[str, type], chunksize: int, checkpoint: Optional[FileCheckpoint]):
+        self.path = path
+        self.dtypes = dtypes
+        self.chunksize = chunksize
+        self.previous = checkpoint
+        self.checkpoint: Optional[FileCheckpoint] = None
+        # Rows parsed, other than blank lines
+        self.rows = 0
+        self._done: Optional[np.ndarray] = None
+
+    def _resume(self, f) -> hashlib.sha256:
+        """Seek to where to resume reading from, setting the checkpoint to it. Returns the hash of the file up to it."""
+        previous = self.previous
+        if previous is not None:
+            digest, remaining = hashlib.sha256(), previous.offset
+            while remaining > 0:
+                block = f.read(min(remaining, 1 << 20))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+            if remaining == 0 and digest.hexdigest() == previous.digest:
+                self.checkpoint = previous
+                return digest
+            logger.info(f"{self.path} was rewritten since it was last ingested, so is read in full")
+
+        f.seek(0)
+        header = f.readline()
+        self.checkpoint = FileCheckpoint(offset=len(header), lines=1, digest=hashlib.sha256(header).hexdigest())
+        return hashlib.sha256(header)
+
+    def done(self, done: pd.Series):
+        """Which rows of the last chunk are done with, so needn't be read again."""
+        self._done = done.to_numpy(dtype=bool)
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            f.seek(0)
+            digest = self._resume(f)
+            next_line = self.checkpoint.lines + 1
+            # Whether every row so far is done with, so the checkpoint can move past the next
+            leading = True
+            while lines := list(islice(f, self.chunksize)):
+                blank = np.array([not line.strip() for line in lines])
+                chunk = pd.read_csv(
+                    io.BytesIO(header + b"".join(lines)), usecols=list(self.dtypes), dtype=self.dtypes, skip_blank_lines=False
+                )
+                chunk.index = np.arange(next_line, next_line + len(lines))
+                next_line += len(lines)
+                chunk = chunk[~blank]
+                self.rows += len(chunk)
+
+                self._done = None
+                yield chunk
+                if not leading:
+                    continue
+
+                done = blank.copy()
+                if self._done is not None:
+                    done[~blank] = self._done
+                # A last line without a newline may still be being written
+                done[-1] &= lines[-1].endswith(b"\n")
+                count = len(lines) if done.all() else int(np.argmin(done))
+                piece = b"".join(lines[:count])
+                digest.update(piece)
+                offset, line = self.checkpoint.offset + len(piece), self.checkpoint.lines + count
+                self.checkpoint = FileCheckpoint(offset=offset, lines=line, digest=digest.hexdigest())
+                leading = count == len(lines)
+
+
+def _dates(path: Path, values: pd.Series, columns: CsvColumns, required: bool) -> pd.Series:
+    dates = pd.to_datetime(values, format=columns.date_format)
+    if required and dates.isna().any():
+        raise ValueError(f"{path}: missing {values.name} on line {values.index[dates.isna()][0]}")
+    return dates
+
+
+def _window(dates: pd.Series, after: Optional[date], until: date) -> pd.Series:
+    """Whether each date is in (after, until]. Times of day are ignored, and missing dates are in no window."""
+    in_window = dates < pd.Timestamp(until + timedelta(days=1))
+    if after is not None:
+        in_window &= dates >= pd.Timestamp(after + timedelta(days=1))
+    return in_window
+
+
+def ingest_actuals(
+    ledgers: Sequence[Union[str, Path]] = (),
+    customer_lists: Sequence[Union[str, Path]] = (),
+    as_of: Optional[date] = None,
+    previous: Optional[Actuals] = None,
+    opening_balance: float = 0.0,
+    columns: CsvColumns = CsvColumns(),
+    chunksize: int = DEFAULT_CHUNKSIZE,
+) -> IngestedActuals:
+    """
+    `Actuals` as of the end of a month (by default, the last one that's over), from ledger exports and customer lists. With `previous`
+    actuals, they're updated with only what happened after them, reading files from their checkpoints (if `previous` has them).
+    Otherwise cash on hand starts from `opening_balance`.
+    """
+    as_of = as_of or last_month_end()
+    if not is_end_of_month(as_of):
+        raise ValueError(f"Actuals must be as of the end of a month, not {as_of}")
+    after = previous.accurate_as_of if previous is not None else None
+    if after is not None and after > as_of:
+        raise ValueError(f"The previous actuals (as of {after}) are newer than {as_of}")
+
+    previous_checkpoints = previous.checkpoints if isinstance(previous, IngestedActuals) else {}
+    checkpoints: Dict[str, FileCheckpoint] = dict()
+
+    def readers(paths: Sequence[Union[str, Path]], dtypes: Dict[str, type]) -> Iterator[_CsvReader]:
+        for path in map(Path, paths):
+            key = str(path.resolve())
+            reader = _CsvReader(path, dtypes, chunksize, previous_checkpoints.get(key))
+            yield reader
+            checkpoints[key] = reader.checkpoint
+
+    cash_on_hand = previous.cash_on_hand if previous is not None else opening_balance
+    rows = used = 0
+    for reader in readers(ledgers, {columns.date: str, columns.amount: float}):
+        for chunk in reader:
+            dates = _dates(reader.path, chunk[columns.date], columns, required=True)
+            in_window = _window(dates, after, as_of)
+            amounts = chunk[columns.amount][in_window]
+            if amounts.isna().any():
+                raise ValueError(f"{reader.path}: missing {columns.amount} on line {amounts.index[amounts.isna()][0]}")
+            cash_on_hand += float(amounts.sum())
+            used += int(in_window.sum())
+            reader.done(_window(dates, None, as_of))
+        rows += reader.rows
+    logger.info(f"Read {rows} ledger rows, of which {used} are new")
+
+    active = Counter(previous.active_customers if previous is not None else {})
+    rows = 0
+    for reader in readers(customer_lists, {columns.customer_type: str, columns.start_date: str, columns.end_date: str}):
+        for chunk in reader:
+            types = chunk[columns.customer_type]
+            starts = _dates(reader.path, chunk[columns.start_date], columns, required=True)
+            ends = _dates(reader.path, chunk[columns.end_date], columns, required=False)
+            # Added and subtracted separately, as Counter arithmetic drops types without customers
+            active.update(types[_window(starts, after, as_of)].value_counts().to_dict())
+            active.subtract(types[_window(ends, after, as_of)].value_counts().to_dict())
+            # Customers who've started and ended won't be counted again
+            reader.done(_window(starts, None, as_of) & _window(ends, None, as_of))
+        rows += reader.rows
+    logger.info(f"Read {rows} customers")
+
+    for customer_type, count in active.items():
+        if count < 0:
+            raise ValueError(f"More {customer_type} customers ended than started, by {as_of}")
+
+    return IngestedActuals(
+        accurate_as_of=as_of, cash_on_hand=cash_on_hand, active_customers=dict(sorted(active.items())), checkpoints=checkpoints
+    )
@@ -0,0 +1,91 @@
+"""
+Loading scenarios and actuals from files.
+
+Validating a scenario (parsing every uncertain value, and picking predictor models) is most of the cost of loading it. With a
+`ResultCache`, scenarios are validated once per file content, and later loads rebuild them from their compact form (see
+`pydanticmodels.compact`) without validating again. `load_scenarios` validates files in parallel, across processes.
+"""
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from frozendict import frozendict
+
+from pycasting.calc.persistent import ResultCache, fingerprint
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.compact import dump_model, rebuild_model
+from pycasting.pydanticmodels.predictions import Scenario
+
+
+def content_hash(content: Union[str, bytes]) -> str:
+    """Hash of a file's contents, to key caches of what's loaded from it."""
+    return hashlib.sha256(content.encode() if isinstance(content, str) else content).hexdigest()
+
+
+def load_scenario(path: Union[str, Path], cache: Optional[ResultCache] = None) -> Scenario:
+    """Read a `Scenario` from a json file. With a `cache`, it's only validated if this content hasn't been before."""
+    content = Path(path).read_bytes()
+    if cache is None:
+        return Scenario(**json.loads(content))
+
+    key = scenario_cache_key(content)
+    compact = cache.get(key)
+    if compact is None:
+        compact = _validated(content)
+        cache.put(key, compact)
+    return rebuild_model(compact)
+
+
+def load_scenarios(
+    paths: Sequence[Union[str, Path]], cache: Optional[ResultCache] = None, max_workers: Optional[int] = None
+) -> List[Scenario]:
+    """
+    Read `Scenario`s from json files, in order. Those not in the `cache` are validated across (up to `max_workers`) processes. The first
+    invalid file raises its `ValidationError`.
+    """
+    contents = [Path(path).read_bytes() for path in paths]
+    keys = [scenario_cache_key(content) for content in contents]
+
+    compacts: Dict[str, Tuple] = cache.get_many(keys) if cache is not None else dict()
+
+    # Each distinct content is validated once
+    missing = {key: content for key, content in zip(keys, contents) if key not in compacts}
+    if len(missing) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers) as executor:
+            validated = dict(zip(missing, executor.map(_validated, missing.values())))
+    else:
+        validated = {key: _validated(content) for key, content in missing.items()}
+
+    compacts.update(validated)
+    if cache is not None:
+        cache.put_many(validated.items())
+    return [rebuild_model(compacts[key]) for key in keys]
+
+
+def scenario_cache_key(content: bytes) -> str:
+    """Key of a scenario file's compact form in a `ResultCache`, by the file's content."""
+    return fingerprint("scenario", content_hash(content))
+
+
+def _validated(content: bytes) -> Tuple:
+    """The compact form of a validated scenario. Returned, rather than the `Scenario`, as predictor models can't be pickled."""
+    return dump_model(Scenario(**json.loads(content)))
+
+
+def placeholder_actuals() -> Actuals:
+    """
+    Used when no actuals file is given. Built on each call, as they're accurate as of today. See `ingestion` (and `pycasting actuals`)
+    for building actuals from ledger exports.
+    """
+    return Actuals(cash_on_hand=210_000, active_customers=frozendict({"Small - Seat Based": 1}))
+
+
+def load_actuals(path: Optional[Path]) -> Actuals:
+    """Read `Actuals` from a json file (e.g. as written by `pycasting actuals`), or the placeholder actuals without one."""
+    if path is None:
+        return placeholder_actuals()
+
+    with open(path, "r") as f:
+        return Actuals(**json.load(f))
@@ -1,38 +1,224 @@
 """
-Runs forecasting.
-Run this app with `python app.py` and visit http://127.0.0.1:8050/ in your web browser.
+Runs forecasting. `run` forecasts headlessly, writing the results to a file:
+
+    pycasting run examples/example_scenario.json --actuals actuals.json --output forecast.parquet
+
+`actuals` builds actuals from ledger exports and customer lists, updating previous ones with only what's new:
+
+    pycasting actuals --ledger ledger.csv --customers customers.csv --previous actuals.json -o actuals.json
+
+`validate` validates scenario files in bulk:
+
+    pycasting validate scenarios/ "more/**/*.json"
+
+and `dashboard` shows them in a streamlit dashboard:
+
+    streamlit run src/pycasting/main.py -- dashboard examples/example_scenario.json
+
+The dashboard stack (streamlit, altair, numerize) is only imported by `dashboard`. Its parsed files and forecasts are cached across reruns
+and sessions of the streamlit server.
 """
+import functools
+import importlib.util
 import json
+import math
+import sys
+from datetime import datetime
+from enum import Enum
 from pathlib import Path
+from typing import Callable, List, Optional, Tuple
 
-import altair as alt
-import streamlit as st
+import pandas as pd
 import typer
-from frozendict import frozendict
-from numerize.numerize import numerize
 
-from pycasting.calc.cashflow import monthly_revenue, monthly_expenses
-from pycasting.calc.customers import new_customers
-from pycasting.calc.forecasting import forecast
-from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.calc import profiling
+from pycasting.calc.forecasting import forecast, ForecastEngine
+from pycasting.calc.persistent import ResultCache
+from pycasting.calc.session import ForecastSession, current_session
+from pycasting.ingestion import DEFAULT_CHUNKSIZE, ingest_actuals, last_month_end
+from pycasting.loading import content_hash, load_actuals, load_scenario
+from pycasting.pydanticmodels.actuals import Actuals, IngestedActuals
 from pycasting.pydanticmodels.predictions import Scenario
+from pycasting.validation import scenario_paths, validate_files
 
 cli = typer.Typer()
 
 
+class OutputFormat(Enum):
+    csv = "csv"
+    json = "json"
+    parquet = "parquet"
+
+
+@cli.command()
+def run(
+    scenario: Path,
+    actuals: Optional[Path] = typer.Option(None, help="Actuals json file."),
+    months_ahead: int = 18,
+    engine: ForecastEngine = ForecastEngine.scalar,
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="File to write to. Written to stdout without one."),
+    output_format: Optional[OutputFormat] = typer.Option(None, "--format", help="Output format. By default, from the output suffix."),
+    profile: bool = typer.Option(False, "--profile", help="Report where forecasting time goes, to stderr."),
+    memory: bool = typer.Option(False, "--memory", help="Report the memory retained by caches after forecasting, to stderr."),
+    cache_dir: Optional[Path] = typer.Option(
+        None, envvar="PYCASTING_CACHE_DIR", help="Directory of a persistent cache of scenarios and forecasts, reused by later runs."
+    ),
+):
+    """Forecast a scenario, writing the results as csv, json or parquet."""
+    if output_format is None:
+        suffix = output.suffix.lstrip(".").lower() if output is not None else ""
+        output_format = OutputFormat(suffix) if suffix in OutputFormat.__members__ else OutputFormat.csv
+    if output is None and output_format is OutputFormat.parquet:
+        raise typer.BadParameter("parquet can't be written to stdout", param_hint="--output")
+    if output_format is OutputFormat.parquet and not any(importlib.util.find_spec(engine) for engine in ("pyarrow", "fastparquet")):
+        # Checked before forecasting, rather than failing after it. Not imported, as it's slow to.
+        raise typer.BadParameter("writing parquet needs pyarrow: pip install 'pycasting[parquet]'", param_hint="--format")
+
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    scenario, actuals = load_scenario(scenario, cache), load_actuals(actuals)
+    if profile:
+        with profiling.profile() as profiler:
+            df = forecast(scenario, actuals, months_ahead, engine=engine, cache=cache)
+        typer.echo(profiler.format_report(), err=True)
+    else:
+        df = forecast(scenario, actuals, months_ahead, engine=engine, cache=cache)
+    if memory:
+        typer.echo(current_session().memory_report().format(), err=True)
+
+    destination = output if output is not None else sys.stdout
+    if output_format is OutputFormat.csv:
+        df.to_csv(destination, index=False)
+    elif output_format is OutputFormat.json:
+        df.to_json(destination, orient="records", date_format="iso")
+    else:
+        df.to_parquet(destination, index=False)
+
+
+@cli.command("actuals")
+def build_actuals(
+    ledger: List[Path] = typer.Option([], help="Ledger export csv (date, amount). Can be given more than once."),
+    customers: List[Path] = typer.Option([], help="Customer list csv (customer_type, start_date, end_date). Can be given more than once."),
+    as_of: Optional[datetime] = typer.Option(None, formats=["%Y-%m-%d"], help="End of a month. By default, the last one that's over."),
+    previous: Optional[Path] = typer.Option(
+        None, help="Actuals json file to update, with only what happened after them. Files are read from where it left off."
+    ),
+    opening_balance: float = typer.Option(0.0, help="Cash on hand before the first transaction, without previous actuals."),
+    chunksize: int = typer.Option(DEFAULT_CHUNKSIZE, help="Rows read at a time."),
+    output: Optional[Path] = typer.Option(None, "--output", "-o", help="Actuals json file to write. Written to stdout without one."),
+):
+    """Build actuals from ledger exports and customer lists, streaming them in chunks."""
+    try:
+        result = ingest_actuals(
+            ledger,
+            customers,
+            as_of=as_of.date() if as_of is not None else last_month_end(),
+            previous=IngestedActuals.parse_file(previous) if previous is not None else None,
+            opening_balance=opening_balance,
+            chunksize=chunksize,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+    if output is None:
+        typer.echo(result.json())
+    else:
+        output.write_text(result.json())
+
+
 @cli.command()
-def main(scenario: Path, months_ahead: int = 18):
-    # TODO read actuals
-    actuals = Actuals(cash_on_hand=210_000, active_customers=frozendict({"Small - Seat Based": 1}))
+def validate(
+    paths: List[str] = typer.Argument(..., help="Scenario files, directories of them, or globs."),
+    workers: Optional[int] = typer.Option(None, help="Processes to validate with. By default, one per CPU."),
+    cache_dir: Optional[Path] = typer.Option(
+        None, envvar="PYCASTING_CACHE_DIR", help="Directory of a persistent cache, to skip files already validated."
+    ),
+    quiet: bool = typer.Option(False, "--quiet", "-q", help="Only report invalid files."),
+):
+    """Validate scenario files, reporting each error with its json path. Exits with 1 if any are invalid."""
+    files = scenario_paths(paths)
+    if not files:
+        raise typer.BadParameter("no scenario files found", param_hint="PATHS")
+
+    cache = ResultCache(cache_dir) if cache_dir is not None else None
+    invalid = 0
+    for report in validate_files(files, workers, cache):
+        if report.valid:
+            if not quiet:
+                typer.echo(f"{report.path}: ok")
+        else:
+            invalid += 1
+            for path, message in report.errors:
+                typer.echo(f"{report.path}: {path}: {message}")
+
+    typer.echo(f"{len(files)} files, {invalid} invalid", err=True)
+    if invalid:
+        raise typer.Exit(1)
+
+
+@functools.lru_cache(maxsize=None)
+def _dashboard_caches() -> Tuple[Callable, Callable, Callable]:
+    """
+    (scenario, actuals, forecast) functions for the dashboard, cached by streamlit. Caches are shared by every session of the server,
+    and keyed by the hashes of the files' contents (plus the horizon), so reruns and other analysts on the same files reuse them.
+    """
+    import streamlit as st
+
+    if hasattr(st, "cache_resource"):
+        cache_resource, cache_data = st.cache_resource(max_entries=32), st.cache_data(max_entries=128)
+    else:
+        # streamlit < 1.18, whose singletons can't be bounded
+        cache_resource, cache_data = st.experimental_singleton, st.experimental_memo(max_entries=128)
+
+    # Parsed models are immutable, so sessions can share the same objects rather than copies
+    @cache_resource
+    def cached_scenario(digest: str, _content: bytes) -> Tuple[Scenario, dict]:
+        data = json.loads(_content)
+        return Scenario(**data), data
+
+    @cache_resource
+    def cached_actuals(digest: str, _content: bytes) -> Actuals:
+        return Actuals(**json.loads(_content))
+
+    @cache_data
+    def cached_forecast(scenario_digest: str, actuals_digest: str, months_ahead: int, _scenario: Scenario, _actuals: Actuals):
+        # In its own session, so the long-running server doesn't keep memoized values of every forecast (streamlit keeps the frame)
+        with ForecastSession():
+            return forecast(_scenario, _actuals, months_ahead)
 
-    # Read Scenario
-    with open(scenario, "r") as f:
-        data = json.load(f)
+    return cached_scenario, cached_actuals, cached_forecast
 
-    scenario_obj = Scenario(**data)
+
+def headline_metrics(df: pd.DataFrame) -> Tuple[float, float, int]:
+    """(MRR, CAC, new customers) in the last month of a forecast. CAC is nan without new customers."""
+    last = df.iloc[-1]
+    new = int(last["new_customers"])
+    return last["revenue"], last["cac_expenses"] / new if new else math.nan, new
+
+
+@cli.command("dashboard")
+def main(scenario: Path, actuals: Optional[Path] = typer.Option(None, help="Actuals json file."), months_ahead: int = 18):
+    """Forecast a scenario, and show it in a dashboard. Run with `streamlit run`."""
+    import altair as alt
+    import streamlit as st
+    from numerize.numerize import numerize
+
+    cached_scenario, cached_actuals, cached_forecast = _dashboard_caches()
+
+    scenario_content = scenario.read_bytes()
+    scenario_digest = content_hash(scenario_content)
+    scenario_obj, data = cached_scenario(scenario_digest, scenario_content)
+
+    if actuals is None:
+        actuals_obj = load_actuals(None)
+        # Dated, as the placeholder is accurate as of today
+        actuals_digest = f"placeholder-{actuals_obj.accurate_as_of}"
+    else:
+        actuals_content = actuals.read_bytes()
+        actuals_digest = content_hash(actuals_content)
+        actuals_obj = cached_actuals(actuals_digest, actuals_content)
 
     # Run forecast
-    df = forecast(scenario_obj, actuals, months_ahead)
+    df = cached_forecast(scenario_digest, actuals_digest, months_ahead, scenario_obj, actuals_obj)
 
     # Build dashboard layout via streamlit
     st.set_page_config(layout="wide")
@@ -59,16 +245,11 @@ def main(scenario: Path, months_ahead: int = 18):
     # Display it all
 
     col1, col2, col3 = st.columns(3)
-    months_18 = actuals.first_unknown_month_year.shift_month(18)
-    mrr_18_months = monthly_revenue(scenario_obj, actuals, months_18, None)
-
-    new_customers_18_months = new_customers(scenario_obj, months_18, None)
-
-    cac_18_months = monthly_expenses(scenario_obj, actuals, months_18)[1] / new_customers_18_months
+    mrr, cac, new = headline_metrics(df)
 
-    col1.metric("MRR @ 18 months", f"${numerize(mrr_18_months.nominal_value)}")
-    col2.metric("CaC @ 18 months", f"${numerize(cac_18_months.nominal_value)}")
-    col3.metric("Monthly new customers @ 18 months", f"{numerize(new_customers_18_months)}")
+    col1.metric(f"MRR @ {len(df)} months", f"${numerize(mrr)}")
+    col2.metric(f"CaC @ {len(df)} months", f"${numerize(cac)}" if not math.isnan(cac) else "-")
+    col3.metric(f"Monthly new customers @ {len(df)} months", f"{numerize(new)}")
 
     col1, col2 = st.columns(2)
     col1.altair_chart(revenue, use_container_width=True)
@@ -104,4 +285,6 @@ def main(scenario: Path, months_ahead: int = 18):
 
 
 if __name__ == "__main__":
-    cli(standalone_mode=False)
+    # Not standalone, so streamlit can run the dashboard. Exit codes (e.g. of `validate`) are returned instead.
+    if exit_code := cli(standalone_mode=False):
+        sys.exit(exit_code)
@@ -1,12 +1,13 @@
+import json
+import weakref
 from datetime import date
-from functools import total_ordering
-from typing import Any, Iterator
+from typing import Any, Callable, ClassVar, Dict, Iterator, Optional, Tuple
 
 import pydantic.json
 from dateutil.relativedelta import relativedelta
-from pydantic import Field, BaseModel as PydanticBaseModel, BaseConfig as PydanticBaseConfig
+from pydantic import BaseModel as PydanticBaseModel, BaseConfig as PydanticBaseConfig
 from uncertainties import ufloat_fromstr
-from uncertainties.core import Variable
+from uncertainties.core import AffineScalarFunc, LinearCombination, Variable
 
 
 # noinspection PyUnresolvedReferences
@@ -77,10 +78,81 @@ class UFloat(Variable):
         return super().__ge__(other)
 
 
+def exact(value: float) -> UFloat:
+    """
+    A value without uncertainty. Unlike `UFloat(value, 0)`, this isn't a new (independent) variable, so results calculated from it
+    don't carry a derivative for it.
+    """
+    return AffineScalarFunc(value, LinearCombination({}))
+
+
 class BaseModel(PydanticBaseModel):
+    """
+    Frozen (and so hashable) model. The hash is computed once and kept, since models are used as cache keys over and over and hashing
+    walks the whole tree of sub-models.
+    """
+
+    __slots__ = ("_hash", "__weakref__")
+
     class Config(PydanticBaseConfig):
         frozen = True
 
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            object.__setattr__(self, "_hash", hash((self.__class__,) + tuple(self.__dict__.values())))
+            return self._hash
+
+    def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
+        if other.__class__ is self.__class__ and hash(other) != hash(self):
+            return False
+        return super().__eq__(other)
+
+
+class InternTable:
+    """
+    Maps frozen models to a single shared instance per distinct value, so equal models (and their equal sub-models) are the same object
+    and compare by identity. Entries go away with the last reference to the instance.
+    """
+
+    def __init__(self):
+        self._instances: "weakref.WeakValueDictionary[Tuple, BaseModel]" = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._instances)
+
+    def intern(self, value: Any) -> Any:
+        """The shared instance equal to `value`, with sub-models (including those in tuples) interned too. Other values pass through."""
+        if isinstance(value, tuple):
+            interned = tuple(self.intern(v) for v in value)
+            return value if all(a is b for a, b in zip(interned, value)) else interned
+        if not isinstance(value, BaseModel):
+            return value
+
+        fields = {k: self.intern(v) for k, v in value.__dict__.items()}
+        key = (value.__class__,) + tuple(fields.items())
+
+        instance = self._instances.get(key)
+        if instance is None:
+            if any(fields[k] is not v for k, v in value.__dict__.items()):
+                value = value.__class__.construct(_fields_set=value.__fields_set__, **fields)
+            instance = self._instances.setdefault(key, value)
+        return instance
+
+    def clear(self):
+        self._instances.clear()
+
+
+_intern_table = InternTable()
+
+
+def intern_model(model: Any, table: Optional[InternTable] = None) -> Any:
+    """Intern a model (and its sub-models) in the given, or default, `InternTable`."""
+    return (_intern_table if table is None else table).intern(model)
+
 
 def end_of_month(d: date) -> date:
     return d + relativedelta(day=1, months=1, days=-1)
@@ -90,36 +162,100 @@ def is_end_of_month(d: date) -> bool:
     return (d + relativedelta(days=1)).day == 1
 
 
-@total_ordering
-class MonthYear(BaseModel):
-    """Handles month-level data, and addition/subtraction"""
+class MonthYear:
+    """
+    Handles month-level data, and addition/subtraction.
+
+    Stored as an ordinal (months since the start of year 0), so arithmetic, comparison and hashing are integer operations. Instances are
+    immutable and interned: there is only ever one `MonthYear` per month, so they can be shared freely.
+    """
+
+    __slots__ = ("ordinal", "_start_of_month", "_end_of_month")
+
+    _interned: ClassVar[Dict[int, "MonthYear"]] = dict()
+
+    def __new__(cls, month: int, year: int):
+        month, year = int(month), int(year)
+        if not 1 <= month <= 12:
+            raise ValueError(f"month must be between 1 and 12, not {month}")
+        return cls.from_ordinal(year * 12 + month - 1)
+
+    @classmethod
+    def from_ordinal(cls, ordinal: int) -> "MonthYear":
+        month_year = cls._interned.get(ordinal)
+        if month_year is None:
+            month_year = object.__new__(cls)
+            object.__setattr__(month_year, "ordinal", ordinal)
+            object.__setattr__(month_year, "_start_of_month", None)
+            object.__setattr__(month_year, "_end_of_month", None)
+            month_year = cls._interned.setdefault(ordinal, month_year)
+        return month_year
+
+    def __setattr__(self, key, value):
+        raise TypeError(f'"{self.__class__.__name__}" is immutable and does not support item assignment')
+
+    def __reduce__(self):
+        return self.__class__, (self.month, self.year)
+
+    def __copy__(self):
+        return self
 
-    month: int = Field(..., ge=1, le=12)
-    year: int
+    def __deepcopy__(self, memo):
+        return self
+
+    @property
+    def month(self) -> int:
+        return self.ordinal % 12 + 1
+
+    @property
+    def year(self) -> int:
+        return self.ordinal // 12
 
     def __repr__(self):
         return f"{self.month:2d}/{self.year:4d}"
 
+    def __hash__(self):
+        return hash(self.ordinal)
+
     def __eq__(self, other: Any) -> bool:
         assert isinstance(other, MonthYear)
-        return self.year == other.year and self.month == other.month
+        return self.ordinal == other.ordinal
 
     def __lt__(self, other):
         assert isinstance(other, MonthYear)
-        return self.start_of_month < other.start_of_month
+        return self.ordinal < other.ordinal
+
+    def __le__(self, other):
+        assert isinstance(other, MonthYear)
+        return self.ordinal <= other.ordinal
+
+    def __gt__(self, other):
+        assert isinstance(other, MonthYear)
+        return self.ordinal > other.ordinal
+
+    def __ge__(self, other):
+        assert isinstance(other, MonthYear)
+        return self.ordinal >= other.ordinal
 
     @property
     def start_of_month(self) -> date:
-        return date(self.year, self.month, 1)
+        if self._start_of_month is None:
+            object.__setattr__(self, "_start_of_month", date(self.year, self.month, 1))
+        return self._start_of_month
 
     @property
     def end_of_month(self) -> date:
-        return end_of_month(self.start_of_month)
+        if self._end_of_month is None:
+            object.__setattr__(self, "_end_of_month", end_of_month(self.start_of_month))
+        return self._end_of_month
 
     def shift_month(self, shift_amount: int) -> "MonthYear":
         """Shifts months by shift_amount, wrapping around years, returning a new `MonthYear` object."""
-        new_start_of_month = self.start_of_month + relativedelta(months=shift_amount)
-        return MonthYear(month=new_start_of_month.month, year=new_start_of_month.year)
+        return self.from_ordinal(self.ordinal + shift_amount)
+
+    def months_since(self, other: "MonthYear") -> int:
+        """Number of months from `other` to this month (negative if `other` is later)."""
+        return self.ordinal - other.ordinal
 
     @classmethod
     def from_date(cls, dt: date):
@@ -127,13 +263,58 @@ class MonthYear(BaseModel):
 
     @classmethod
     def between(cls, start: "MonthYear", end: "MonthYear", inclusive: bool = True) -> Iterator["MonthYear"]:
-        if inclusive is False:
-            end = end.shift_month(-1)
+        stop = end.ordinal + 1 if inclusive else end.ordinal
+        for ordinal in range(start.ordinal, stop):
+            yield cls.from_ordinal(ordinal)
+
+    # Behave like the pydantic model this used to be, when used as a field or serialized
+
+    def dict(self, *, include=None, exclude=None, **kwargs) -> Dict[str, int]:
+        """As a model's `.dict()`: `include` and `exclude` pick fields, and other arguments (e.g. `by_alias`) don't apply."""
+        fields = {"month": self.month, "year": self.year}
+        return {k: v for k, v in fields.items() if (include is None or k in include) and (exclude is None or k not in exclude)}
+
+    def json(
+        self,
+        *,
+        include=None,
+        exclude=None,
+        by_alias: bool = False,
+        skip_defaults: Optional[bool] = None,
+        exclude_unset: bool = False,
+        exclude_defaults: bool = False,
+        exclude_none: bool = False,
+        encoder: Optional[Callable[[Any], Any]] = None,
+        models_as_dict: bool = True,
+        **dumps_kwargs,
+    ) -> str:
+        """As a model's `.json()`. Only `include`, `exclude` and `json.dumps` arguments apply, as the rest don't to a month."""
+        return json.dumps(self.dict(include=include, exclude=exclude), **dumps_kwargs)
+
+    def copy(self, **kwargs) -> "MonthYear":
+        return self
 
-        month_year = start
-        while month_year <= end:
-            yield month_year
-            month_year = month_year.shift_month(1)
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, v):
+        if isinstance(v, MonthYear):
+            return v
+        elif isinstance(v, dict):
+            return cls(month=v["month"], year=v["year"])
+        else:
+            raise ValueError("must be a MonthYear or a dict with month and year")
+
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema.update(
+            type="object",
+            properties={"month": {"type": "integer", "minimum": 1, "maximum": 12}, "year": {"type": "integer"}},
+            required=["month", "year"],
+        )
 
 
 pydantic.json.ENCODERS_BY_TYPE[Variable] = lambda v: str(v)
+pydantic.json.ENCODERS_BY_TYPE[MonthYear] = MonthYear.dict
@@ -8,7 +8,7 @@ from typing import Dict
 
 from clearcut import get_logger
 from frozendict import frozendict
-from pydantic import validator
+from pydantic import Field, validator
 
 from pycasting.misc import BaseModel, is_end_of_month, end_of_month, MonthYear
 
@@ -16,7 +16,7 @@ logger = get_logger(__name__)
 
 
 class Actuals(BaseModel):
-    accurate_as_of: date = datetime.now().date()
+    accurate_as_of: date = Field(default_factory=date.today)
     active_customers: Dict[str, int] = frozendict()
     cash_on_hand: float
 
@@ -42,3 +42,22 @@ class Actuals(BaseModel):
             return end_of_month(v)
         else:
             return v
+
+
+class FileCheckpoint(BaseModel):
+    """How much of a csv file has been ingested (see `ingestion`): every row in its first `offset` bytes, and nothing after it."""
+
+    offset: int
+    lines: int
+    # sha256 of the first `offset` bytes, to tell when the file's been rewritten rather than appended to
+    digest: str
+
+
+class IngestedActuals(Actuals):
+    """`Actuals` built from csv files, with checkpoints (by resolved path) to resume reading them from when next updated."""
+
+    checkpoints: Dict[str, FileCheckpoint] = frozendict()
+
+    @validator("checkpoints")
+    def freeze_checkpoints(cls, v):
+        return frozendict(v) if isinstance(v, dict) else v
@@ -0,0 +1,121 @@
+"""
+A compact form of validated models, made of builtins only, which rebuilds them without running validators (see `loading.load_scenario`):
+
+    compact = dump_model(Scenario(**data))  # validates once
+    scenario = rebuild_model(compact)  # later, much faster
+
+Uncertain values keep their derivatives against the model's independent variables, so correlations between fields survive a round trip.
+"""
+import importlib
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from frozendict import frozendict
+from pydantic import BaseModel as PydanticBaseModel
+from uncertainties import ufloat
+from uncertainties.core import AffineScalarFunc, LinearCombination, Variable
+
+from pycasting.calc.predictors import PredictorCategory
+from pycasting.pydanticmodels.predictions import predictor_model
+
+# Tags of the compact forms of non-builtin values
+_MODEL, _UNCERTAIN, _TUPLE, _LIST, _DICT, _FROZENDICT = range(6)
+
+
+# The kind of each type of value dumped so far
+_unknown = object()
+_kinds: Dict[type, Optional[int]] = {str: None, int: None, float: None, bool: None, type(None): None}
+
+
+def _kind(cls: type) -> Optional[int]:
+    """The tag of the compact form of values of a type, or `None` if they're kept as they are."""
+    for base, kind in (
+        (PydanticBaseModel, _MODEL),
+        (AffineScalarFunc, _UNCERTAIN),
+        (tuple, _TUPLE),
+        (list, _LIST),
+        (frozendict, _FROZENDICT),
+        (dict, _DICT),
+    ):
+        if issubclass(cls, base):
+            return kind
+    return None
+
+
+def _class_key(cls: Type[PydanticBaseModel]) -> Tuple:
+    module = importlib.import_module(cls.__module__)
+    if getattr(module, cls.__qualname__, None) is cls:
+        return cls.__module__, cls.__qualname__
+    # Predictor models are built on demand, so can't be imported
+    category, _, name = cls.__name__.partition("__Predictor__")
+    if predictor_model(PredictorCategory[category], name) is cls:
+        return (category, name)
+    raise TypeError(f"Can't dump a {cls.__name__}, which can't be found again to rebuild it")
+
+
+def _model_class(key: Tuple) -> Type[PydanticBaseModel]:
+    if len(key) == 2 and key[0] in PredictorCategory.__members__:
+        return predictor_model(PredictorCategory[key[0]], key[1])
+    return getattr(importlib.import_module(key[0]), key[1])
+
+
+def dump_model(model: PydanticBaseModel) -> Tuple:
+    """The compact form of a model: (independent variables as (nominal value, std dev) pairs, the model's fields)."""
+    variables: Dict[int, Tuple[int, Variable]] = dict()
+    class_keys: Dict[type, Tuple] = dict()
+
+    def variable_id(variable: Variable) -> int:
+        return variables.setdefault(id(variable), (len(variables), variable))[0]
+
+    def dump(value: Any) -> Any:
+        # By type, as `isinstance` checks against models are slow
+        cls = value.__class__
+        kind = _kinds.get(cls, _unknown)
+        if kind is _unknown:
+            kind = _kinds.setdefault(cls, _kind(cls))
+
+        if kind is None:
+            # Builtins, dates, enums etc.
+            return value
+        if kind == _MODEL:
+            key = class_keys.get(cls) or class_keys.setdefault(cls, _class_key(cls))
+            fields = tuple((name, dump(field)) for name, field in value.__dict__.items())
+            return _MODEL, key, tuple(sorted(value.__fields_set__)), fields
+        if kind == _UNCERTAIN:
+            if cls is Variable or issubclass(cls, Variable):
+                return _UNCERTAIN, value.nominal_value, ((variable_id(value), None),)
+            return _UNCERTAIN, value.nominal_value, tuple((variable_id(v), d) for v, d in value.derivatives.items())
+        if kind == _TUPLE or kind == _LIST:
+            return kind, tuple(dump(v) for v in value)
+        return kind, tuple((dump(k), dump(v)) for k, v in value.items())
+
+    fields = dump(model)
+    return tuple((v.nominal_value, v.std_dev) for _, v in sorted(variables.values(), key=lambda item: item[0])), fields
+
+
+def rebuild_model(compact: Tuple) -> Any:
+    """Rebuild a model from its `dump_model` form, without validating it (again)."""
+    dumped_variables, fields = compact
+    variables: List[Variable] = [ufloat(nominal, std_dev) for nominal, std_dev in dumped_variables]
+    classes: Dict[Tuple, Type[PydanticBaseModel]] = dict()
+
+    def rebuild(value: Any) -> Any:
+        if not isinstance(value, tuple):
+            return value
+        tag = value[0]
+        if tag == _MODEL:
+            _, key, fields_set, model_fields = value
+            cls = classes.get(key) or classes.setdefault(key, _model_class(key))
+            return cls.construct(_fields_set=set(fields_set), **{name: rebuild(field) for name, field in model_fields})
+        if tag == _UNCERTAIN:
+            _, nominal, derivatives = value
+            if len(derivatives) == 1 and derivatives[0][1] is None:
+                return variables[derivatives[0][0]]
+            return AffineScalarFunc(nominal, LinearCombination({variables[i]: d for i, d in derivatives}))
+        if tag == _TUPLE:
+            return tuple(rebuild(v) for v in value[1])
+        if tag == _LIST:
+            return [rebuild(v) for v in value[1]]
+        items = {rebuild(k): rebuild(v) for k, v in value[1]}
+        return frozendict(items) if tag == _FROZENDICT else items
+
+    return rebuild(fields)
@@ -1,11 +1,14 @@
 """
 Pydantic data objects used for prediction
 """
+import functools
 import inspect
 from datetime import timedelta
-from typing import Dict, Union, Tuple, Optional
+from typing import ClassVar, Dict, Union, Tuple, Optional, Type
 
-from pydantic import Field, validator, create_model, root_validator
+from frozendict import frozendict
+from pydantic import BaseModel as PydanticBaseModel, Field, validator, create_model, root_validator
+from uncertainties import ufloat_fromstr
 
 from pycasting.calc.predictors import get_predictor_names, PredictorCategory, get_predictor
 from pycasting.misc import UFloat, BaseModel
@@ -16,19 +19,67 @@ Details of customers (potential, etc.)
 
 
 class LeadStage(BaseModel):
-    """Step of the opportunity to customer process."""
+    """
+    Step of the opportunity to customer process.
+
+    `duration` can be uncertain: either give a spread (std dev, of a normal distribution) with `duration_spread`, or as part of the
+    duration (`"30+/-10"`, in days), or give the weight of each number of days it can take with `duration_histogram`. `duration` then
+    defaults to the mean of the histogram.
+    """
 
     name: str
     duration: timedelta
+    duration_spread: Optional[timedelta] = None
+    duration_histogram: Optional[Dict[int, float]] = None
     conversion_rate: float = Field(..., ge=0, le=1)
 
-    @validator("duration", pre=True)
+    class Config:
+        @staticmethod
+        def schema_extra(schema, model):
+            # `duration` can be given with its spread (a string), or left to the histogram
+            duration = schema["properties"]["duration"]
+            duration["anyOf"] = [{"type": duration.pop("type"), "format": duration.pop("format")}, {"type": "string"}]
+            schema["required"].remove("duration")
+
+    @root_validator(pre=True)
+    def duration_distribution(cls, values):
+        duration = values.get("duration")
+        if isinstance(duration, str) and ("+/-" in duration or "±" in duration):
+            duration = ufloat_fromstr(duration)
+            values["duration"] = duration.nominal_value
+            values.setdefault("duration_spread", duration.std_dev)
+        elif duration is None and values.get("duration_histogram"):
+            histogram = {int(days): weight for days, weight in values["duration_histogram"].items()}
+            values["duration"] = sum(days * weight for days, weight in histogram.items()) / sum(histogram.values())
+
+        return values
+
+    @validator("duration", "duration_spread", pre=True)
     def duration_as_days(cls, v):
-        if not isinstance(v, timedelta):
-            return timedelta(days=v)
+        if v is not None and not isinstance(v, timedelta):
+            return timedelta(days=float(v))
         else:
             return v
 
+    @validator("duration_spread")
+    def spread_not_negative(cls, v):
+        if v is not None and v < timedelta(0):
+            raise ValueError("Duration spread can't be negative")
+        return v
+
+    @validator("duration_histogram")
+    def freeze_histogram(cls, v):
+        if v is None:
+            return v
+        if any(days < 0 or weight < 0 for days, weight in v.items()) or sum(v.values()) <= 0:
+            raise ValueError("Histogram days and weights must be positive, and some weight must be given")
+        return frozendict(v)
+
+    @property
+    def is_distributed(self) -> bool:
+        """Whether the duration is uncertain."""
+        return bool(self.duration_spread) or self.duration_histogram is not None
+
 
 class LeadConfig(BaseModel):
     stages: Tuple[LeadStage, ...]
@@ -36,31 +87,70 @@ class LeadConfig(BaseModel):
     qualified_lead_to_click_ratio: float
 
 
-# dynamically build the possible usage models options
+# Models of the possible predictor params are built dynamically, from the signatures of the registered predictors. Only when first
+# needed though, so importing this doesn't pay for every predictor.
+
+
+@functools.lru_cache(maxsize=None)
+def predictor_model(category: PredictorCategory, name: str) -> Type[PydanticBaseModel]:
+    """The model of a registered predictor's params (and `name`)."""
+    predictor_fn = get_predictor(category, name)
+    parameters = inspect.signature(predictor_fn).parameters
+    param_mapping = {
+        p.name: (p.annotation, ...)
+        for p in parameters.values()
+        if (p.kind is inspect.Parameter.KEYWORD_ONLY or p.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD)
+        and (p.name not in ("state", "effective_date", "start"))
+    }
+    return create_model(
+        f"{category.name}__Predictor__{name}",
+        __config__=BaseModel.Config,
+        name=(str, Field(name, const=True)),
+        **param_mapping,
+    )
+
+
+def predictor_models(category: PredictorCategory) -> Tuple[Type[PydanticBaseModel], ...]:
+    """Models of every registered predictor of a category."""
+    return tuple(predictor_model(category, name) for name in get_predictor_names(category))
+
+
+class Predictor:
+    """Field type of the params of one of the registered predictors of `category`, picked by `name`."""
+
+    category: ClassVar[PredictorCategory]
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, v):
+        names = get_predictor_names(cls.category)
+        name = v.get("name") if isinstance(v, dict) else getattr(v, "name", None)
+        if name not in names:
+            raise ValueError(f"name must be one of the {cls.category.value} predictors: {', '.join(names)}")
+
+        model = predictor_model(cls.category, name)
+        if isinstance(v, model):
+            return v
+        elif isinstance(v, PydanticBaseModel):
+            v = dict(v)
+        elif not isinstance(v, dict):
+            raise ValueError("must be a predictor model or a dict")
+        return model(**v)
+
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema["anyOf"] = [model.schema() for model in predictor_models(cls.category)]
+
 
-predictor_pydantic_models: Dict[PredictorCategory, Tuple] = dict()
+class UsagePredictor(Predictor):
+    category = PredictorCategory.usage
 
-for predictor_category in PredictorCategory:
-    predictors = list()
 
-    for predictor_name in get_predictor_names(predictor_category):
-        predictor_fn = get_predictor(predictor_category, predictor_name)
-        parameters = inspect.signature(predictor_fn).parameters
-        param_mapping = {
-            p.name: (p.annotation, ...)
-            for p in parameters.values()
-            if (p.kind is inspect.Parameter.KEYWORD_ONLY or p.kind is inspect.Parameter.POSITIONAL_OR_KEYWORD)
-            and (p.name not in ("state", "effective_date", "start"))
-        }
-        predictors.append(
-            create_model(
-                f"{predictor_category.name}__Predictor__{predictor_name}",
-                __config__=BaseModel.Config,
-                name=(str, Field(predictor_name, const=True)),
-                **param_mapping,
-            )
-        )
-    predictor_pydantic_models[predictor_category] = tuple(predictors)
+class HeadcountPredictor(Predictor):
+    category = PredictorCategory.headcount
 
 
 class CustomerType(BaseModel):
@@ -68,7 +158,7 @@ class CustomerType(BaseModel):
     monthly_fee: UFloat
     setup_fee: UFloat
     usage_fee: float
-    usage_predictor: Union[predictor_pydantic_models[PredictorCategory.usage]]
+    usage_predictor: UsagePredictor
     fraction_of_leads: float = Field(..., le=1, ge=0)
     cogs: "COGS"
     lead_config: LeadConfig
@@ -92,7 +182,7 @@ class Role(BaseModel):
 
     name: str
     salary: float
-    hire_predictor: Union[predictor_pydantic_models[PredictorCategory.headcount]]
+    hire_predictor: HeadcountPredictor
     customer_acquisition: bool = False
 
     @property
@@ -0,0 +1,255 @@
+"""
+Uncertainty backends. By default quantities with uncertainty are `uncertainties` values, each of which keeps a dict of derivatives
+against every variable it depends on. The dense backend indexes the independent variables of a scenario once, and represents quantities
+as `AffineArray`s: nominal values plus a fixed size gradient vector, so arithmetic is NumPy vector ops with bounded cost and memory.
+"""
+from typing import Any, Callable, Dict, List, Sequence, Tuple, TypeVar, Union
+
+import numpy as np
+from uncertainties.core import AffineScalarFunc, Variable
+
+from pycasting.misc import BaseModel
+
+M = TypeVar("M")
+
+
+class VariableIndex:
+    """Assigns a jacobian column to each independent (uncertain) variable, in the order they are first seen."""
+
+    def __init__(self):
+        self.variables: List[Variable] = list()
+        self._columns: Dict[Variable, int] = dict()
+
+    def __len__(self):
+        return len(self.variables)
+
+    @property
+    def sigmas(self) -> np.ndarray:
+        return np.array([v.std_dev for v in self.variables], dtype=float)
+
+    def column(self, variable: Variable) -> int:
+        col = self._columns.get(variable)
+        if col is None:
+            col = self._columns[variable] = len(self.variables)
+            self.variables.append(variable)
+        return col
+
+    def add(self, value: Any):
+        """Index the variables a `UFloat` depends on. Anything else is ignored."""
+        if isinstance(value, AffineScalarFunc):
+            for variable in value.derivatives:
+                # Exact variables can never contribute to the std dev, so don't spend a column on them
+                if variable.std_dev:
+                    self.column(variable)
+
+    def lift(self, values: Union[float, AffineScalarFunc, Sequence]) -> "AffineArray":
+        """Convert a float/`UFloat`, or a (nested, rectangular) sequence of them, into an `AffineArray`."""
+        items = np.array(values, dtype=object)
+        flat = items.ravel()
+
+        nominal = np.empty(flat.shape, dtype=float)
+        rows, cols, derivs = list(), list(), list()
+        for i, v in enumerate(flat):
+            if isinstance(v, AffineScalarFunc):
+                nominal[i] = v.nominal_value
+                for variable, derivative in v.derivatives.items():
+                    if variable.std_dev:
+                        rows.append(i)
+                        cols.append(self.column(variable))
+                        derivs.append(derivative)
+            else:
+                nominal[i] = v
+
+        jacobian = np.zeros(flat.shape + (len(self),))
+        jacobian[rows, cols] = derivs
+
+        return AffineArray(nominal.reshape(items.shape), jacobian.reshape(items.shape + (len(self),)), self)
+
+
+class AffineArray:
+    """
+    An array of values that depend linearly on the variables of a `VariableIndex`. `jacobian` has the shape of `nominal` plus one
+    trailing axis for the variables. Its trailing axis may be shorter than the index if the index has grown since.
+
+    A 0-d `AffineArray` stands in for a `UFloat`: it has `nominal_value`/`std_dev` (`n`/`s`) and mixes with `uncertainties` values,
+    which are lifted into its index.
+    """
+
+    __slots__ = ("nominal", "jacobian", "index")
+
+    # Make numpy defer to our reflected operators rather than broadcasting over us as an object
+    __array_ufunc__ = None
+
+    def __init__(self, nominal: np.ndarray, jacobian: np.ndarray, index: VariableIndex):
+        self.nominal = nominal
+        self.jacobian = jacobian
+        self.index = index
+
+    def __repr__(self):
+        return f"AffineArray({self.nominal_value}+/-{self.std_dev})"
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.nominal.shape
+
+    @property
+    def nominal_value(self) -> Union[float, np.ndarray]:
+        return float(self.nominal) if self.nominal.ndim == 0 else self.nominal
+
+    @property
+    def std_dev(self) -> Union[float, np.ndarray]:
+        sigmas = self.index.sigmas[: self.jacobian.shape[-1]]
+        std_dev = np.sqrt(((self.jacobian * sigmas) ** 2).sum(axis=-1))
+        return float(std_dev) if std_dev.ndim == 0 else std_dev
+
+    n = nominal_value
+    s = std_dev
+
+    def reindexed(self, index: VariableIndex) -> "AffineArray":
+        """Same values, with the jacobian re-expressed against another index."""
+        cols = [index.column(v) for v in self.index.variables[: self.jacobian.shape[-1]]]
+        jacobian = np.zeros(self.shape + (len(index),))
+        jacobian[..., cols] = self.jacobian
+        return AffineArray(self.nominal, jacobian, index)
+
+    def __getitem__(self, item) -> "AffineArray":
+        return AffineArray(self.nominal[item], self.jacobian[item], self.index)
+
+    def sum(self, axis: int = 0) -> "AffineArray":
+        axis = axis % self.nominal.ndim
+        return AffineArray(self.nominal.sum(axis=axis), self.jacobian.sum(axis=axis), self.index)
+
+    def cumsum(self, axis: int = 0) -> "AffineArray":
+        axis = axis % self.nominal.ndim
+        return AffineArray(self.nominal.cumsum(axis=axis), self.jacobian.cumsum(axis=axis), self.index)
+
+    def _broadcast(self, shape: Tuple[int, ...], width: int) -> np.ndarray:
+        jacobian = self.jacobian
+        if jacobian.shape[-1] < width:
+            jacobian = np.concatenate([jacobian, np.zeros(jacobian.shape[:-1] + (width - jacobian.shape[-1],))], axis=-1)
+        return np.broadcast_to(jacobian, shape + (width,))
+
+    def _coerce(self, other):
+        if isinstance(other, AffineScalarFunc):
+            # Exact values (see `misc.exact`) are just numbers
+            return self.index.lift(other) if other.derivatives else other.nominal_value
+        return other
+
+    def _combine(self, other, nominal: np.ndarray, self_scale, other_scale) -> "AffineArray":
+        """Build the result of a binary operation from its nominal value and partial derivatives wrt each operand."""
+        shape = np.shape(nominal)
+        if shape == self.shape == () and (not isinstance(other, AffineArray) or other.jacobian.shape == self.jacobian.shape):
+            # Scalars, as in the scalar forecasting engine: no broadcasting needed
+            jacobian = self.jacobian * self_scale
+            if isinstance(other, AffineArray):
+                jacobian = jacobian + other.jacobian * other_scale
+            return AffineArray(nominal, jacobian, self.index)
+
+        if isinstance(other, AffineArray):
+            width = max(self.jacobian.shape[-1], other.jacobian.shape[-1])
+            jacobian = self._broadcast(shape, width) * np.expand_dims(self_scale, -1)
+            jacobian = jacobian + other._broadcast(shape, width) * np.expand_dims(other_scale, -1)
+        else:
+            jacobian = self._broadcast(shape, self.jacobian.shape[-1]) * np.expand_dims(self_scale, -1)
+        return AffineArray(nominal, jacobian, self.index)
+
+    @staticmethod
+    def _nominal(other):
+        return other.nominal if isinstance(other, AffineArray) else np.asarray(other, dtype=float)
+
+    def __neg__(self) -> "AffineArray":
+        return AffineArray(-self.nominal, -self.jacobian, self.index)
+
+    def __add__(self, other) -> "AffineArray":
+        other = self._coerce(other)
+        return self._combine(other, self.nominal + self._nominal(other), 1.0, 1.0)
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> "AffineArray":
+        other = self._coerce(other)
+        return self._combine(other, self.nominal - self._nominal(other), 1.0, -1.0)
+
+    def __rsub__(self, other) -> "AffineArray":
+        return -(self - other)
+
+    def __mul__(self, other) -> "AffineArray":
+        other = self._coerce(other)
+        other_nominal = self._nominal(other)
+        return self._combine(other, self.nominal * other_nominal, other_nominal, self.nominal)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other) -> "AffineArray":
+        other = self._coerce(other)
+        other_nominal = self._nominal(other)
+        nominal = self.nominal / other_nominal
+        return self._combine(other, nominal, 1 / other_nominal, -nominal / other_nominal)
+
+    def __rtruediv__(self, other) -> "AffineArray":
+        other = self._coerce(other)
+        if isinstance(other, AffineArray):
+            return other / self
+        nominal = self._nominal(other) / self.nominal
+        jacobian = self._broadcast(nominal.shape, self.jacobian.shape[-1]) * np.expand_dims(-nominal / self.nominal, -1)
+        return AffineArray(nominal, jacobian, self.index)
+
+
+def nominal_value(x: Any) -> float:
+    """Nominal value of a quantity of any backend (or of a plain number)."""
+    return getattr(x, "nominal_value", x)
+
+
+def std_dev(x: Any) -> float:
+    """Standard deviation of a quantity of any backend (0 for a plain number)."""
+    return getattr(x, "std_dev", 0.0)
+
+
+def map_values(value: Any, fn: Callable[[Any], Any]) -> Any:
+    """Apply `fn` to every leaf value of a (frozen) model, recursing into sub-models and tuples, and rebuild it without re-validating."""
+    if isinstance(value, tuple):
+        return tuple(map_values(v, fn) for v in value)
+    if isinstance(value, BaseModel):
+        return value.__class__.construct(_fields_set=value.__fields_set__, **{k: map_values(v, fn) for k, v in value.__dict__.items()})
+    return fn(value)
+
+
+class UncertaintyBackend:
+    """How quantities with uncertainty are represented while forecasting."""
+
+    def prepare(self, model: M) -> M:
+        """Convert the uncertain inputs of a model (e.g. a `Scenario`) into this backend's representation."""
+        return model
+
+
+class LinearPropagation(UncertaintyBackend):
+    """`uncertainties` values. Each keeps its derivatives against the variables it depends on, in a dict."""
+
+
+class DenseGradient(UncertaintyBackend):
+    """
+    `AffineArray`s against a `VariableIndex` of every independent variable of the model. Every quantity carries a gradient vector of
+    the same (fixed) size, however many operations it comes from.
+    """
+
+    def prepare(self, model: M) -> M:
+        index = VariableIndex()
+        # Index everything first, so every value is lifted with the full width
+        map_values(model, index.add)
+        return map_values(model, lambda v: index.lift(v) if isinstance(v, AffineScalarFunc) else v)
+
+
+uncertainty_backends: Dict[str, UncertaintyBackend] = {
+    "linear": LinearPropagation(),
+    "dense": DenseGradient(),
+}
+
+
+def get_uncertainty_backend(backend: Union[UncertaintyBackend, str]) -> UncertaintyBackend:
+    if isinstance(backend, UncertaintyBackend):
+        return backend
+
+    found = uncertainty_backends.get(backend)
+    if found is None:
+        raise ValueError(f"No matching uncertainty backend: {backend}")
+    return found
@@ -0,0 +1,329 @@
+"""
+Validating scenario files in bulk (see `pycasting validate`). Each file is first checked against the json schema of `Scenario` (as
+exported by `scripts/generate_json_schema.py`), which is much cheaper than validating it, so clearly broken files are rejected quickly.
+Files passing that are then validated in full. Errors are reported with the json path of the offending value, e.g.
+`$.customer_types[0].churn`.
+
+The schema check only supports what the schema uses, and is lenient wherever pydantic converts values (e.g. numbers given as
+strings), so it never rejects a file pydantic would accept. Patterns and formats are left to pydantic. It's custom rather than
+jsonschema's `Draft7Validator`, which (made as lenient) is about ten times slower, and slower than validating in full with pydantic,
+so it would be no quicker check (see `scripts/benchmark_schema_check.py`).
+"""
+import functools
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from pydantic import ValidationError
+
+from pycasting.calc.persistent import ResultCache
+from pycasting.loading import scenario_cache_key
+from pycasting.pydanticmodels.compact import dump_model
+from pycasting.pydanticmodels.predictions import Scenario
+
+# (json path, message)
+Error = Tuple[str, str]
+
+
+def json_path(loc: Iterable[Union[str, int]]) -> str:
+    """The json path of a location, as in pydantic errors (e.g. `("customer_types", 0, "churn")`)."""
+    return "$" + "".join(f"[{part}]" if isinstance(part, int) else f".{part}" for part in loc if part != "__root__")
+
+
+def _is_number(value: Any) -> bool:
+    if isinstance(value, (int, float)):
+        return True
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+
+# What pydantic accepts (from json) for each type, converting where needed. Strings which aren't numbers are still accepted for
+# numbers, as some fields (e.g. durations) parse their own formats.
+_accepted_types = {
+    "object": dict,
+    "array": list,
+    "string": (str, int, float),
+    "number": (int, float, str),
+    "integer": (int, float, str),
+    "boolean": (bool, int, str),
+}
+
+# Checks a value at a location, adding (location, message) for each error
+_Check = Callable[[Any, Tuple, List[Tuple[Tuple, str]]], None]
+
+
+class SchemaValidator:
+    """
+    A minimal json schema validator, for the subset of json schema pydantic generates. The schema is compiled into nested checks once,
+    so checking a value doesn't interpret the schema again.
+    """
+
+    def __init__(self, schema: Dict[str, Any]):
+        self.schema = schema
+        self._compiled: Dict[int, _Check] = dict()
+        self._check = self._compile(schema)
+
+    def errors(self, instance: Any) -> List[Error]:
+        """Every error in `instance`, with its json path. Empty if it passes."""
+        errors: List[Tuple[Tuple, str]] = list()
+        self._check(instance, (), errors)
+        return [(json_path(loc), message) for loc, message in errors]
+
+    def _resolve(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        while "$ref" in schema:
+            # Only local refs, like `#/definitions/CustomerType`
+            target = self.schema
+            for part in schema["$ref"].lstrip("#/").split("/"):
+                target = target[part]
+            schema = target
+        return schema
+
+    def _compile(self, schema: Dict[str, Any]) -> _Check:
+        schema = self._resolve(schema)
+        compiled = self._compiled.get(id(schema))
+        if compiled is None:
+            # Compiled on first use, so recursive schemas work
+            self._compiled[id(schema)] = lambda value, loc, errors: compiled(value, loc, errors)
+            compiled = self._compiled[id(schema)] = self._compile_checks(schema)
+        return compiled
+
+    def _constants(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        schema = self._resolve(schema)
+        properties = {name: self._resolve(property_schema) for name, property_schema in schema.get("properties", {}).items()}
+        return {name: property_schema["const"] for name, property_schema in properties.items() if "const" in property_schema}
+
+    def _compile_checks(self, schema: Dict[str, Any]) -> _Check:
+        checks: List[_Check] = [self._compile(sub_schema) for sub_schema in schema.get("allOf", ())]
+
+        if "anyOf" in schema:
+            options = [(self._constants(sub_schema), self._compile(sub_schema)) for sub_schema in schema["anyOf"]]
+            all_options = [option for _, option in options]
+            constant_options = [(tuple(constants.items()), option) for constants, option in options if constants]
+
+            def check_any_of(value, loc, errors):
+                if value is None:
+                    return
+                # Options picked by their constants (e.g. a predictor's `name`) first, as they're the likeliest match
+                picked = []
+                if constant_options and isinstance(value, dict):
+                    picked = [option for constants, option in constant_options if all(value.get(k) == v for k, v in constants)]
+                option_errors = list()
+                for option in picked + all_options:
+                    option_errors.append(list())
+                    option(value, loc, option_errors[-1])
+                    if not option_errors[-1]:
+                        return
+                # Report why the closest option didn't match, preferring those picked
+                errors.append((loc, f"matches none of the {len(options)} options"))
+                errors.extend(min(option_errors[: len(picked)] or option_errors, key=len))
+
+            checks.append(check_any_of)
+
+        if "const" in schema:
+            const = schema["const"]
+
+            def check_const(value, loc, errors):
+                if value is not None and value != const:
+                    errors.append((loc, f"must be {const!r}"))
+
+            checks.append(check_const)
+
+        if "enum" in schema:
+            enum = schema["enum"]
+
+            def check_enum(value, loc, errors):
+                if value is not None and value not in enum:
+                    errors.append((loc, f"must be one of {', '.join(map(repr, enum))}"))
+
+            checks.append(check_enum)
+
+        expected = schema.get("type")
+        if expected in _accepted_types:
+            checks.append(self._compile_type(schema, expected))
+
+        # None is left to pydantic (by every check), which knows which fields are optional
+        if len(checks) == 1:
+            return checks[0]
+
+        def check_all(value, loc, errors):
+            for c in checks:
+                c(value, loc, errors)
+
+        return check_all
+
+    def _compile_type(self, schema: Dict[str, Any], expected: str) -> _Check:
+        accepted = _accepted_types[expected]
+        message = f"must be a{'n' if expected[0] in 'aeiou' else ''} {expected}"
+
+        if expected == "object":
+            required = tuple(schema.get("required", ()))
+            properties = {name: self._compile(property_schema) for name, property_schema in schema.get("properties", {}).items()}
+            additional = schema.get("additionalProperties")
+            additional = self._compile(additional) if isinstance(additional, dict) else None
+
+            def check_object(value, loc, errors):
+                if value is None:
+                    return
+                if not isinstance(value, dict):
+                    errors.append((loc, message))
+                    return
+                for name in required:
+                    if name not in value:
+                        errors.append((loc + (name,), "field required"))
+                for name, item in value.items():
+                    check = properties.get(name, additional)
+                    if check is not None and item is not None:
+                        check(item, loc + (name,), errors)
+
+            return check_object
+
+        if expected == "array":
+            items = self._compile(schema["items"]) if "items" in schema else None
+
+            def check_array(value, loc, errors):
+                if value is None:
+                    return
+                if not isinstance(value, list):
+                    errors.append((loc, message))
+                elif items is not None:
+                    for i, item in enumerate(value):
+                        items(item, loc + (i,), errors)
+
+            return check_array
+
+        bounds = [
+            (schema[keyword], compare, f"must be {description} {schema[keyword]}")
+            for keyword, compare, description in (
+                ("minimum", float.__lt__, "at least"),
+                ("maximum", float.__gt__, "at most"),
+                ("exclusiveMinimum", float.__le__, "more than"),
+                ("exclusiveMaximum", float.__ge__, "less than"),
+            )
+            if keyword in schema and expected in ("number", "integer")
+        ]
+
+        def check_value(value, loc, errors):
+            if value is None:
+                return
+            if not isinstance(value, accepted):
+                errors.append((loc, message))
+            elif bounds and not isinstance(value, bool) and _is_number(value):
+                number = float(value)
+                for bound, compare, bound_message in bounds:
+                    if compare(number, float(bound)):
+                        errors.append((loc, bound_message))
+
+        return check_value
+
+
+@functools.lru_cache(maxsize=None)
+def scenario_validator() -> SchemaValidator:
+    return SchemaValidator(Scenario.schema())
+
+
+@dataclass(frozen=True)
+class FileReport:
+    path: Path
+    errors: Tuple[Error, ...] = ()
+    # Whether the schema check rejected the file, so it wasn't validated in full
+    rejected_by_schema: bool = False
+    # The compact form of the validated scenario (see `pydanticmodels.compact`), for caching
+    compact: Optional[Tuple] = None
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+
+def validate_file(path: Path, content: Optional[bytes] = None, keep_compact: bool = False) -> FileReport:
+    """
+    Validate a scenario file: check it against the schema, then, if it passes, in full. With `keep_compact`, the report keeps the
+    scenario's compact form.
+    """
+    try:
+        data = json.loads(content if content is not None else path.read_bytes())
+    except (OSError, ValueError) as e:
+        return FileReport(path, (("$", str(e)),), rejected_by_schema=True)
+
+    errors = scenario_validator().errors(data)
+    if errors:
+        return FileReport(path, tuple(errors), rejected_by_schema=True)
+
+    try:
+        scenario = Scenario(**data)
+    except ValidationError as e:
+        return FileReport(path, tuple((json_path(error["loc"]), error["msg"]) for error in e.errors()))
+    return FileReport(path, compact=dump_model(scenario) if keep_compact else None)
+
+
+def _validate_file(path_and_content: Tuple[Path, bytes], keep_compact: bool) -> FileReport:
+    return validate_file(*path_and_content, keep_compact=keep_compact)
+
+
+def scenario_paths(patterns: Iterable[Union[str, Path]]) -> List[Path]:
+    """Scenario files from paths of files, directories (every `.json` file under them) or globs (e.g. `scenarios/**/*.json`)."""
+    paths = dict()
+    for pattern in map(str, patterns):
+        if Path(pattern).is_dir():
+            matches = sorted(Path(pattern).rglob("*.json"))
+        elif glob.has_magic(pattern):
+            matches = [Path(match) for match in sorted(glob.glob(pattern, recursive=True))]
+        else:
+            matches = [Path(pattern)]
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+def validate_files(
+    paths: Sequence[Path], max_workers: Optional[int] = None, cache: Optional[ResultCache] = None
+) -> Iterator[FileReport]:
+    """
+    Validate scenario files across (up to `max_workers`) processes, reporting on each in order. With a `cache` (as used by
+    `loading.load_scenario`), files already validated are skipped, and those validated are added to it.
+    """
+    # Each path's content to validate, or its report if there's nothing to validate
+    entries: List[Union[bytes, FileReport]] = list()
+    for path in paths:
+        try:
+            entries.append(path.read_bytes())
+        except OSError as e:
+            entries.append(FileReport(path, (("$", str(e)),), rejected_by_schema=True))
+    if cache is not None:
+        keys = {i: scenario_cache_key(entry) for i, entry in enumerate(entries) if isinstance(entry, bytes)}
+        validated = cache.present(keys.values())
+        entries = [FileReport(path) if keys.get(i) in validated else entry for i, (path, entry) in enumerate(zip(paths, entries))]
+
+    pending = [(path, entry) for path, entry in zip(paths, entries) if isinstance(entry, bytes)]
+    validate = functools.partial(_validate_file, keep_compact=cache is not None)
+    workers = max_workers or os.cpu_count() or 1
+    with ExitStack() as stack:
+        if workers == 1 or len(pending) <= 1:
+            reports = map(validate, pending)
+        else:
+            executor = stack.enter_context(ProcessPoolExecutor(workers))
+            # Chunks amortize the round trips to workers, which matters with thousands of small files
+            reports = executor.map(validate, pending, chunksize=max(1, min(64, len(pending) // (4 * workers))))
+
+        # Added to the cache in batches, as each write is a transaction
+        to_cache: List[Tuple[str, Tuple]] = list()
+        for entry in entries:
+            if isinstance(entry, FileReport):
+                yield entry
+                continue
+            report = next(reports)
+            if cache is not None and report.valid:
+                to_cache.append((scenario_cache_key(entry), report.compact))
+                if len(to_cache) >= 256:
+                    cache.put_many(to_cache)
+                    to_cache = list()
+            yield report
+        if to_cache:
+            cache.put_many(to_cache)
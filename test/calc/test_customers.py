@@ -1,6 +1,8 @@
+from collections import Counter
+
 from clearcut import get_logger
 
-from pycasting.calc.customers import total_customers
+from pycasting.calc.customers import total_customers, CohortSimulator
 from pycasting.pydanticmodels.predictions import Scenario
 from pycasting.misc import MonthYear
 
@@ -22,3 +24,22 @@ def test_customer_timeline(salesperson_role, simple_customer_type, actuals, rent
         logger.info(f"{shift} months in future:")
         total = total_customers(scenario, actuals, MonthYear.from_date(actuals.accurate_as_of).shift_month(shift), simple_customer_type)
         logger.info(f"Total customers: {total}")
+
+
+def test_cohort_simulator_matches_resimulation():
+    churn = 0.3
+    first = MonthYear(month=1, year=2025)
+    new = [5, 0, 12, 7, 1, 30, 2, 0, 9]
+    simulator = CohortSimulator(first, churn, lambda month: new[month])
+
+    # Simulate from scratch for each month, as a reference
+    for months in range(1, len(new) + 1):
+        customers = Counter()
+        for month in range(months):
+            customers.update({month: new[month]})
+            customers.subtract({k: round(v * churn) for k, v in customers.items()})
+
+        assert list(simulator.snapshot(first.shift_month(months - 1))) == [customers[k] for k in range(months)]
+
+    assert simulator.snapshot(first.shift_month(-1)).size == 0
+    assert simulator.snapshots(3).shape == (3, 3)
@@ -0,0 +1,117 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from pycasting.calc.forecasting import forecast, iter_forecast, ForecastFrameBuilder
+from pycasting.calc.incremental import IncrementalForecaster
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario, Role
+
+EXAMPLE_SCENARIO = Path(__file__).parents[2] / "examples" / "example_scenario.json"
+
+
+@pytest.fixture
+def example_scenario() -> Scenario:
+    with open(EXAMPLE_SCENARIO) as f:
+        return Scenario(**json.load(f))
+
+
+@pytest.fixture
+def example_actuals() -> Actuals:
+    return Actuals(accurate_as_of=date(2022, 8, 31), active_customers={"Small - Seat Based": 1}, cash_on_hand=210_000)
+
+
+def assert_engines_match(scenario, actuals, months_ahead):
+    scalar = forecast(scenario, actuals, months_ahead)
+    for engine in ("vectorized", "graph"):
+        df = forecast(scenario, actuals, months_ahead, engine=engine)
+
+        assert list(df.columns) == list(scalar.columns)
+        pd.testing.assert_frame_equal(df, scalar, check_exact=False, rtol=1e-9, atol=1e-6)
+
+
+def test_vectorized_matches_scalar(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role,),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+    assert_engines_match(scenario, actuals, 24)
+
+
+def test_vectorized_matches_scalar_example(example_scenario, example_actuals):
+    assert_engines_match(example_scenario, example_actuals, 36)
+
+
+def test_vectorized_matches_scalar_state_dependent(example_scenario, example_actuals):
+    support = Role(name="Support", salary=50000, hire_predictor={"name": "scale_with_customers", "customers_per_person": 5})
+    scenario = example_scenario.copy(update={"headcount": example_scenario.headcount + (support,)})
+    assert_engines_match(scenario, example_actuals, 24)
+
+
+@pytest.mark.parametrize("engine", ["scalar", "vectorized", "graph", "montecarlo", "incremental"])
+def test_no_months_ahead(engine, example_scenario, example_actuals):
+    def engine_forecast(months_ahead):
+        if engine == "incremental":
+            return IncrementalForecaster(example_actuals, months_ahead).forecast(example_scenario)
+        return forecast(example_scenario, example_actuals, months_ahead, engine=engine, samples=100, seed=0)
+
+    # The same columns and dtypes as with months to forecast
+    pd.testing.assert_frame_equal(engine_forecast(0), engine_forecast(1).iloc[:0])
+
+
+def test_montecarlo(example_scenario, example_actuals):
+    first_order = forecast(example_scenario, example_actuals, 24, engine="vectorized")
+    df = forecast(example_scenario, example_actuals, 24, engine="montecarlo", samples=2000, seed=42)
+
+    # Same columns, plus percentiles after each std dev
+    assert [c for c in df.columns if "_p" not in c] == list(first_order.columns)
+    assert list(df.columns[df.columns.get_loc("revenue_stddev") :][:4]) == ["revenue_stddev", "revenue_p5", "revenue_p50", "revenue_p95"]
+    assert "revenue_p95__Large - Enterprise" in df.columns
+    pd.testing.assert_frame_equal(df[first_order.columns], first_order)
+
+    for name in ("revenue", "expenses", "cashflow", "cash_on_hand"):
+        assert (df[f"{name}_p5"] <= df[f"{name}_p50"]).all() and (df[f"{name}_p50"] <= df[f"{name}_p95"]).all()
+    assert (df["revenue_p5__Small - Seat Based"] <= df["revenue_p95__Small - Seat Based"]).all()
+
+    # The model is (nearly) linear in its uncertain inputs, so the median is close to nominal and the 5-95% band is about +-1.645 std devs
+    last = df.iloc[-1]
+    assert last["cash_on_hand_p50"] == pytest.approx(last["cash_on_hand"], rel=0.05)
+    assert last["cash_on_hand_p95"] - last["cash_on_hand_p5"] == pytest.approx(2 * 1.645 * last["cash_on_hand_stddev"], rel=0.1)
+
+    # Reproducible
+    again = forecast(example_scenario, example_actuals, 24, engine="montecarlo", samples=2000, seed=42)
+    pd.testing.assert_frame_equal(df, again)
+
+
+def test_dense_uncertainty_matches_linear(example_scenario, example_actuals):
+    linear = forecast(example_scenario, example_actuals, 24)
+    dense = forecast(example_scenario, example_actuals, 24, uncertainty="dense")
+
+    pd.testing.assert_frame_equal(dense, linear, check_exact=False, rtol=1e-9, atol=1e-6)
+
+
+def test_iter_forecast(example_scenario, example_actuals):
+    df = forecast(example_scenario, example_actuals, 24)
+
+    # Stopping early, once cash runs low
+    months = list()
+    for month in iter_forecast(example_scenario, example_actuals, 24):
+        months.append(month)
+        if month.cash_on_hand.nominal_value < df["cash_on_hand"].iloc[5]:
+            break
+    assert 0 < len(months) < 24
+    assert [m.cash_on_hand.nominal_value for m in months] == list(df["cash_on_hand"].iloc[: len(months)])
+
+    # Growing past the months allocated for
+    builder = ForecastFrameBuilder([ct.name for ct in example_scenario.customer_types], months=5)
+    for month in iter_forecast(example_scenario, example_actuals, 24, engine="graph"):
+        builder.append(month)
+    pd.testing.assert_frame_equal(builder.frame(), df, check_exact=False, rtol=1e-9, atol=1e-6)
+
+    with pytest.raises(ValueError):
+        next(iter_forecast(example_scenario, example_actuals, 24, engine="vectorized"))
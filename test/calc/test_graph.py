@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pycasting.calc.cashflow import monthly_revenue, monthly_expenses
+from pycasting.calc.customers import total_customers
+from pycasting.calc.graph import ForecastGraph, Node
+from pycasting.misc import MonthYear
+from pycasting.pydanticmodels.predictions import Scenario
+
+
+def test_graph(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role,),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+    month_year = MonthYear.from_date(actuals.accurate_as_of).shift_month(30)
+
+    graph = ForecastGraph(scenario, actuals)
+    graph.add(Node("revenue", month_year, simple_customer_type))
+
+    # Every node comes after its dependencies
+    levels = graph.levels()
+    assert sum(len(level) for level in levels) == len(graph)
+    level_of = {node: i for i, level in enumerate(levels) for node in level}
+    assert all(level_of[dependency] < level_of[node] for node, dependencies in graph.dependencies.items() for dependency in dependencies)
+
+    # Deep graphs are fine, as nothing recurses
+    deep = ForecastGraph(scenario, actuals)
+    (customers,) = deep.evaluate(Node("total_customers", month_year.shift_month(1200), simple_customer_type))
+    assert customers == total_customers(scenario, actuals, month_year.shift_month(1200), simple_customer_type)
+
+    with ThreadPoolExecutor(2) as executor:
+        values = graph.evaluate(Node("revenue", month_year, simple_customer_type), Node("expenses", month_year), executor=executor)
+    expected = monthly_revenue(scenario, actuals, month_year, simple_customer_type), *monthly_expenses(scenario, actuals, month_year)
+    for value, expected_value in zip((values[0], *values[1]), expected):
+        assert value.nominal_value == pytest.approx(expected_value.nominal_value)
+        assert value.std_dev == pytest.approx(expected_value.std_dev)
@@ -3,10 +3,15 @@ Tests headcount calculators
 """
 from datetime import timedelta
 
+import pytest
 from dateutil.relativedelta import relativedelta
 
-from pycasting.calc.headcount import hires_through_effective_date, hires_in_month
+from pycasting.calc.headcount import hires_through_effective_date, hires_in_month, HeadcountPlan
+from pycasting.calc.plans import MonthlyPlan
+from pycasting.calc.predictors import PredictedCompanyState
 from pycasting.misc import MonthYear, end_of_month
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Role
 
 
 def test_linear_sales_hires(salesperson_hire_predictor, salesperson_role):
@@ -45,3 +50,35 @@ def test_linear_sales_hires(salesperson_hire_predictor, salesperson_role):
         month_year = month_year.shift_month(1)
 
     assert total_hires == max_hires
+
+
+def test_headcount_plan(salesperson_hire_predictor, salesperson_role):
+    support = Role(name="Support", salary=50000, hire_predictor={"name": "scale_with_customers", "customers_per_person": 5})
+    first_hire = MonthYear.from_date(salesperson_hire_predictor.first_hire_date)
+    plan = HeadcountPlan((salesperson_role, support), first_hire, months=3)
+
+    # Asking outside the planned months grows it, both ways
+    for shift in (8, -4, 0, 20, 1):
+        month_year = first_hire.shift_month(shift)
+        assert plan.hires_through(salesperson_role, month_year) == hires_through_effective_date(month_year.end_of_month, salesperson_role)
+        assert plan.hires_in_month(salesperson_role, month_year) == hires_in_month(month_year, salesperson_role)
+
+    # Ramp-weighted: hires count fully after `ramp_up_months`
+    ramp_up_months = salesperson_role.ramp_up_months
+    month_year = first_hire.shift_month(12 + ramp_up_months)
+    assert plan.total_sales_quota(month_year) == salesperson_role.monthly_quota * salesperson_hire_predictor.max_hires
+
+    # State dependent roles are predicted when asked for
+    state = PredictedCompanyState(number_of_customers=12, actuals=Actuals(cash_on_hand=0))
+    assert plan.hires_through(support, first_hire, state) == 3
+    with pytest.raises(RuntimeError):
+        plan.hires_in_month(support, first_hire)
+
+
+def test_monthly_plan_needs_build():
+    class Unbuilt(MonthlyPlan):
+        pass
+
+    # Fails when created, not when first planned
+    with pytest.raises(TypeError, match="_build"):
+        Unbuilt()
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from pycasting.calc.incremental import IncrementalForecaster
+from pycasting.calc.vectorized import vectorized_forecast
+from pycasting.pydanticmodels.predictions import Scenario, Role
+
+
+def test_incremental_forecast(simple_customer_type, salesperson_role, actuals, rent):
+    support = Role(name="Support", salary=50000, hire_predictor={"name": "scale_with_customers", "customers_per_person": 5})
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role, support),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+    forecaster = IncrementalForecaster(actuals, 24)
+
+    def assert_forecast(scenario, recomputed):
+        df = forecaster.forecast(scenario)
+        assert forecaster.recomputed == recomputed
+        pd.testing.assert_frame_equal(df, vectorized_forecast(scenario, actuals, 24))
+
+    assert_forecast(scenario, ["customer type general", "sales roles", "role Salesperson", "role Support"])
+    assert_forecast(scenario, [])
+
+    # Only what an edit affects is recomputed
+    cheaper_rent = rent.copy(update={"annual": rent.annual / 2, "monthly": rent.monthly / 2})
+    assert_forecast(scenario.copy(update={"misc_expenses": (cheaper_rent,)}), [])
+
+    pricier = simple_customer_type.copy(update={"monthly_fee": simple_customer_type.monthly_fee + 10})
+    assert_forecast(scenario.copy(update={"customer_types": (pricier,)}), ["customer type general"])
+
+    # Customers depend on sales, and support depends on customers
+    slower_ramp = salesperson_role.copy(update={"ramp_up_months": salesperson_role.ramp_up_months + 1})
+    assert_forecast(
+        scenario.copy(update={"headcount": (slower_ramp, support)}),
+        ["customer type general", "sales roles", "role Salesperson", "role Support"],
+    )
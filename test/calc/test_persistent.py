@@ -0,0 +1,95 @@
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+from uncertainties import ufloat
+
+import pycasting
+
+from pycasting.calc.forecasting import forecast
+from pycasting.calc.incremental import IncrementalForecaster
+from pycasting.calc.persistent import ResultCache, code_version, fingerprint, source_hash
+from pycasting.loading import load_scenario
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario
+
+EXAMPLE_SCENARIO = Path(__file__).parents[2] / "examples" / "example_scenario.json"
+
+
+def test_fingerprint(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,), headcount=(salesperson_role,), misc_expenses=(rent,), misc_bizdev_expenses=()
+    )
+    same = Scenario(**scenario.__dict__)
+    assert fingerprint(scenario, actuals, 12) == fingerprint(same, actuals, 12)
+    assert fingerprint(scenario, actuals, 12) != fingerprint(scenario, actuals, 13)
+
+    # Differences hidden by rounding to the uncertainty still count
+    edited = simple_customer_type.copy(update={"setup_fee": simple_customer_type.setup_fee + 0.001})
+    assert fingerprint(scenario, actuals) != fingerprint(scenario.copy(update={"customer_types": (edited,)}), actuals)
+    assert fingerprint(scenario, actuals) != fingerprint(scenario, actuals.copy(update={"cash_on_hand": actuals.cash_on_hand + 1}))
+
+
+def test_forecast_cache(tmp_path, simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,), headcount=(salesperson_role,), misc_expenses=(rent,), misc_bizdev_expenses=()
+    )
+    expected = forecast(scenario, actuals, 12)
+
+    cache = ResultCache(tmp_path)
+    pd.testing.assert_frame_equal(forecast(scenario, actuals, 12, cache=cache), expected)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 1, 1)
+
+    # Another process (or a restart) reads it back
+    reopened = ResultCache(tmp_path)
+    pd.testing.assert_frame_equal(forecast(scenario, actuals, 12, cache=reopened), expected)
+    assert reopened.hits == 1
+
+    forecast(scenario, actuals, 12, engine="vectorized", cache=reopened)
+    assert len(reopened) == 2
+
+
+def test_eviction(tmp_path):
+    cache = ResultCache(tmp_path, max_bytes=3000)
+    for i in range(5):
+        cache.put(str(i), bytes(1000))
+    assert cache.nbytes <= 3000
+    assert cache.get("0") is None and cache.get("4") is not None
+    assert cache.evictions >= 2
+
+
+def test_incremental_counts_cache(tmp_path):
+    example_scenario = load_scenario(EXAMPLE_SCENARIO)
+    actuals = Actuals(accurate_as_of=date(2022, 8, 31), active_customers={"Small - Seat Based": 1}, cash_on_hand=210_000)
+    expected = forecast(example_scenario, actuals, 24, engine="vectorized")
+
+    IncrementalForecaster(actuals, 24, cache=ResultCache(tmp_path)).forecast(example_scenario)
+    restarted = IncrementalForecaster(actuals, 24, cache=ResultCache(tmp_path))
+    df = restarted.forecast(example_scenario)
+
+    pd.testing.assert_frame_equal(df, expected)
+    assert restarted.cache.hits == len(example_scenario.customer_types)
+    assert "sales roles" not in restarted.recomputed
+
+
+def test_fingerprint_correlations():
+    a, b = ufloat(1, 0.5), ufloat(1, 0.5)
+    assert fingerprint((a, a)) != fingerprint((a, b))
+    assert fingerprint((a, b)) == fingerprint((b, a)) == fingerprint((ufloat(1, 0.5), ufloat(1, 0.5)))
+    assert fingerprint(a * 2) != fingerprint(ufloat(2, 1))
+    assert fingerprint((a, a - b)) != fingerprint((a, b - a))
+
+
+def test_source_hash(tmp_path):
+    (tmp_path / "calc").mkdir()
+    (tmp_path / "calc" / "engine.py").write_text("RATE = 1\n")
+    before = source_hash(tmp_path)
+    assert source_hash(tmp_path) == before
+
+    # Any change to the code changes it, so cached results computed by the old code aren't reused
+    (tmp_path / "calc" / "engine.py").write_text("RATE = 2\n")
+    assert source_hash(tmp_path) != before
+    (tmp_path / "calc" / "engine.py").write_text("RATE = 1\n")
+    (tmp_path / "misc.py").write_text("")
+    assert source_hash(tmp_path) != before
+    assert source_hash(Path(pycasting.__file__).parent) in code_version()
@@ -1,7 +1,8 @@
 """Tests usage modelling functions"""
-from datetime import timedelta, datetime
+from datetime import timedelta, datetime, date
 
-from pycasting.calc.predictors import predict, PredictorCategory
+from pycasting.calc.predictors import predict, PredictorCategory, predictor_plan, as_datetime64, _array_predictor_registry
+from pycasting.calc.session import ForecastSession
 from pycasting.misc import UFloat
 
 
@@ -31,3 +32,33 @@ def test_linear():
     u = predict(PredictorCategory.usage, "linear", start + timedelta(days=360), params, start=start)
     assert u.n == 2400
     assert u.s > initial_usage.s * 2
+
+
+def test_array_form_matches_scalar(linear_usage_predictor, salesperson_hire_predictor):
+    usage_plan = predictor_plan(PredictorCategory.usage, linear_usage_predictor)
+    assert usage_plan.vectorized
+
+    start = date(2022, 1, 31)
+    effective_dates = [start + timedelta(days=d) for d in (-30, 0, 90, 180, 360)]
+    usages = usage_plan.predict_array(as_datetime64(effective_dates), as_datetime64(start))
+    for effective_date, u in zip(effective_dates, usages):
+        expected = usage_plan(effective_date, start)
+        assert (u.n, u.s) == (expected.n, expected.s)
+
+    hire_plan = predictor_plan(PredictorCategory.headcount, salesperson_hire_predictor)
+    effective_dates = [salesperson_hire_predictor.first_hire_date + timedelta(days=d) for d in range(-40, 800, 7)]
+    assert list(hire_plan.predict_array(as_datetime64(effective_dates))) == [hire_plan(d) for d in effective_dates]
+
+
+def test_scalar_fallback(linear_usage_predictor, monkeypatch):
+    monkeypatch.delitem(_array_predictor_registry[PredictorCategory.usage], "linear")
+
+    with ForecastSession():
+        plan = predictor_plan(PredictorCategory.usage, linear_usage_predictor)
+    assert not plan.vectorized
+
+    start = date(2022, 1, 31)
+    starts = as_datetime64([start, start + timedelta(days=30)])
+    usages = plan.predict_array(as_datetime64([start + timedelta(days=90)])[:, None], starts[None, :])
+    assert usages.shape == (1, 2)
+    assert usages[0, 1].n == plan(start + timedelta(days=90), start + timedelta(days=30)).n
@@ -0,0 +1,42 @@
+from pycasting.calc.forecasting import forecast
+from pycasting.calc.profiling import profile
+from pycasting.calc.session import ForecastSession
+from pycasting.pydanticmodels.predictions import Scenario
+
+
+def test_profile(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role,),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+
+    with ForecastSession() as session:
+        expected = forecast(scenario, actuals, 12)
+        session.clear()
+
+        with profile() as profiler:
+            df = forecast(scenario, actuals, 12)
+        assert session.profiler is None
+    assert df.equals(expected)
+
+    profiles = {p.name: p for p in profiler.report()}
+    revenue = profiles["monthly_revenue"]
+    assert revenue.calls == revenue.hits + revenue.misses
+    assert revenue.misses == session.stats()["monthly_revenue"].misses - 12
+    assert revenue.max_fan_out > 1
+    assert 0 < revenue.self_seconds <= revenue.cumulative_seconds
+
+    # Not memoized, but instrumented
+    assert profiles["monthly_expenses"].calls == 12
+    assert profiles["monthly_expenses"].hits == 0
+
+    assert profiler.format_report(top=3).count("\n") == 3
+    assert "graph:revenue" in {p.name for p in _graph_profiles(scenario, actuals)}
+
+
+def _graph_profiles(scenario, actuals):
+    with ForecastSession(), profile() as profiler:
+        forecast(scenario, actuals, 12, engine="graph")
+    return profiler.report()
@@ -1,7 +1,11 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
 from clearcut import get_logger
 
-from pycasting.calc.sales import new_transitions
-from pycasting.pydanticmodels.predictions import Scenario
+from pycasting.calc.headcount import HeadcountPlan
+from pycasting.calc.sales import new_transitions, funnel_kernel, LeadFunnel, total_sales_quota
+from pycasting.pydanticmodels.predictions import Scenario, LeadStage
 from pycasting.misc import MonthYear
 
 logger = get_logger(__name__)
@@ -28,3 +32,82 @@ def test_transitions(salesperson_role, salesperson_hire_predictor, simple_custom
             f"Initial: {new_transitions(scenario, effective_month_year.shift_month(shift), initial_lead_stage, simple_customer_type)}"
         )
         logger.info(f"Close: {new_transitions(scenario, effective_month_year.shift_month(shift), close_lead_stage, simple_customer_type)}")
+
+
+def test_funnel_kernel(initial_lead_stage, close_lead_stage):
+    # 45 days from stage 0 through both stages: 1 month and 15 days
+    kernel = funnel_kernel((initial_lead_stage, close_lead_stage))
+    assert (kernel.lag, kernel.weights, kernel.conversion_rate) == (1, (15, 15), 0.375)
+    assert list(kernel.apply(np.array([0, 30, 60, 90, 0]))) == [0, 0, round(0.375 * 15), round(0.375 * 45), round(0.375 * 75)]
+
+
+def test_lead_funnel_matches_transitions(salesperson_role, simple_customer_type, close_lead_stage, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,), headcount=(salesperson_role,), misc_bizdev_expenses=tuple(), misc_expenses=(rent,)
+    )
+    first_month_year = MonthYear(month=12, year=2024)
+
+    funnel = LeadFunnel(scenario.customer_types, HeadcountPlan(scenario.headcount), first_month_year, 24)
+    quota = [round(total_sales_quota(scenario, first_month_year.shift_month(shift))) for shift in range(24)]
+    assert list(funnel.new_transitions(simple_customer_type, 0, first_month_year, 24)) == quota
+
+    new_customers = funnel.new_transitions(simple_customer_type, 2, first_month_year, 24)
+    expected = [new_transitions(scenario, first_month_year.shift_month(shift), None, simple_customer_type) for shift in range(24)]
+    assert list(new_customers) == expected
+    assert new_customers[0] == 0 and new_customers[-1] > 0
+
+    # Far ahead, without walking every month in between
+    assert new_transitions(scenario, first_month_year.shift_month(1200), close_lead_stage, simple_customer_type) > 0
+
+
+def test_distributed_funnel_kernel(initial_lead_stage, close_lead_stage):
+    # A histogram with a single duration is the same as a fixed duration
+    certain = LeadStage(name="close", duration_histogram={35: 1}, conversion_rate=0.5)
+    assert funnel_kernel((initial_lead_stage, certain)) == funnel_kernel((initial_lead_stage, close_lead_stage))
+
+    uncertain = LeadStage(name="close", duration="35+/-20", conversion_rate=0.5)
+    assert uncertain.duration_spread.days == 20
+    kernel = funnel_kernel((initial_lead_stage, uncertain))
+    # Spread over more months, but still a month's worth of (per day) transitions
+    assert len(kernel.weights) > 2 and sum(kernel.weights) == pytest.approx(30)
+    stage_0 = np.full(12, 300)
+    assert list(kernel.apply(stage_0)[kernel.history :]) == [round(0.375 * 300)] * (12 - kernel.history)
+
+    # Long kernels are convolved with FFTs
+    slow = LeadStage(name="slow", duration="1000+/-400", conversion_rate=0.5)
+    kernel = funnel_kernel((initial_lead_stage, slow))
+    stage_0 = np.arange(200) % 7 * 100
+    direct = np.convolve(stage_0 / 30, np.array(kernel.weights))[len(kernel.weights) - 1 : len(stage_0) - kernel.lag]
+    assert list(kernel.apply(stage_0)[kernel.history :]) == list(np.rint(kernel.conversion_rate * direct).astype(int))
+
+
+def test_negative_duration_spread():
+    with pytest.raises(ValidationError, match="spread can't be negative"):
+        LeadStage(name="close", duration=30, duration_spread=-5, conversion_rate=0.5)
+    assert not LeadStage(name="close", duration=30, duration_spread=0, conversion_rate=0.5).is_distributed
+
+
+@pytest.mark.parametrize("histogram", [{35: -1, 40: 2}, {-5: 1}, {35: 0}, {}])
+def test_invalid_duration_histogram(histogram):
+    with pytest.raises(ValidationError, match="Histogram"):
+        LeadStage(name="close", duration=30, duration_histogram=histogram, conversion_rate=0.5)
+
+
+@pytest.mark.parametrize("planned", [True, False])
+def test_lead_funnel_other_customer_types(salesperson_role, simple_customer_type, initial_lead_stage, planned):
+    long_stage = LeadStage(name="close", duration="120+/-40", conversion_rate=0.5)
+    long_config = simple_customer_type.lead_config.copy(update={"stages": (initial_lead_stage, long_stage)})
+    long_type = simple_customer_type.copy(update={"name": "long", "lead_config": long_config})
+    first_month_year = MonthYear(month=12, year=2024)
+    hires = HeadcountPlan((salesperson_role,))
+
+    # Not given up front, so it needs more history than planned for
+    funnel = LeadFunnel((simple_customer_type,), hires, first_month_year if planned else None, 24)
+    expected = LeadFunnel((simple_customer_type, long_type), hires, first_month_year, 24)
+    for stage in (2, 1):
+        assert list(funnel.new_transitions(long_type, stage, first_month_year, 24)) == list(
+            expected.new_transitions(long_type, stage, first_month_year, 24)
+        )
+    assert list(funnel.new_transitions(simple_customer_type, 2, first_month_year, 24)) == list(
+        expected.new_transitions(simple_customer_type, 2, first_month_year, 24)
+    )
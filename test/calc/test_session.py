@@ -0,0 +1,121 @@
+from pycasting.calc.customers import total_customers
+from pycasting.calc.forecasting import forecast
+from pycasting.calc.memory import live_uncertainty
+import pytest
+
+from pycasting.calc.session import GROWING_MAXSIZE, ForecastSession, current_session, memoize, _growing
+from pycasting.pydanticmodels.predictions import Scenario
+from pycasting.misc import MonthYear
+
+
+def test_memo_table_eviction_and_stats():
+    calls = []
+
+    @memoize
+    def double(x):
+        calls.append(x)
+        return 2 * x
+
+    with ForecastSession(maxsize=2) as session:
+        assert current_session() is session
+        assert [double(1), double(2), double(1), double(3), double(2)] == [2, 4, 2, 6, 4]
+
+        # 2 was least recently used when 3 came in
+        assert calls == [1, 2, 3, 2]
+        assert session.stats()["double"].hits == 1
+        assert session.stats()["double"].misses == 4
+        assert session.stats()["double"].evictions == 2
+        assert session.stats()["double"].currsize == 2
+
+        session.clear()
+        assert session.stats()["double"].currsize == 0
+
+    assert current_session() is not session
+
+
+def test_forecast_in_bounded_session(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role,),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+
+    with ForecastSession() as unbounded:
+        expected = forecast(scenario, actuals, 12)
+
+    with ForecastSession(maxsize=8, maxsizes={"customer_ages": 2}) as bounded:
+        df = forecast(scenario, actuals, 12)
+        total_customers(scenario, actuals, MonthYear.from_date(actuals.accurate_as_of), None)
+
+    assert df.equals(expected)
+    assert all(stats.currsize <= 8 for stats in bounded.stats().values())
+    assert bounded.stats()["customer_ages"].currsize <= 2
+    assert bounded.stats()["total_customers"].misses > 0
+
+    # Sessions don't share memo tables
+    assert unbounded.stats()["total_customers"].currsize > bounded.stats()["total_customers"].currsize
+
+
+def test_memory_report_and_byte_cap(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role,),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+
+    with ForecastSession() as unbounded:
+        expected = forecast(scenario, actuals, 12)
+    report = unbounded.memory_report()
+    assert report.tables["customer_ages"].entries > 0
+    assert report.tables["monthly_revenue"].values.uncertainty_bytes > 0
+    assert report.total.bytes >= report.total.uncertainty_bytes > 0
+    assert "monthly_revenue" in report.format()
+
+    max_bytes = sum(table.values.bytes for name, table in report.tables.items() if name not in _growing) // 4
+    with ForecastSession(max_bytes=max_bytes) as capped:
+        df = forecast(scenario, actuals, 12)
+
+    assert df.equals(expected)
+    assert 0 < capped.nbytes <= max_bytes
+    assert sum(stats.evictions for stats in capped.stats().values()) > 0
+
+
+def test_byte_cap_long_horizon(simple_customer_type, salesperson_role, actuals, rent):
+    scenario = Scenario(
+        customer_types=(simple_customer_type,),
+        headcount=(salesperson_role,),
+        misc_expenses=(rent,),
+        misc_bizdev_expenses=tuple(),
+    )
+
+    def tracked_bytes(session: ForecastSession) -> int:
+        """What the memory report finds retained by values tracked against `max_bytes`."""
+        report = session.memory_report()
+        return sum(table.values.bytes for name, table in report.tables.items() if name not in _growing)
+
+    with ForecastSession(max_bytes=10**9) as unbounded:
+        expected = forecast(scenario, actuals, 120)
+    # Shared objects aren't counted for each entry, and values growing after they're memoized aren't tracked
+    assert {"cohort_simulator", "lead_funnel", "headcount_plan"} <= _growing
+    assert unbounded.nbytes == pytest.approx(tracked_bytes(unbounded), rel=0.1)
+
+    max_bytes = tracked_bytes(unbounded) // 4
+    with ForecastSession(max_bytes=max_bytes) as capped:
+        df = forecast(scenario, actuals, 120)
+
+    assert df.equals(expected)
+    assert capped.nbytes <= max_bytes
+    assert capped.nbytes == pytest.approx(tracked_bytes(capped), rel=0.1)
+    assert capped.stats()["cohort_simulator"].maxsize == GROWING_MAXSIZE
+
+
+def test_live_uncertainty():
+    from uncertainties import ufloat
+
+    value = ufloat(1, 0.1) * 2
+    count, retained = live_uncertainty()
+    assert count > 0
+    assert retained.uncertainty_bytes > 0
+    del value
@@ -0,0 +1,67 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from pycasting.calc.forecasting import forecast
+from pycasting.calc.sweep import sweep, apply_overrides
+from pycasting.pydanticmodels.actuals import Actuals
+from pycasting.pydanticmodels.predictions import Scenario
+
+EXAMPLE_SCENARIO = Path(__file__).parents[2] / "examples" / "example_scenario.json"
+
+
+@pytest.fixture
+def example_scenario() -> Scenario:
+    with open(EXAMPLE_SCENARIO) as f:
+        return Scenario(**json.load(f))
+
+
+@pytest.fixture
+def example_actuals() -> Actuals:
+    return Actuals(accurate_as_of=date(2022, 8, 31), active_customers={"Small - Seat Based": 1}, cash_on_hand=210_000)
+
+
+def test_apply_overrides(example_scenario):
+    scenario = apply_overrides(
+        example_scenario,
+        {
+            "customer_types.Small - Seat Based.churn": 0.2,
+            "customer_types.1.monthly_fee": "5000+/-500",
+            ("headcount", "Sales Rep", "hire_predictor", "hires_per_year"): 8,
+        },
+    )
+
+    assert scenario.customer_types[0].churn == 0.2
+    assert scenario.customer_types[1].monthly_fee.std_dev == 500
+    assert scenario.headcount[-1].hire_predictor.hires_per_year == 8
+    assert example_scenario.customer_types[0].churn != 0.2
+
+    with pytest.raises(KeyError):
+        apply_overrides(example_scenario, {"customer_types.Medium.churn": 0.2})
+
+
+def test_sweep(example_scenario, example_actuals):
+    grid = {
+        "customer_types.Small - Seat Based.churn": [0.01, 0.1],
+        "headcount.Sales Rep.hire_predictor.hires_per_year": [1, 4, 8],
+    }
+    serial = list(sweep(example_scenario, example_actuals, grid, 36, workers=1, at_months=(12, 24), chunksize=4))
+    parallel = list(sweep(example_scenario, example_actuals, grid, 36, workers=2, at_months=(12, 24), chunksize=1))
+
+    assert [s.index for s in serial] == list(range(6))
+    assert serial[1].overrides == {"customer_types.Small - Seat Based.churn": 0.01, "headcount.Sales Rep.hire_predictor.hires_per_year": 4}
+    assert [(s.index, s.runway_months, s.cash_on_hand, s.mrr) for s in parallel] == [
+        (s.index, s.runway_months, s.cash_on_hand, s.mrr) for s in serial
+    ]
+
+    df = forecast(apply_overrides(example_scenario, serial[4].overrides), example_actuals, 36, engine="vectorized")
+    assert serial[4].cash_on_hand[24] == pytest.approx(df["cash_on_hand"][24])
+    assert serial[4].min_cash_on_hand == pytest.approx(df["cash_on_hand"].min())
+    negative = df.index[df["cash_on_hand"] < 0]
+    assert serial[4].runway_months == (negative[0] if len(negative) else None)
+    assert 0 < serial[4].mrr[24] <= df["revenue"][24]
+
+    with pytest.raises(ValueError):
+        next(sweep(example_scenario, example_actuals, grid, 12, at_months=(12,)))
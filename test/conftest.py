@@ -20,7 +20,7 @@ class SalespersonHirePredictor(BaseModel):
 
 @pytest.fixture
 def actuals(simple_customer_type) -> Actuals:
-    return Actuals(accurate_as_of=date(2024, 12, 31), active_customers={simple_customer_type.name: 0})
+    return Actuals(accurate_as_of=date(2024, 12, 31), active_customers={simple_customer_type.name: 0}, cash_on_hand=100_000)
 
 
 @pytest.fixture
@@ -0,0 +1,20 @@
+import importlib.util
+from pathlib import Path
+
+BENCHMARK_SCRIPT = Path(__file__).parents[1] / "scripts" / "benchmark.py"
+
+
+def test_benchmark_runs():
+    spec = importlib.util.spec_from_file_location("benchmark", BENCHMARK_SCRIPT)
+    benchmark = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(benchmark)
+
+    results = benchmark.run(repeat=1, quick=True, only=["headcount_plan"])
+    assert results["repeat"] == 1
+    assert [result["case"] for result in results["results"]] == [case.name for case in benchmark.cases(quick=True)]
+    for result in results["results"]:
+        assert list(result["timings"]) == ["headcount_plan"]
+        assert set(result["timings"]["headcount_plan"]) == {"min_seconds", "median_seconds", "peak_bytes"}
+
+    # Compared against itself, nothing regresses
+    assert benchmark.compare(results, results, threshold=1.25) == []
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+from pathlib import Path
+
+IMPORT_TIME_SCRIPT = Path(__file__).parents[1] / "scripts" / "import_time.py"
+
+
+def test_predictor_models_are_lazy():
+    check = "from pycasting.pydanticmodels.predictions import predictor_model; print(predictor_model.cache_info().currsize)"
+    output = subprocess.run([sys.executable, "-c", check], check=True, capture_output=True, text=True).stdout
+    assert output.strip() == "0"
+
+
+def test_import_time_budget():
+    # Generous, as this runs on all sorts of machines. The script's defaults are the real budget.
+    result = subprocess.run(
+        [sys.executable, str(IMPORT_TIME_SCRIPT), "--budget", "10", "--pycasting-budget", "1"], capture_output=True, text=True
+    )
+    assert result.returncode == 0, result.stderr
+    assert '"module": "pycasting.pydanticmodels.predictions"' in result.stdout
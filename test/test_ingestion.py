@@ -0,0 +1,142 @@
+import json
+from datetime import date
+
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from pycasting.ingestion import CsvColumns, ingest_actuals, last_month_end
+from pycasting.loading import load_actuals
+from pycasting.main import cli
+
+LEDGER = """date,amount,memo
+2024-01-03,1000.50,Invoice 1
+2024-01-31,-200,Rent
+2024-02-10,300,Invoice 2
+2024-03-01,-50,Fees
+"""
+
+CUSTOMERS = """id,customer_type,start_date,end_date
+1,Small,2023-12-01,
+2,Small,2024-01-15,2024-02-20
+3,Large,2024-02-01,
+4,Large,2024-03-05,
+"""
+
+
+@pytest.fixture
+def exports(tmp_path):
+    (tmp_path / "ledger.csv").write_text(LEDGER)
+    (tmp_path / "customers.csv").write_text(CUSTOMERS)
+    return tmp_path / "ledger.csv", tmp_path / "customers.csv"
+
+
+def test_last_month_end():
+    assert last_month_end(date(2024, 3, 15)) == date(2024, 2, 29)
+    assert last_month_end(date(2024, 3, 31)) == date(2024, 3, 31)
+
+
+def test_ingest_actuals(exports):
+    ledger, customers = exports
+    january = ingest_actuals([ledger], [customers], as_of=date(2024, 1, 31), opening_balance=100, chunksize=2)
+    assert january.accurate_as_of == date(2024, 1, 31)
+    assert january.cash_on_hand == pytest.approx(900.5)
+    assert january.active_customers == {"Small": 2}
+
+    february = ingest_actuals([ledger], [customers], as_of=date(2024, 2, 29), opening_balance=100, chunksize=2)
+    assert february.cash_on_hand == pytest.approx(1200.5)
+    assert february.active_customers == {"Large": 1, "Small": 1}
+
+    # Updating only adds what happened after the previous actuals
+    assert ingest_actuals([ledger], [customers], as_of=date(2024, 2, 29), previous=january) == february
+    march = ingest_actuals([ledger], [customers], as_of=date(2024, 3, 31), previous=february, chunksize=3)
+    assert march == ingest_actuals([ledger], [customers], as_of=date(2024, 3, 31), opening_balance=100)
+    assert march.active_customers == {"Large": 2, "Small": 1}
+
+
+def test_ingest_actuals_errors(tmp_path, exports):
+    ledger, customers = exports
+    with pytest.raises(ValueError, match="end of a month"):
+        ingest_actuals([ledger], as_of=date(2024, 1, 15))
+
+    previous = ingest_actuals([ledger], as_of=date(2024, 2, 29))
+    with pytest.raises(ValueError, match="newer"):
+        ingest_actuals([ledger], previous=previous, as_of=date(2024, 1, 31))
+
+    (tmp_path / "gaps.csv").write_text("date,amount\n2024-01-01,1\n,2\n")
+    with pytest.raises(ValueError, match="missing date on line 3"):
+        ingest_actuals([tmp_path / "gaps.csv"], as_of=date(2024, 1, 31))
+    (tmp_path / "gaps.csv").write_text("date,amount\n2024-01-01,1\n2024-01-02,\n")
+    with pytest.raises(ValueError, match="missing amount on line 3"):
+        ingest_actuals([tmp_path / "gaps.csv"], as_of=date(2024, 1, 31))
+
+
+def test_ingest_actuals_columns(tmp_path):
+    (tmp_path / "ledger.csv").write_text("Posted,Value\n31/01/2024,5\n01/02/2024,7\n")
+    columns = CsvColumns(date="Posted", amount="Value", date_format="%d/%m/%Y")
+    assert ingest_actuals([tmp_path / "ledger.csv"], as_of=date(2024, 1, 31), columns=columns).cash_on_hand == 5
+
+
+@pytest.fixture
+def parsed_rows(monkeypatch):
+    """Rows parsed from csv files, other than the header."""
+    rows = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        df = read_csv(*args, **kwargs)
+        rows.append(len(df))
+        return df
+
+    monkeypatch.setattr(pd, "read_csv", counting_read_csv)
+    return rows
+
+
+def test_ingest_actuals_checkpoints(tmp_path, exports, parsed_rows):
+    ledger, customers = exports
+    january = ingest_actuals([ledger], [customers], as_of=date(2024, 1, 31), opening_balance=100, chunksize=2)
+    assert january.checkpoints[str(ledger.resolve())].lines == 3
+    # Stopped by the first customer, who's still active
+    assert january.checkpoints[str(customers.resolve())].lines == 1
+
+    # Rows are appended to the ledger
+    with open(ledger, "a") as f:
+        f.write("2024-03-10,25,Invoice 3\n2024-04-02,5,Invoice 4\n")
+    parsed_rows.clear()
+    march = ingest_actuals([ledger], [customers], as_of=date(2024, 3, 31), previous=january, chunksize=2)
+    # Only the ledger's rows after January are parsed again
+    assert sum(parsed_rows) == 4 + len(CUSTOMERS.splitlines()) - 1
+    assert march.cash_on_hand == pytest.approx(1175.5)
+    assert march.active_customers == {"Large": 2, "Small": 1}
+    assert march.checkpoints[str(ledger.resolve())].lines == 6
+
+    expected = ingest_actuals([ledger], [customers], as_of=date(2024, 3, 31), opening_balance=100)
+    assert (march.cash_on_hand, march.active_customers) == (expected.cash_on_hand, expected.active_customers)
+
+    # Rewritten files are read in full, keeping to rows after the previous actuals
+    ledger.write_text(LEDGER.replace("Invoice 1", "Invoice one"))
+    parsed_rows.clear()
+    rewritten = ingest_actuals([ledger], as_of=date(2024, 3, 31), previous=january)
+    assert sum(parsed_rows) == 4
+    assert rewritten.cash_on_hand == pytest.approx(1150.5)
+
+
+def test_actuals_command(tmp_path, exports):
+    ledger, customers = exports
+    runner = CliRunner()
+    command = ["actuals", "--ledger", str(ledger), "--customers", str(customers)]
+
+    result = runner.invoke(cli, command + ["--as-of", "2024-01-31", "-o", str(tmp_path / "actuals.json")])
+    assert result.exit_code == 0, result.output
+    assert json.loads((tmp_path / "actuals.json").read_text())["active_customers"] == {"Small": 2}
+
+    result = runner.invoke(cli, command + ["--as-of", "2024-03-31", "--previous", str(tmp_path / "actuals.json")])
+    assert result.exit_code == 0, result.output
+    expected = {"accurate_as_of": "2024-03-31", "active_customers": {"Large": 2, "Small": 1}, "cash_on_hand": 1050.5}
+    output = json.loads(result.stdout)
+    assert set(output.pop("checkpoints")) == {str(ledger.resolve()), str(customers.resolve())}
+    assert output == expected
+    # Their checkpoints don't get in the way of forecasting from them
+    assert load_actuals(tmp_path / "actuals.json").active_customers == {"Small": 2}
+
+    assert runner.invoke(cli, command + ["--as-of", "2024-03-15"]).exit_code != 0
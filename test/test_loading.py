@@ -0,0 +1,59 @@
+import json
+from datetime import date
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from pycasting.calc.persistent import ResultCache, fingerprint
+from pycasting.loading import load_actuals, load_scenario, load_scenarios
+from pycasting.pydanticmodels.compact import dump_model, rebuild_model
+
+EXAMPLE_SCENARIO = Path(__file__).parents[1] / "examples" / "example_scenario.json"
+
+
+def test_compact_round_trip():
+    scenario = load_scenario(EXAMPLE_SCENARIO)
+    rebuilt = rebuild_model(dump_model(scenario))
+
+    assert fingerprint(rebuilt) == fingerprint(scenario)
+    assert rebuilt.customer_types[0].usage_predictor.__class__ is scenario.customer_types[0].usage_predictor.__class__
+    assert rebuilt.customer_types[0].lead_config.stages == scenario.customer_types[0].lead_config.stages
+
+    # Uncertain values derived from others stay correlated with them
+    derived = scenario.customer_types[0].copy(update={"monthly_fee": scenario.customer_types[0].setup_fee * 2})
+    rebuilt_derived = rebuild_model(dump_model(derived))
+    assert rebuilt_derived.monthly_fee.std_dev == pytest.approx(2 * derived.setup_fee.std_dev)
+    assert (rebuilt_derived.monthly_fee - 2 * rebuilt_derived.setup_fee).std_dev == pytest.approx(0)
+
+
+def test_load_scenario_cache(tmp_path):
+    cache = ResultCache(tmp_path / "cache")
+    first = load_scenario(EXAMPLE_SCENARIO, cache)
+    assert cache.misses == 1
+
+    second = load_scenario(EXAMPLE_SCENARIO, cache)
+    assert cache.hits == 1
+    assert fingerprint(first) == fingerprint(second) == fingerprint(load_scenario(EXAMPLE_SCENARIO))
+
+
+def test_load_scenarios(tmp_path):
+    data = json.loads(EXAMPLE_SCENARIO.read_text())
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({**data, "misc_expenses": []}))
+
+    cache = ResultCache(tmp_path / "cache")
+    scenarios = load_scenarios([EXAMPLE_SCENARIO, other, EXAMPLE_SCENARIO], cache, max_workers=2)
+    assert [fingerprint(s) for s in scenarios] == [fingerprint(load_scenario(p)) for p in (EXAMPLE_SCENARIO, other, EXAMPLE_SCENARIO)]
+    assert len(cache) == 2
+
+    invalid = tmp_path / "invalid.json"
+    invalid.write_text(json.dumps({**data, "customer_types": []}))
+    with pytest.raises(ValidationError):
+        load_scenarios([other, invalid], max_workers=2)
+
+
+def test_placeholder_actuals():
+    # Built on each load, so they're accurate as of the day they're loaded
+    assert load_actuals(None) is not load_actuals(None)
+    assert load_actuals(None).accurate_as_of == date.today()
@@ -0,0 +1,93 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from typer.testing import CliRunner
+
+from pycasting.calc.cashflow import monthly_expenses, monthly_revenue
+from pycasting.calc.customers import new_customers
+from pycasting.calc.forecasting import forecast
+from pycasting.calc.session import current_session
+from pycasting.loading import load_actuals, load_scenario
+from pycasting.main import cli, headline_metrics
+from pycasting.misc import MonthYear
+
+EXAMPLE_SCENARIO = Path(__file__).parents[1] / "examples" / "example_scenario.json"
+
+
+def test_run(tmp_path):
+    runner = CliRunner()
+    actuals = tmp_path / "actuals.json"
+    actuals.write_text(json.dumps({"accurate_as_of": "2022-08-31", "active_customers": {"Small - Seat Based": 1}, "cash_on_hand": 1000}))
+
+    run = ["run", str(EXAMPLE_SCENARIO), "--actuals", str(actuals), "--months-ahead", "6"]
+
+    result = runner.invoke(cli, run + ["-o", str(tmp_path / "f.csv")])
+    assert result.exit_code == 0, result.output
+    df = pd.read_csv(tmp_path / "f.csv")
+    assert len(df) == 6
+    assert df["eom_date"].iloc[0] == "2022-08-31"
+
+    result = runner.invoke(cli, run + ["--format", "json"])
+    assert result.exit_code == 0, result.output
+    assert [row["cash_on_hand"] for row in json.loads(result.stdout)] == pytest.approx(list(df["cash_on_hand"]))
+
+    result = runner.invoke(cli, ["run", str(EXAMPLE_SCENARIO), "--format", "parquet"])
+    assert result.exit_code != 0
+
+    result = runner.invoke(cli, run + ["--output", str(tmp_path / "f.parquet")])
+    assert result.exit_code == 0, result.output
+    parquet = pd.read_parquet(tmp_path / "f.parquet")
+    assert list(parquet.columns) == list(df.columns)
+    assert list(parquet["cash_on_hand"]) == pytest.approx(list(df["cash_on_hand"]))
+
+
+def test_run_parquet_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr("importlib.util.find_spec", lambda name, *args: None)
+    result = CliRunner().invoke(cli, ["run", str(EXAMPLE_SCENARIO), "--output", str(tmp_path / "f.parquet")])
+    assert result.exit_code != 0
+    assert "pycasting[parquet]" in result.output
+    assert not (tmp_path / "f.parquet").exists()
+
+
+def test_no_dashboard_imports():
+    check = "import sys, pycasting.main; print(sorted({m.split('.')[0] for m in sys.modules} & {'streamlit', 'altair', 'numerize'}))"
+    output = subprocess.run([sys.executable, "-c", check], check=True, capture_output=True, text=True).stdout
+    assert output.strip() == "[]"
+
+
+def test_headline_metrics():
+    scenario = load_scenario(EXAMPLE_SCENARIO)
+    actuals = load_actuals(None)
+    df = forecast(scenario, actuals, 18)
+    mrr, cac, new = headline_metrics(df)
+
+    # The same as calculating them for the last month
+    last = MonthYear.from_date(actuals.accurate_as_of).shift_month(17)
+    assert new == new_customers(scenario, last, None) > 0
+    assert mrr == pytest.approx(monthly_revenue(scenario, actuals, last, None).nominal_value)
+    assert cac == pytest.approx(monthly_expenses(scenario, actuals, last)[1].nominal_value / new)
+
+
+def test_dashboard_caches():
+    pytest.importorskip("streamlit")
+    from pycasting.main import _dashboard_caches
+
+    cached_scenario, cached_actuals, cached_forecast = _dashboard_caches()
+    content = EXAMPLE_SCENARIO.read_bytes()
+    scenario, data = cached_scenario("example", content)
+    assert cached_scenario("example", content)[0] is scenario
+    assert data == json.loads(content)
+
+    actuals = cached_actuals("actuals", load_actuals(None).json().encode())
+    def entries():
+        return sum(stats.currsize for stats in current_session().stats().values())
+
+    before = entries()
+    df = cached_forecast("example", "actuals", 6, scenario, actuals)
+    assert len(df) == 6
+    # Nothing's left memoized in the (unbounded) default session
+    assert entries() == before
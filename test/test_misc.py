@@ -0,0 +1,109 @@
+"""Tests misc helpers"""
+import copy
+import gc
+import json
+import pickle
+from datetime import date
+from typing import Optional
+
+import pytest
+
+from pycasting.misc import MonthYear, BaseModel, InternTable, intern_model
+from pycasting.pydanticmodels.predictions import LeadConfig, LeadStage
+
+
+def test_month_year_arithmetic():
+    month_year = MonthYear(month=11, year=2024)
+
+    assert month_year.shift_month(2) == MonthYear(month=1, year=2025)
+    assert month_year.shift_month(-11) == MonthYear(month=12, year=2023)
+    assert month_year.shift_month(-24).shift_month(24) == month_year
+    assert month_year.shift_month(14).months_since(month_year) == 14
+
+    assert month_year.start_of_month == date(2024, 11, 1)
+    assert month_year.end_of_month == date(2024, 11, 30)
+    assert MonthYear(month=2, year=2024).end_of_month == date(2024, 2, 29)
+    assert MonthYear.from_date(date(2024, 2, 13)) == MonthYear(month=2, year=2024)
+
+    expected = [month_year, month_year.shift_month(1), month_year.shift_month(2)]
+    assert list(MonthYear.between(month_year, month_year.shift_month(2))) == expected
+    assert list(MonthYear.between(month_year, month_year.shift_month(2), inclusive=False)) == [month_year, month_year.shift_month(1)]
+    assert list(MonthYear.between(month_year, month_year.shift_month(-1))) == []
+
+
+def test_month_year_ordering_and_interning():
+    month_year = MonthYear(month=12, year=2024)
+
+    assert month_year < MonthYear(month=1, year=2025)
+    assert month_year >= MonthYear(month=11, year=2024)
+    assert sorted([month_year.shift_month(3), month_year, month_year.shift_month(-3)])[0] == month_year.shift_month(-3)
+
+    # One instance per month
+    assert MonthYear(month=12, year=2024) is month_year
+    assert month_year.shift_month(1).shift_month(-1) is month_year
+    assert pickle.loads(pickle.dumps(month_year)) is month_year
+    assert copy.deepcopy(month_year) is month_year
+    assert len({month_year, MonthYear.from_date(date(2024, 12, 5))}) == 1
+
+    with pytest.raises(TypeError):
+        month_year.ordinal = 0
+    with pytest.raises(ValueError):
+        MonthYear(month=13, year=2024)
+
+
+class _WithMonthYear(BaseModel):
+    month_year: MonthYear
+    other: Optional[MonthYear] = None
+
+
+def test_month_year_as_field():
+    model = _WithMonthYear(month_year={"month": 3, "year": 2025}, other=MonthYear(month=4, year=2025))
+
+    assert model.month_year is MonthYear(month=3, year=2025)
+    assert json.loads(model.json()) == {"month_year": {"month": 3, "year": 2025}, "other": {"month": 4, "year": 2025}}
+    assert _WithMonthYear.parse_raw(model.json()) == model
+    assert _WithMonthYear.schema()["properties"]["month_year"]["required"] == ["month", "year"]
+
+
+def test_month_year_json():
+    month_year = MonthYear(month=3, year=2025)
+    # Takes a model's `.json()` arguments
+    assert json.loads(month_year.json(by_alias=True, exclude_none=True, encoder=str, indent=2)) == {"month": 3, "year": 2025}
+    assert json.loads(month_year.json(exclude={"year"})) == {"month": 3}
+    assert month_year.dict(include={"year"}) == {"year": 2025}
+
+
+def test_model_hash_is_cached(initial_lead_stage, close_lead_stage):
+    config = LeadConfig(stages=(initial_lead_stage, close_lead_stage), cost_per_ad_click=0.2, qualified_lead_to_click_ratio=0.01)
+    same = LeadConfig(stages=(initial_lead_stage, close_lead_stage), cost_per_ad_click=0.2, qualified_lead_to_click_ratio=0.01)
+
+    assert hash(config) == hash(same)
+    assert config._hash == hash(config)
+    assert config == same
+    assert config != config.copy(update={"cost_per_ad_click": 0.3})
+    assert hash(config.copy(update={"cost_per_ad_click": 0.3})) != hash(config)
+    assert hash(pickle.loads(pickle.dumps(config))) == hash(config)
+
+
+def test_intern_model(initial_lead_stage, close_lead_stage):
+    table = InternTable()
+    stages = (initial_lead_stage, close_lead_stage)
+    config = LeadConfig(stages=stages, cost_per_ad_click=0.2, qualified_lead_to_click_ratio=0.01)
+    # Validation copies the sub-models
+    same = LeadConfig(stages=stages, cost_per_ad_click=0.2, qualified_lead_to_click_ratio=0.01)
+    assert same.stages[0] is not config.stages[0]
+
+    interned = intern_model(config, table)
+    interned_same = intern_model(same, table)
+    assert interned is interned_same
+    assert interned.stages[0] is intern_model(LeadStage(**initial_lead_stage.dict()), table)
+    assert interned == config
+    assert len(table) == 3
+
+    other = intern_model(config.copy(update={"cost_per_ad_click": 0.3}), table)
+    assert other is not interned
+    assert other.stages is interned.stages
+
+    del interned, interned_same, other, config, same
+    gc.collect()
+    assert len(table) == 0
@@ -0,0 +1,62 @@
+"""Tests uncertainty backends"""
+import numpy as np
+import pytest
+from uncertainties import ufloat
+
+from pycasting.misc import exact
+from pycasting.pydanticmodels.predictions import COGS
+from pycasting.uncertainty import VariableIndex, DenseGradient, get_uncertainty_backend, nominal_value, std_dev
+
+
+def test_affine_array_matches_uncertainties():
+    a, b, c = ufloat(3, 0.5), ufloat(-2, 0.1), ufloat(10, 2)
+    index = VariableIndex()
+    da, db, dc = index.lift(a), index.lift(b), index.lift(c)
+
+    for expected, actual in (
+        (a + b * c, da + db * dc),
+        (a - 2 * b / c, da - 2 * db / dc),
+        (5 / (a * c) - b, 5 / (da * dc) - db),
+        (-(a * a) + 1.5, -(da * da) + 1.5),
+        (exact(4) + a * c, exact(4) + da * dc),
+        (b * a - c, db * a - c),
+    ):
+        assert actual.nominal_value == pytest.approx(expected.nominal_value)
+        assert actual.std_dev == pytest.approx(expected.std_dev)
+
+
+def test_affine_array_broadcasting():
+    index = VariableIndex()
+    fee = index.lift(ufloat(100, 10))
+    counts = np.array([1, 2, 3])
+
+    income = fee * counts
+    assert list(income.nominal_value) == [100, 200, 300]
+    assert list(income.std_dev) == pytest.approx([10, 20, 30])
+    assert income.cumsum().std_dev[-1] == pytest.approx(60)
+    assert income.sum().std_dev == pytest.approx(60)
+
+
+def test_exact_has_no_variables():
+    total = exact(0)
+    for month in range(12):
+        total = total + exact(month) * ufloat(1, 0.1)
+
+    # Only the 12 uncertain variables, none for the exact values
+    assert len(total.derivatives) == 12
+    assert nominal_value(3.0) == 3.0 and std_dev(3.0) == 0
+
+
+def test_dense_backend_prepares_model():
+    cogs = COGS(monthly="120+/-50", per_usage="2+/-1")
+    prepared = get_uncertainty_backend("dense").prepare(cogs)
+
+    assert isinstance(get_uncertainty_backend("dense"), DenseGradient)
+    assert prepared.monthly.jacobian.shape == prepared.per_usage.jacobian.shape == (2,)
+    total = prepared.monthly + prepared.per_usage * 10
+    expected = cogs.monthly + cogs.per_usage * 10
+    assert total.nominal_value == pytest.approx(expected.nominal_value)
+    assert total.std_dev == pytest.approx(expected.std_dev)
+
+    with pytest.raises(ValueError):
+        get_uncertainty_backend("nope")
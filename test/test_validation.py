@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from pycasting.calc.persistent import ResultCache
+from pycasting.main import cli
+from pycasting.validation import scenario_paths, scenario_validator, validate_file, validate_files
+
+EXAMPLE_SCENARIO = Path(__file__).parents[1] / "examples" / "example_scenario.json"
+
+
+@pytest.fixture
+def example_data():
+    return json.loads(EXAMPLE_SCENARIO.read_text())
+
+
+def test_schema_check_accepts_valid(example_data):
+    assert scenario_validator().errors(example_data) == []
+
+    # Forms pydantic converts, or fills in, aren't rejected
+    stage = example_data["customer_types"][0]["lead_config"]["stages"][0]
+    stage.pop("duration")
+    stage["duration_histogram"] = {"5": 1, "10": 3}
+    example_data["customer_types"][0]["lead_config"]["stages"][1]["duration"] = "30+/-10"
+    example_data["customer_types"][0]["churn"] = "0.05"
+    assert scenario_validator().errors(example_data) == []
+    assert validate_file(EXAMPLE_SCENARIO, json.dumps(example_data).encode()).valid
+
+
+def test_schema_check_errors(example_data):
+    example_data["customer_types"][0]["churn"] = 3
+    example_data["customer_types"][1]["usage_predictor"] = {"name": "linear", "initial_usage": "3"}
+    example_data["headcount"][0]["salary"] = [1]
+    del example_data["misc_expenses"]
+
+    assert scenario_validator().errors(example_data) == [
+        ("$.misc_expenses", "field required"),
+        ("$.customer_types[0].churn", "must be at most 1"),
+        ("$.customer_types[1].usage_predictor", "matches none of the 2 options"),
+        ("$.customer_types[1].usage_predictor.increase_per_year", "field required"),
+        ("$.headcount[0]", "matches none of the 2 options"),
+        ("$.headcount[0].salary", "must be a number"),
+    ]
+
+
+def test_validate_file(tmp_path, example_data):
+    report = validate_file(EXAMPLE_SCENARIO, b"{")
+    assert report.rejected_by_schema and report.errors[0][0] == "$"
+
+    # Passes the schema check, but not full validation
+    example_data["customer_types"][0]["fraction_of_leads"] = 0.5
+    report = validate_file(EXAMPLE_SCENARIO, json.dumps(example_data).encode())
+    assert not report.rejected_by_schema
+    assert report.errors == (("$.customer_types", "Total customer fractions must add to 1, not 0.6"),)
+
+
+def test_validate_files(tmp_path, example_data):
+    (tmp_path / "nested").mkdir()
+    for i in range(4):
+        data = dict(example_data, misc_expenses=[{"name": "Rent", "monthly": i}])
+        if i == 2:
+            data["headcount"] = "none"
+        (tmp_path / ("nested" if i % 2 else "") / f"{i}.json").write_text(json.dumps(data))
+
+    assert len(scenario_paths([tmp_path])) == 4
+    assert len(scenario_paths([str(tmp_path / "*.json"), tmp_path / "0.json"])) == 2
+
+    paths = sorted(scenario_paths([tmp_path]))
+    cache = ResultCache(tmp_path / "cache")
+    reports = list(validate_files(paths, max_workers=2, cache=cache))
+    assert [report.path for report in reports] == paths
+    assert [report.valid for report in reports] == [True, False, True, True]
+    assert reports[1].errors == (("$.headcount", "must be an array"),)
+    assert len(cache) == 3
+
+    # Valid files are skipped once cached
+    again = list(validate_files(paths, max_workers=1, cache=cache))
+    assert [report.valid for report in again] == [True, False, True, True]
+    assert cache.hits == 3
+
+
+def test_validate_command(tmp_path, example_data):
+    invalid = tmp_path / "invalid.json"
+    invalid.write_text(json.dumps(dict(example_data, customer_types=[])))
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["validate", str(EXAMPLE_SCENARIO), str(invalid)])
+    assert result.exit_code == 1
+    assert f"{EXAMPLE_SCENARIO}: ok" in result.stdout
+    assert f"{invalid}: $.customer_types: Total customer fractions must add to 1, not 0" in result.stdout
+
+    assert runner.invoke(cli, ["validate", str(EXAMPLE_SCENARIO)]).exit_code == 0
+    assert runner.invoke(cli, ["validate", str(tmp_path / "missing" / "*.json")]).exit_code != 0